@@ -0,0 +1,87 @@
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.skill_reroller.config import (
+    WEAPONS,
+    ELEMENTS,
+    SERIES_SKILLS,
+    GROUP_SKILLS,
+    MATCH_THRESHOLD,
+)
+from src.skill_reroller.table_manager import TableManager
+from src.skill_reroller.target_query import TargetQuery
+
+ROW_SIZES = [300, 1000, 3000, 10000]
+TARGETS = [
+    ["巨戟龍の黙示録", "ヌシの魂"],
+    ["黒蝕竜の力", "ヌシの魂"],
+    ["火竜の力", "ヌシの誇り"],
+]
+REPEAT = 5
+
+
+def build_table(rows: int) -> TableManager:
+    """全武器・全属性の列を持つ合成データの厳選表を作成する"""
+    random.seed(0)
+    table = TableManager(output_dir=tempfile.mkdtemp())
+    columns = [f"{w}_{e}" for w in WEAPONS for e in ELEMENTS]
+    table.headers = ["回数"] + columns
+    for count in range(1, rows + 1):
+        table.data[count] = {
+            column: table.make_cell(
+                f"{random.choice(SERIES_SKILLS)}+{random.choice(GROUP_SKILLS)}"
+            )
+            for column in columns
+        }
+    table.rebuild_index()
+    return table
+
+
+def scan(table: TableManager, min_count: int) -> int:
+    """インデックスを使わずに全セルを走査する (比較用)"""
+    compiled = TargetQuery.from_combinations(TARGETS)
+    hits = 0
+    for count, row_data in table.data.items():
+        if count <= min_count:
+            continue
+        for cell in row_data.values():
+            if compiled.match(cell.series_id, cell.group_id) is not None:
+                hits += 1
+    return hits
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    print(f"列数: {len(WEAPONS) * len(ELEMENTS)}, ターゲット: {TARGETS}")
+    print(f"{'行数':>8} {'セル数':>10} {'全走査(ms)':>12} {'索引(ms)':>10} {'倍率':>6}")
+    for rows in ROW_SIZES:
+        table = build_table(rows)
+        min_count = rows // 2
+        hits = scan(table, min_count)
+        indexed = table.find_target_combinations(TARGETS, min_count, MATCH_THRESHOLD)
+        assert hits == len(indexed), (hits, len(indexed))
+
+        scan_ms = measure(lambda: scan(table, min_count))
+        index_ms = measure(
+            lambda: table.find_target_combinations(TARGETS, min_count, MATCH_THRESHOLD)
+        )
+        cells = rows * (len(table.headers) - 1)
+        print(
+            f"{rows:>8} {cells:>10} {scan_ms:>12.2f} {index_ms:>10.2f} {scan_ms / index_ms:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
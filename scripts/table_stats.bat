@@ -0,0 +1,3 @@
+@echo off
+cd /d "%~dp0\.."
+uv run python -m src.skill_reroller.analytics %*
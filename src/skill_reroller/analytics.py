@@ -0,0 +1,379 @@
+import argparse
+import logging
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from .config import (
+    OUTPUT_DIR,
+    TABLE_FILE_NAME,
+    CURRENT_CONFIRMED_COUNT,
+    TARGET_COMBINATIONS,
+    TARGET_QUERY,
+    SERIES_SKILLS,
+    GROUP_SKILLS,
+    SKILL_WEIGHTS,
+    TOP_K_COLUMNS,
+)
+from .columnar_store import build_lookup
+from .table_manager import TableManager
+from .skill_ids import SERIES_IDS, GROUP_IDS
+from .target_query import TargetQuery
+
+# 枠の番号 (id_matrix の最後の軸)
+SLOTS = {"series": 0, "group": 1}
+SLOT_SKILLS = {"series": SERIES_SKILLS, "group": GROUP_SKILLS}
+
+
+class ComboGap(NamedTuple):
+    """ターゲットの組み合わせ (いずれかの列) が出現する間隔"""
+
+    label: str
+    occurrences: int
+    first: Optional[int]
+    last: Optional[int]
+    mean_gap: Optional[float]
+    max_gap: Optional[int]
+
+
+class CountPick(NamedTuple):
+    """1つの回数で得点の高い列 (武器_属性, 得点, シリーズスキル, グループスキル) の一覧"""
+
+    count: int
+    picks: List[Tuple[str, float, str, str]]
+
+
+class SkillWeights:
+    """
+    スキルごとの重み。セルの得点はシリーズスキルとグループスキルの重みの合計。
+
+    書式 (1行1スキル、# 以降はコメント):
+        巨戟龍の黙示録 @ 3
+        ヌシの魂 @ 2
+    """
+
+    def __init__(self):
+        # 不明 (-1) を含めるため1つずらして格納する
+        self.series = np.zeros(len(SERIES_SKILLS) + 1)
+        self.group = np.zeros(len(GROUP_SKILLS) + 1)
+
+    def __bool__(self) -> bool:
+        return bool(self.series.any() or self.group.any())
+
+    @classmethod
+    def parse(cls, text: str) -> "SkillWeights":
+        """重みの文字列から生成する。書式が不正な場合は ValueError を送出する。"""
+        weights = cls()
+        for line_no, raw_line in enumerate(text.splitlines(), start=1):
+            line = raw_line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if "@" not in line:
+                raise ValueError(
+                    f"{line_no}行目: 「スキル名 @ 重み」の形式で指定してください: {raw_line}"
+                )
+
+            name, weight_str = (part.strip() for part in line.rsplit("@", 1))
+            try:
+                weight = float(weight_str)
+            except ValueError:
+                raise ValueError(f"{line_no}行目: 重みが数値ではありません: {raw_line}")
+
+            if name in SERIES_IDS:
+                weights.series[SERIES_IDS[name] + 1] = weight
+            elif name in GROUP_IDS:
+                weights.group[GROUP_IDS[name] + 1] = weight
+            else:
+                raise ValueError(f"{line_no}行目: 不明なスキルです: {name}")
+        return weights
+
+
+class TableAnalytics:
+    """
+    厳選表を (回数, 列, 枠) の正規ID配列にして、集計を numpy のベクトル演算で行う。
+    配列は表の版数が変わった時だけ作り直す。
+    """
+
+    def __init__(self, table_manager: TableManager):
+        self.table_manager = table_manager
+        self.logger = logging.getLogger(__name__)
+        self._version: Optional[int] = None
+        self._matrix: Optional[Tuple[int, List[str], np.ndarray, np.ndarray]] = None
+
+    def matrix(self) -> Tuple[int, List[str], np.ndarray, np.ndarray]:
+        """(先頭行の回数, 列名の一覧, ids, detected)。TableManager.id_matrix を参照"""
+        version = self.table_manager.version
+        if self._matrix is None or self._version != version:
+            self._matrix = self.table_manager.id_matrix()
+            self._version = version
+        return self._matrix
+
+    def _rows_after(
+        self, min_count: int
+    ) -> Tuple[int, List[str], np.ndarray, np.ndarray]:
+        first, columns, ids, detected = self.matrix()
+        start = max(0, min_count + 1 - first)
+        return first + start, columns, ids[start:], detected[start:]
+
+    def _frequency(self, slot: str, min_count: int) -> Tuple[List[str], np.ndarray]:
+        """(列名の一覧, (列数, スキル数) の出現数)"""
+        _, columns, ids, detected = self._rows_after(min_count)
+        skill_count = len(SLOT_SKILLS[slot])
+        slot_ids = ids[:, :, SLOTS[slot]].astype(np.int64)
+        mask = detected & (slot_ids >= 0)
+        column_numbers = np.broadcast_to(np.arange(len(columns)), slot_ids.shape)
+        keys = column_numbers[mask] * skill_count + slot_ids[mask]
+        counts = np.bincount(keys, minlength=len(columns) * skill_count)
+        return columns, counts.reshape(len(columns), skill_count)
+
+    def skill_frequency(
+        self, slot: str = "series", min_count: int = 0
+    ) -> Dict[str, Dict[str, int]]:
+        """列ごとのスキルの出現数 {武器_属性: {スキル名: 出現数}} (出現したもののみ)"""
+        columns, counts = self._frequency(slot, min_count)
+        names = SLOT_SKILLS[slot]
+        result = {}
+        for column_name, row in zip(columns, counts):
+            present = np.flatnonzero(row)
+            if len(present):
+                result[column_name] = {names[i]: int(row[i]) for i in present}
+        return result
+
+    def slot_counts(self, min_count: int = 0) -> Dict[str, Dict[str, int]]:
+        """枠ごとのスキルの出現数 {"series" | "group": {スキル名: 出現数}} (全列の合計)"""
+        result = {}
+        for slot, names in SLOT_SKILLS.items():
+            _, counts = self._frequency(slot, min_count)
+            totals = counts.sum(axis=0)
+            result[slot] = {names[i]: int(totals[i]) for i in np.flatnonzero(totals)}
+        return result
+
+    def _entry_hits(
+        self, compiled: TargetQuery, min_count: int
+    ) -> Tuple[int, List[str], np.ndarray]:
+        """各セルが該当する条件の番号 ((行数, 列数)、該当しないセルは -1)"""
+        first, columns, ids, detected = self._rows_after(min_count)
+        lookup = build_lookup(
+            {key: index for key, (_, index) in compiled.compiled.items()},
+            len(SERIES_SKILLS),
+            len(GROUP_SKILLS),
+        )
+        hits = lookup[ids[:, :, 0] + 1, ids[:, :, 1] + 1]
+        hits[~detected] = -1
+        return first, columns, hits
+
+    def combo_counts(
+        self,
+        targets: List[List[str]],
+        min_count: int,
+        query: Optional[TargetQuery] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        TableManager.count_combinations と同じ集計 (閾値は書き込み時のもの)。
+        戻り値は {武器_属性: {組み合わせの表示名: 出現回数}} で、表の列順に並ぶ
+        """
+        compiled = TargetQuery.from_combinations(targets)
+        if query:
+            compiled.extend(query)
+        if not compiled:
+            return {}
+
+        _, columns, hits = self._entry_hits(compiled, min_count)
+        entry_count = len(compiled.entries)
+        column_numbers = np.broadcast_to(np.arange(len(columns)), hits.shape)
+        mask = hits >= 0
+        counts = np.bincount(
+            column_numbers[mask] * entry_count + hits[mask],
+            minlength=len(columns) * entry_count,
+        ).reshape(len(columns), entry_count)
+
+        result = {}
+        for column_name, row in zip(columns, counts):
+            combos: Dict[str, int] = {}
+            for index in np.flatnonzero(row):
+                label = compiled.entries[index].label()
+                combos[label] = combos.get(label, 0) + int(row[index])
+            if combos:
+                result[column_name] = combos
+        return result
+
+    def combo_gaps(
+        self,
+        targets: List[List[str]],
+        min_count: int,
+        query: Optional[TargetQuery] = None,
+    ) -> List[ComboGap]:
+        """条件ごとに、いずれかの列に出現する回数の間隔を集計する"""
+        compiled = TargetQuery.from_combinations(targets)
+        if query:
+            compiled.extend(query)
+        if not compiled:
+            return []
+
+        first, _, ids, detected = self._rows_after(min_count)
+        gaps = []
+        for entry in compiled.entries:
+            # 条件が重なるセルは重みの大きい条件にしか割り当てられないため、
+            # 条件ごとに該当するセルを求める
+            lookup = build_lookup(
+                dict.fromkeys(TargetQuery([entry]).compiled, 0),
+                len(SERIES_SKILLS),
+                len(GROUP_SKILLS),
+            )
+            hits = (lookup[ids[:, :, 0] + 1, ids[:, :, 1] + 1] >= 0) & detected
+            counts = np.flatnonzero(hits.any(axis=1)) + first
+            diffs = np.diff(counts)
+            gaps.append(
+                ComboGap(
+                    label=entry.label(),
+                    occurrences=len(counts),
+                    first=int(counts[0]) if len(counts) else None,
+                    last=int(counts[-1]) if len(counts) else None,
+                    mean_gap=float(diffs.mean()) if len(diffs) else None,
+                    max_gap=int(diffs.max()) if len(diffs) else None,
+                )
+            )
+        return gaps
+
+    def top_picks(
+        self,
+        weights: SkillWeights,
+        min_count: int,
+        k: int = TOP_K_COLUMNS,
+        targets: Optional[List[List[str]]] = None,
+        query: Optional[TargetQuery] = None,
+    ) -> List[CountPick]:
+        """
+        min_count より後の各回数について、得点の高い順に k 列を返す。
+        得点はスキルの重みの合計に、ターゲットの組み合わせに該当する場合はその重みを加えたもの。
+        得点が 0 以下の列は含めず、該当する列のない回数は省く。
+        """
+        first, columns, ids, detected = self._rows_after(min_count)
+        if not len(columns) or k <= 0:
+            return []
+
+        scores = weights.series[ids[:, :, 0] + 1] + weights.group[ids[:, :, 1] + 1]
+        compiled = TargetQuery.from_combinations(targets or [])
+        if query:
+            compiled.extend(query)
+        if compiled:
+            bonus = np.zeros((len(SERIES_SKILLS) + 1, len(GROUP_SKILLS) + 1))
+            for (series_id, group_id), (weight, _) in compiled.compiled.items():
+                bonus[series_id + 1, group_id + 1] = weight
+            scores += bonus[ids[:, :, 0] + 1, ids[:, :, 1] + 1]
+        scores[~detected] = 0.0
+
+        # 各行の上位 k 列を argpartition で取り出し、その中だけを並べ替える
+        k = min(k, len(columns))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        picks = []
+        for row in np.flatnonzero(top_scores[:, 0] > 0):
+            row_picks = []
+            for col, score in zip(top[row], top_scores[row]):
+                if score <= 0:
+                    break
+                series_id, group_id = ids[row, col]
+                row_picks.append(
+                    (
+                        columns[col],
+                        float(score),
+                        SERIES_SKILLS[series_id] if series_id >= 0 else "",
+                        GROUP_SKILLS[group_id] if group_id >= 0 else "",
+                    )
+                )
+            picks.append(CountPick(first + int(row), row_picks))
+        return picks
+
+
+def main(argv=None) -> int:
+    """
+    厳選表の統計を表示する。
+    例: uv run python -m src.skill_reroller.analytics --min-count 120
+    """
+    parser = argparse.ArgumentParser(description="厳選表の統計を表示する")
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        default=OUTPUT_DIR,
+        help=f"厳選表のある出力フォルダー (既定: {OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "--min-count",
+        type=int,
+        default=CURRENT_CONFIRMED_COUNT,
+        help="この回数より後のみを集計する (既定: 確定済み回数)",
+    )
+    parser.add_argument("--top", type=int, default=5, help="列ごとに表示するスキルの数")
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=TOP_K_COLUMNS,
+        help="回数ごとに表示する得点上位の列の数 (スキルの重みを設定した場合)",
+    )
+    parser.add_argument(
+        "--picks", type=int, default=30, help="得点上位の列を表示する回数の数"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    table_manager = TableManager(output_dir=args.output_dir, filename=TABLE_FILE_NAME)
+    analytics = TableAnalytics(table_manager)
+    try:
+        query = TargetQuery.parse(TARGET_QUERY)
+        weights = SkillWeights.parse(SKILL_WEIGHTS)
+    except ValueError as e:
+        print(f"条件またはスキルの重みの書式が正しくありません: {e}")
+        return 1
+
+    print(f"## 枠ごとの出現数 ({args.min_count}回目より後)")
+    for slot, counts in analytics.slot_counts(args.min_count).items():
+        print(f"[{'シリーズスキル' if slot == 'series' else 'グループスキル'}]")
+        for name, n in sorted(counts.items(), key=lambda x: -x[1]):
+            print(f"  {name}: {n}")
+
+    for slot in SLOTS:
+        print(
+            f"\n## 列ごとの{'シリーズスキル' if slot == 'series' else 'グループスキル'} (上位{args.top}件)"
+        )
+        for column_name, counts in analytics.skill_frequency(
+            slot, args.min_count
+        ).items():
+            top = sorted(counts.items(), key=lambda x: -x[1])[: args.top]
+            print(f"{column_name}: " + ", ".join(f"{name} {n}" for name, n in top))
+
+    print("\n## ターゲットの出現間隔")
+    for gap in analytics.combo_gaps(TARGET_COMBINATIONS, args.min_count, query):
+        if not gap.occurrences:
+            print(f"{gap.label}: 出現なし")
+            continue
+        line = f"{gap.label}: {gap.occurrences}回 ({gap.first}〜{gap.last}回目)"
+        if gap.mean_gap is not None:
+            line += f"、平均間隔 {gap.mean_gap:.1f}回、最大間隔 {gap.max_gap}回"
+        print(line)
+
+    if weights:
+        print(f"\n## 回数ごとの得点上位{args.top_k}列 (先頭{args.picks}回分)")
+        picks = analytics.top_picks(
+            weights, args.min_count, args.top_k, TARGET_COMBINATIONS, query
+        )
+        for pick in picks[: args.picks]:
+            print(
+                f"{pick.count}回目: "
+                + ", ".join(
+                    f"{column_name} {score:g}"
+                    for column_name, score, _, _ in pick.picks
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
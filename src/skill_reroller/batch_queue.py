@@ -0,0 +1,134 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Tuple
+from .config import WEAPONS, ELEMENTS, BATCH_QUEUE_FILE_NAME
+
+# ジョブの状態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STATUS_LABELS = {
+    PENDING: "待機中",
+    RUNNING: "実行中",
+    DONE: "完了",
+    FAILED: "失敗",
+}
+
+
+class BatchJob(NamedTuple):
+    """1つの武器_属性 (列) についてスキル再付与を行うジョブ"""
+
+    weapon: str
+    element: str
+    # スキル再付与を行う回数 (0は素材を使い切るまで)
+    attempts: int
+    status: str = PENDING
+    # 実行済みの回数
+    performed: int = 0
+    message: str = ""
+
+    @property
+    def weapon_element(self) -> str:
+        return f"{self.weapon}_{self.element}"
+
+    def label(self) -> str:
+        attempts = self.attempts if self.attempts else "素材分"
+        return f"{self.weapon}_{self.element} ({self.performed}/{attempts}回)"
+
+
+class BatchQueue:
+    """
+    複数の列を続けて記録するジョブの一覧。状態を変えるたびにJSONファイルへ保存し、
+    中断した場合は未完了のジョブから再開できる。
+    """
+
+    def __init__(self, output_dir: str, filename: str = BATCH_QUEUE_FILE_NAME):
+        self.filepath = Path(output_dir) / filename
+        self.logger = logging.getLogger(__name__)
+        self.jobs: List[BatchJob] = []
+        self.load()
+
+    @staticmethod
+    def parse(text: str) -> List[BatchJob]:
+        """
+        1行に1件の「武器 属性 回数」(回数は省略可) を読み込む。
+        書式が正しくない場合は ValueError を送出する。
+        """
+        jobs = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = re.split(r"[\s_,]+", line)
+            if len(parts) not in (2, 3):
+                raise ValueError(
+                    f"{line_no}行目: 「武器 属性 回数」の形式で入力してください"
+                )
+            weapon, element = parts[0], parts[1]
+            if weapon not in WEAPONS:
+                raise ValueError(f"{line_no}行目: 不明な武器です: {weapon}")
+            if element not in ELEMENTS:
+                raise ValueError(f"{line_no}行目: 不明な属性です: {element}")
+            attempts = 0
+            if len(parts) == 3:
+                if not parts[2].isdigit():
+                    raise ValueError(
+                        f"{line_no}行目: 回数は0以上の整数で入力してください"
+                    )
+                attempts = int(parts[2])
+            jobs.append(BatchJob(weapon, element, attempts))
+        return jobs
+
+    def load(self):
+        if not self.filepath.exists():
+            return
+        try:
+            with open(self.filepath, mode="r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self.jobs = [BatchJob(**job) for job in raw.get("jobs", [])]
+        except Exception as e:
+            self.logger.error(f"Failed to load batch queue: {e}")
+
+    def save(self):
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.filepath, mode="w", encoding="utf-8") as f:
+                json.dump(
+                    {"jobs": [job._asdict() for job in self.jobs]},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to save batch queue: {e}")
+
+    def set_jobs(self, jobs: List[BatchJob]):
+        """ジョブの一覧を置き換える (実行状態はリセットされる)"""
+        self.jobs = list(jobs)
+        self.save()
+
+    def update(self, index: int, **fields):
+        """ジョブの状態を更新して保存する"""
+        self.jobs[index] = self.jobs[index]._replace(**fields)
+        self.save()
+
+    def unfinished(self) -> Iterator[Tuple[int, BatchJob]]:
+        """完了していないジョブ (中断した実行中のジョブを含む) を順に返す"""
+        for index, job in enumerate(self.jobs):
+            if job.status in (PENDING, RUNNING):
+                yield index, job
+
+    def has_unfinished(self) -> bool:
+        return any(True for _ in self.unfinished())
+
+    def progress_text(self) -> str:
+        """ジョブごとの進捗 (1行に1件)"""
+        return "\n".join(
+            f"{index + 1}. {job.label()} {STATUS_LABELS.get(job.status, job.status)}"
+            + (f": {job.message}" if job.message else "")
+            for index, job in enumerate(self.jobs)
+        )
@@ -0,0 +1,44 @@
+import logging
+import threading
+from contextlib import contextmanager
+import keyboard
+from .config import STOP_KEY
+
+
+class CancellationToken(threading.Event):
+    """
+    中断要求を共有するイベント。中断キーのホットキーで set され、
+    入力・待機・書き込みの各処理は is_set で確認するか wait で待つ。
+    キーの状態を定期的に確認しないため、押してからすぐに中断でき、待機中にCPUも使わない。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger(__name__)
+        self._hotkey = None
+        self._listeners = 0
+
+    @contextmanager
+    def listening(self, hotkey: str = STOP_KEY):
+        """with の間、hotkey が押されたら中断を要求する (入れ子にできる)"""
+        if self._listeners == 0:
+            try:
+                self._hotkey = keyboard.add_hotkey(hotkey, self._on_hotkey)
+            except Exception as e:
+                self.logger.error(f"Failed to register stop key '{hotkey}': {e}")
+        self._listeners += 1
+        try:
+            yield self
+        finally:
+            self._listeners -= 1
+            if self._listeners == 0 and self._hotkey is not None:
+                try:
+                    keyboard.remove_hotkey(self._hotkey)
+                except Exception as e:
+                    self.logger.error(f"Failed to unregister stop key: {e}")
+                self._hotkey = None
+
+    def _on_hotkey(self):
+        if not self.is_set():
+            self.logger.info("Stop key pressed. Cancelling...")
+        self.set()
@@ -0,0 +1,113 @@
+import logging
+from typing import List, NamedTuple, Optional
+import numpy as np
+from .config import (
+    WEAPONS,
+    ELEMENTS,
+    SERIES_SKILLS,
+    GROUP_SKILLS,
+    POINTS_PER_ATTEMPT,
+    RECOMMEND_ROWS,
+    RECOMMEND_PRIOR_STRENGTH,
+)
+from .table_manager import TableManager
+from .target_query import TargetQuery
+
+
+class ColumnScore(NamedTuple):
+    weapon_element: str
+    # 記録を始める回数以降で、既に記録済みの行数
+    recorded: int
+    # 1回の記録で新たに記録される行数
+    new_rows: int
+    # 1セルあたりの期待値 (ターゲットの重みの合計)
+    hit_rate: float
+    expected_hits: float
+    # 消費するポイントあたりの期待値
+    per_point: float
+
+
+class ColumnRecommender:
+    """
+    次に記録する武器_属性 (列) を、1ポイントあたりに増える当たりの期待値の順に並べる。
+
+    各列の当たりの確率は、シリーズ/グループスキルの出現頻度を
+    表全体の出現頻度に寄せて (記録の少ない列ほど強く) 平滑化し、
+    2つの枠が独立に決まるとみなして求める。
+    """
+
+    def __init__(
+        self,
+        table_manager: TableManager,
+        targets: List[List[str]],
+        query: Optional[TargetQuery] = None,
+        prior_strength: float = RECOMMEND_PRIOR_STRENGTH,
+    ):
+        self.table_manager = table_manager
+        self.compiled = TargetQuery.from_combinations(targets)
+        if query:
+            self.compiled.extend(query)
+        self.prior_strength = prior_strength
+        self.logger = logging.getLogger(__name__)
+
+    def _weight_matrix(self) -> np.ndarray:
+        """weights[series_id + 1, group_id + 1] がターゲットの重み (該当しない組は 0)"""
+        weights = np.zeros((len(SERIES_SKILLS) + 1, len(GROUP_SKILLS) + 1))
+        for (series_id, group_id), (weight, _) in self.compiled.compiled.items():
+            weights[series_id + 1, group_id + 1] = weight
+        return weights
+
+    def rank(
+        self,
+        min_count: int,
+        rows: int = RECOMMEND_ROWS,
+        points_per_attempt: int = POINTS_PER_ATTEMPT,
+    ) -> List[ColumnScore]:
+        """
+        min_count より後の rows 回分を記録する場合の、列ごとの期待値を降順で返す。
+        記録済みの行は新しい当たりにならないため、未記録の行の分だけを数える。
+        """
+        if not self.compiled or rows <= 0:
+            return []
+
+        slot_counts = self.table_manager.slot_counts()
+        recorded = self.table_manager.recorded_rows(min_count + 1, min_count + rows)
+        weights = self._weight_matrix()
+
+        series_total = np.ones(len(SERIES_SKILLS) + 1)
+        group_total = np.ones(len(GROUP_SKILLS) + 1)
+        for series, group in slot_counts.values():
+            series_total += series
+            group_total += group
+        series_prior = series_total / series_total.sum()
+        group_prior = group_total / group_total.sum()
+
+        columns = [f"{w}_{e}" for w in WEAPONS for e in ELEMENTS]
+        columns += [c for c in slot_counts if c not in columns]
+        scores = []
+        for column_name in columns:
+            series, group = slot_counts.get(column_name, (0, 0))
+            series_p = (series + self.prior_strength * series_prior) / (
+                np.sum(series) + self.prior_strength
+            )
+            group_p = (group + self.prior_strength * group_prior) / (
+                np.sum(group) + self.prior_strength
+            )
+            hit_rate = float(series_p @ weights @ group_p)
+
+            done = min(recorded.get(column_name, 0), rows)
+            new_rows = rows - done
+            expected = hit_rate * new_rows
+            scores.append(
+                ColumnScore(
+                    weapon_element=column_name,
+                    recorded=done,
+                    new_rows=new_rows,
+                    hit_rate=hit_rate,
+                    expected_hits=expected,
+                    per_point=expected / (rows * points_per_attempt),
+                )
+            )
+
+        scores.sort(key=lambda s: -s.per_point)
+        return scores
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+# セルが記録されていないことを表す文字列番号
+ABSENT = -1
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.npy"
+CONFIDENCE_FILE = "confidence.npy"
+TEXT_INDEX_FILE = "text_idx.npy"
+STRINGS_FILE = "strings.bin"
+STRING_OFFSETS_FILE = "string_offsets.npy"
+# 現在の版 (サブディレクトリ名) を書いたファイル
+POINTER_FILE = "current"
+SNAPSHOT_FILES = (
+    META_FILE,
+    IDS_FILE,
+    CONFIDENCE_FILE,
+    TEXT_INDEX_FILE,
+    STRINGS_FILE,
+    STRING_OFFSETS_FILE,
+)
+
+
+def write_columnar(
+    dirpath: Path,
+    headers: List[str],
+    data: Dict,
+    skills_fingerprint: str,
+    source: Optional["ColumnarTable"] = None,
+    source_columns: Sequence[str] = (),
+):
+    """
+    厳選表を列指向のバイナリ形式で書き出す。
+    source_columns の列は data ではなく source (前回のスナップショット) から配列のまま写す。
+
+    - ids.npy: (列数, 行数, 2) の int16。シリーズ/グループの正規ID (-1 は不明)
+    - confidence.npy: (列数, 行数) の float16
+    - text_idx.npy: (列数, 行数) の int32。文字列プールの番号 (-1 は未記録)
+    - strings.bin / string_offsets.npy: OCR結果の文字列プール (UTF-8)
+    各列が連続した領域になるため、列単位で numpy.memmap から読み込める。
+
+    ファイルは版ごとのサブディレクトリに書き出し、最後に current (版の名前) を
+    置き換えて切り替える。読み込み側や途中で中断した場合でも、新旧の配列と
+    メタ情報が混ざることはない。
+    """
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+
+    columns = [h for h in headers if h != "回数"]
+    column_index = {name: i for i, name in enumerate(columns)}
+    counts = list(data)
+    if source_columns and source.rows:
+        counts += [source.min_count, source.min_count + source.rows - 1]
+    min_count = min(counts) if counts else 1
+    rows = (max(counts) - min_count + 1) if counts else 0
+
+    ids = np.full((len(columns), rows, 2), -1, dtype=np.int16)
+    confidence = np.zeros((len(columns), rows), dtype=np.float16)
+    text_idx = np.full((len(columns), rows), ABSENT, dtype=np.int32)
+
+    string_ids: Dict[str, int] = {}
+    for count, row_data in data.items():
+        row = count - min_count
+        for column_name, cell in row_data.items():
+            col = column_index.get(column_name)
+            if col is None:
+                continue
+            ids[col, row] = (cell.series_id, cell.group_id)
+            confidence[col, row] = cell.confidence
+            text_idx[col, row] = string_ids.setdefault(cell.text, len(string_ids))
+
+    for column_name in source_columns:
+        col = column_index.get(column_name)
+        source_col = source.column_index.get(column_name)
+        if col is None or source_col is None:
+            continue
+        source_text_idx = np.asarray(source.text_idx[source_col])
+        # 元の文字列番号 -> 新しい文字列番号 (末尾は未記録 (-1) 用)
+        remap = np.full(len(source.string_offsets), ABSENT, dtype=np.int32)
+        for index in np.unique(source_text_idx[source_text_idx != ABSENT]):
+            remap[index] = string_ids.setdefault(
+                source.string(int(index)), len(string_ids)
+            )
+        rows_slice = slice(
+            source.min_count - min_count, source.min_count - min_count + source.rows
+        )
+        ids[col, rows_slice] = source.ids[source_col]
+        confidence[col, rows_slice] = source.confidence[source_col]
+        text_idx[col, rows_slice] = remap[source_text_idx]
+
+    encoded = [text.encode("utf-8") for text in string_ids]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    previous = _current_version(dirpath)
+    version = f"v{time.time_ns()}"
+    version_dirpath = dirpath / version
+    version_dirpath.mkdir()
+
+    def save(name: str, write):
+        with open(version_dirpath / name, mode="wb") as f:
+            write(f)
+
+    save(IDS_FILE, lambda f: np.save(f, ids))
+    save(CONFIDENCE_FILE, lambda f: np.save(f, confidence))
+    save(TEXT_INDEX_FILE, lambda f: np.save(f, text_idx))
+    save(STRING_OFFSETS_FILE, lambda f: np.save(f, offsets))
+    save(STRINGS_FILE, lambda f: f.write(b"".join(encoded)))
+    meta = {
+        "skills_fingerprint": skills_fingerprint,
+        "columns": columns,
+        "min_count": min_count,
+        "rows": rows,
+    }
+    save(META_FILE, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode()))
+
+    # すべて書き終えてから、1回の置き換えで新しい版に切り替える
+    tmp = dirpath / f"{POINTER_FILE}.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, dirpath / POINTER_FILE)
+    _remove_old_versions(dirpath, keep={version, previous})
+
+
+def _current_version(dirpath: Path) -> Optional[str]:
+    """現在の版の名前 (版を分ける前の形式、または未作成の場合は None)"""
+    try:
+        return (Path(dirpath) / POINTER_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+def _snapshot_dirpath(dirpath: Path) -> Path:
+    """現在の版のファイルがあるディレクトリ"""
+    version = _current_version(dirpath)
+    return Path(dirpath) / version if version else Path(dirpath)
+
+
+def _remove_old_versions(dirpath: Path, keep: Set[Optional[str]]):
+    """
+    使われなくなった版を削除する。直前の版は、切り替え前に開き始めた読み込みのために残す。
+    他のプロセスが開いていて削除できないもの (Windows) は次回の書き出しで削除する。
+    """
+    for path in dirpath.iterdir():
+        if path.is_dir() and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    for name in SNAPSHOT_FILES:
+        # 版を分ける前の形式で書き出されたファイル
+        try:
+            (dirpath / name).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+class ColumnarTable:
+    """
+    write_columnar で書き出した厳選表を numpy.memmap で開く。
+    開く時点では配列を読み込まないため、行数・列数によらずすぐに開ける。
+    """
+
+    def __init__(self, dirpath: Path):
+        self.dirpath = Path(dirpath)
+        self.logger = logging.getLogger(__name__)
+        snapshot_dirpath = _snapshot_dirpath(self.dirpath)
+        with open(snapshot_dirpath / META_FILE, mode="r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.skills_fingerprint: str = meta["skills_fingerprint"]
+        self.columns: List[str] = meta["columns"]
+        self.min_count: int = meta["min_count"]
+        self.rows: int = meta["rows"]
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+
+        self.ids = np.load(snapshot_dirpath / IDS_FILE, mmap_mode="r")
+        self.confidence = np.load(snapshot_dirpath / CONFIDENCE_FILE, mmap_mode="r")
+        self.text_idx = np.load(snapshot_dirpath / TEXT_INDEX_FILE, mmap_mode="r")
+        self.string_offsets = np.load(
+            snapshot_dirpath / STRING_OFFSETS_FILE, mmap_mode="r"
+        )
+        self.strings = np.memmap(
+            snapshot_dirpath / STRINGS_FILE, dtype=np.uint8, mode="r"
+        )
+        # 空文字列 (スキル未検出) の文字列番号。存在しない場合は ABSENT
+        empty = np.flatnonzero(np.diff(self.string_offsets) == 0)
+        self.empty_index = int(empty[0]) if len(empty) else ABSENT
+
+    def close(self):
+        """
+        memmap を解放する。Windowsでは開いたままだと古い版を削除できないため、
+        使わなくなったら呼び出す
+        """
+        self.ids = self.confidence = self.text_idx = None
+        self.string_offsets = self.strings = None
+
+    @staticmethod
+    def exists(dirpath: Path) -> bool:
+        return (_snapshot_dirpath(dirpath) / META_FILE).exists()
+
+    @staticmethod
+    def modified_time(dirpath: Path) -> float:
+        """最後に書き出された時刻 (current は最後に置き換える)"""
+        pointer = Path(dirpath) / POINTER_FILE
+        if pointer.exists():
+            return pointer.stat().st_mtime
+        return (Path(dirpath) / META_FILE).stat().st_mtime
+
+    @property
+    def counts(self) -> np.ndarray:
+        """各行の回数"""
+        return np.arange(self.min_count, self.min_count + self.rows)
+
+    def string(self, index: int) -> str:
+        start = int(self.string_offsets[index])
+        end = int(self.string_offsets[index + 1])
+        return bytes(self.strings[start:end]).decode("utf-8")
+
+    def column_ids(self, column_name: str) -> Optional[np.ndarray]:
+        """指定した列の (行数, 2) の正規ID配列 (memmap のビュー)"""
+        col = self.column_index.get(column_name)
+        if col is None:
+            return None
+        return self.ids[col]
+
+    def read_column(self, column_name: str) -> Dict[int, tuple]:
+        """
+        指定した列を {回数: (OCR結果, series_id, group_id, 信頼度)} として読み込む。
+        未記録の行は含めない。
+        """
+        col = self.column_index.get(column_name)
+        if col is None:
+            return {}
+
+        text_idx = np.asarray(self.text_idx[col])
+        ids = np.asarray(self.ids[col])
+        confidence = np.asarray(self.confidence[col])
+        cells = {}
+        for row in np.flatnonzero(text_idx != ABSENT):
+            cells[self.min_count + int(row)] = (
+                self.string(int(text_idx[row])),
+                int(ids[row, 0]),
+                int(ids[row, 1]),
+                round(float(confidence[row]), 3),
+            )
+        return cells
+
+    def text_counts(self, column_name: str) -> Dict[str, int]:
+        """指定した列に出現するOCR結果の文字列ごとの件数"""
+        col = self.column_index.get(column_name)
+        if col is None:
+            return {}
+        text_idx = np.asarray(self.text_idx[col])
+        text_idx = text_idx[text_idx != ABSENT]
+        values, counts = np.unique(text_idx, return_counts=True)
+        return {self.string(int(v)): int(n) for v, n in zip(values, counts)}
+
+    def slot_counts(
+        self, column_name: str, series_count: int, group_count: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        指定した列の、シリーズ/グループスキルの正規IDごとの出現数。
+        不明 (-1) を含めるため1つずらして数える。スキル未検出のセルは含めない。
+        """
+        series = np.zeros(series_count + 1, dtype=np.int64)
+        group = np.zeros(group_count + 1, dtype=np.int64)
+        col = self.column_index.get(column_name)
+        if col is None:
+            return series, group
+
+        ids = np.asarray(self.ids[col])
+        text_idx = np.asarray(self.text_idx[col])
+        ids = ids[(text_idx != ABSENT) & (text_idx != self.empty_index)]
+        series += np.bincount(ids[:, 0] + 1, minlength=series_count + 1)
+        group += np.bincount(ids[:, 1] + 1, minlength=group_count + 1)
+        return series, group
+
+    def column_cells(self, column_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        指定した列の (行数, 2) の正規ID配列と、スキルが検出されたセルかどうかの配列。
+        memmap ではなくメモリ上の配列を返す。
+        """
+        col = self.column_index[column_name]
+        text_idx = np.asarray(self.text_idx[col])
+        detected = (text_idx != ABSENT) & (text_idx != self.empty_index)
+        return np.array(self.ids[col]), detected
+
+    def recorded_rows(self, column_name: str, first: int, last: int) -> int:
+        """指定した列の first〜last 回目のうち記録済みの行数"""
+        col = self.column_index.get(column_name)
+        if col is None:
+            return 0
+        start = max(0, first - self.min_count)
+        end = max(0, last - self.min_count + 1)
+        return int(np.count_nonzero(self.text_idx[col, start:end] != ABSENT))
+
+    def match_column(
+        self, column_name: str, lookup: np.ndarray, after_count: int = 0
+    ) -> List[Tuple[int, int, tuple]]:
+        """
+        lookup[series_id + 1, group_id + 1] が 0 以上になるセルを
+        (回数, lookup の値, (OCR結果, series_id, group_id, 信頼度)) の一覧で返す。
+        正規ID配列のみを走査し、文字列は該当したセルの分だけ読み込む。
+        """
+        col = self.column_index.get(column_name)
+        if col is None:
+            return []
+
+        start = max(0, after_count + 1 - self.min_count)
+        ids = np.asarray(self.ids[col, start:])
+        text_idx = np.asarray(self.text_idx[col, start:])
+        hits = lookup[ids[:, 0] + 1, ids[:, 1] + 1]
+        rows = np.flatnonzero(
+            (hits >= 0) & (text_idx != ABSENT) & (text_idx != self.empty_index)
+        )
+
+        matches = []
+        for row in rows:
+            matches.append(
+                (
+                    self.min_count + start + int(row),
+                    int(hits[row]),
+                    (
+                        self.string(int(text_idx[row])),
+                        int(ids[row, 0]),
+                        int(ids[row, 1]),
+                        round(float(self.confidence[col, start + row]), 3),
+                    ),
+                )
+            )
+        return matches
+
+
+def build_lookup(
+    values: Dict[Tuple[int, int], int], series_count: int, group_count: int
+) -> np.ndarray:
+    """
+    (series_id, group_id) -> 0以上の値 の辞書を ColumnarTable.match_column 用の表にする。
+    不明 (-1) を含めるため、各軸を1つずらして格納する。該当しない組は -1。
+    """
+    lookup = np.full((series_count + 1, group_count + 1), -1, dtype=np.int32)
+    for (series_id, group_id), value in values.items():
+        lookup[series_id + 1, group_id + 1] = value
+    return lookup
@@ -13,6 +13,10 @@ WINDOW_TITLE = _config["game"]["window_title"]
 
 # OCR設定
 OCR_LANG = _config["ocr"]["lang"]
+CORRECTION_FILE_NAME = _config["ocr"]["correction_file_name"]
+CORRECTION_MIN_SIMILARITY = _config["ocr"]["correction_min_similarity"]
+CORRECTION_MAX_ENTRIES = _config["ocr"]["correction_max_entries"]
+CORRECTION_STALE_DAYS = _config["ocr"]["correction_stale_days"]
 
 # 座標設定
 COORDINATES = {
@@ -42,12 +46,58 @@ DELAYS = {
     "AFTER_CLICK": _config["delays"]["after_click"],
     "REROLL_ANIMATION": _config["delays"]["reroll_animation"],
     "RETURN_TO_TITLE": _config["delays"]["return_to_title"],
+    "FAST_FORWARD_ANIMATION": _config["delays"]["fast_forward_animation"],
 }
 
+# 画面状態の判定設定
+SCREEN_STATE_ENABLED = _config["screen_state"]["enabled"]
+SCREEN_STATE_FILE_NAME = _config["screen_state"]["file_name"]
+SCREEN_STATE_MARKERS = [tuple(rect) for rect in _config["screen_state"]["markers"]]
+SCREEN_STATE_THUMBNAIL_SIZE = tuple(_config["screen_state"]["thumbnail_size"])
+SCREEN_STATE_MATCH_THRESHOLD = _config["screen_state"]["match_threshold"]
+SCREEN_STATE_POLL_INTERVAL = _config["screen_state"]["poll_interval"]
+SCREEN_STATE_TIMEOUT = _config["screen_state"]["timeout"]
+SCREEN_STATE_RESULT_TIMEOUT = _config["screen_state"]["result_timeout"]
+SCREEN_STATE_TITLE_TIMEOUT = _config["screen_state"]["title_timeout"]
+
+# 待機時間の計測設定
+CALIBRATION_CYCLES = _config["calibration"]["cycles"]
+CALIBRATION_PERCENTILE = _config["calibration"]["percentile"]
+CALIBRATION_MARGIN = _config["calibration"]["margin"]
+CALIBRATION_SETTLE_TIME = _config["calibration"]["settle_time"]
+CALIBRATION_CHANGE_THRESHOLD = _config["calibration"]["change_threshold"]
+TIMING_PROFILE_FILE_NAME = _config["calibration"]["file_name"]
+USE_TIMING_PROFILE = _config["calibration"]["use_profile"]
+
+# バッチ実行設定
+BATCH_QUEUE_FILE_NAME = _config["batch"]["file_name"]
+BATCH_LOAD_KEYS = _config["batch"]["load_keys"]
+BATCH_LOAD_DELAY = _config["batch"]["load_delay"]
+BATCH_NAVIGATE_KEYS = _config["batch"]["navigate_keys"]
+BATCH_WEAPON_KEYS = _config["batch"].get("weapon_keys", {})
+BATCH_NAVIGATE_TIMEOUT = _config["batch"]["navigate_timeout"]
+BATCH_VERIFY_INTERVAL = _config["batch"]["verify_interval"]
+
 # 出力設定
 OUTPUT_DIR = _config["output"]["dir"]
 REPORT_NAME = _config["output"]["report_name"]
 TABLE_FILE_NAME = _config["output"]["table_file_name"]
+CHECKPOINT_FILE_NAME = _config["output"]["checkpoint_file_name"]
+CHECKPOINT_FSYNC_INTERVAL = _config["output"]["checkpoint_fsync_interval"]
+PROFILES_FILE_NAME = _config["output"]["profiles_file_name"]
+
+# 厳選表設定
+TABLE_BACKEND = _config["table"]["backend"]
+QUERY_CACHE_SIZE = _config["table"]["query_cache_size"]
+JOURNAL_COMPACT_THRESHOLD = _config["table"]["journal_compact_threshold"]
+COLUMNAR_SNAPSHOT = _config["table"]["columnar_snapshot"]
+LAZY_COLUMNS = _config["table"]["lazy_columns"]
+LOADED_COLUMN_LIMIT = _config["table"]["loaded_column_limit"]
+MERGE_PARALLEL_THRESHOLD = _config["table"]["merge_parallel_threshold"]
+LIVE_TABLE_UPDATES = _config["table"]["live_updates"]
+LOCATOR_GRAM_SIZE = _config["table"]["locator_gram_size"]
+LOCATOR_MAX_MISMATCHES = _config["table"]["locator_max_mismatches"]
+OBSERVATION_MIN_SCORE = _config["table"]["observation_min_score"]
 
 # リロール設定
 MAX_ATTEMPTS = _config["reroll"]["max_attempts"]
@@ -56,6 +106,16 @@ STOP_ON_MATCH = _config["reroll"]["stop_on_match"]
 RETURN_TO_TITLE = _config["reroll"]["return_to_title"]
 CURRENT_CONFIRMED_COUNT = _config["reroll"]["current_confirmed_count"]
 TARGET_COMBINATIONS = _config["reroll"]["target_combinations"]
+TARGET_QUERY = _config["reroll"].get("target_query", "")
+FAST_FORWARD = _config["reroll"]["fast_forward"]
+FAST_FORWARD_VERIFY_INTERVAL = _config["reroll"]["fast_forward_verify_interval"]
+POINTS_PER_ATTEMPT = _config["reroll"]["points_per_attempt"]
+INCOME_PER_HUNT = _config["reroll"]["income_per_hunt"]
+MARGINAL_HUNTS = _config["reroll"]["marginal_hunts"]
+RECOMMEND_ROWS = _config["reroll"]["recommend_rows"]
+RECOMMEND_PRIOR_STRENGTH = _config["reroll"]["recommend_prior_strength"]
+SKILL_WEIGHTS = _config["reroll"].get("skill_weights", "")
+TOP_K_COLUMNS = _config["reroll"]["top_k_columns"]
 
 # 選択肢設定
 WEAPONS = _config["selection"]["weapons"]
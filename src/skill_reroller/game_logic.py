@@ -2,30 +2,45 @@ import time
 import logging
 import cv2
 import re
-import keyboard
 from pathlib import Path
 from datetime import datetime
-from difflib import SequenceMatcher
 from .config import (
     COORDINATES,
-    DELAYS,
     OUTPUT_DIR,
     TARGET_COMBINATIONS,
     MATCH_THRESHOLD,
     MAX_ATTEMPTS,
     STOP_KEY,
     REPORT_NAME,
-    SERIES_SKILLS,
-    GROUP_SKILLS,
+    LIVE_TABLE_UPDATES,
+    FAST_FORWARD,
+    FAST_FORWARD_VERIFY_INTERVAL,
+    POINTS_PER_ATTEMPT,
+    SCREEN_STATE_ENABLED,
+    SCREEN_STATE_RESULT_TIMEOUT,
+    BATCH_LOAD_KEYS,
+    BATCH_LOAD_DELAY,
+    BATCH_NAVIGATE_KEYS,
+    BATCH_WEAPON_KEYS,
+    BATCH_NAVIGATE_TIMEOUT,
+    BATCH_VERIFY_INTERVAL,
+    SCREEN_STATE_TIMEOUT,
+    WEAPONS,
+    ELEMENTS,
 )
 from .ocr_handler import OCRHandler
 from .screen_reader import ScreenReader
+from .screen_state import STATES, ScreenStateClassifier, ScreenStateError
 from .input_manager import InputManager
+from .timing_profile import TimingCalibrator, load_delays
+from .cancellation import CancellationToken
+from .batch_queue import BatchQueue, BatchJob, PENDING, RUNNING, DONE, FAILED
 from .table_manager import TableManager
-from .utils import calculate_similarity
-
-# 全スキルリストを作成
-ALL_SKILLS = SERIES_SKILLS + GROUP_SKILLS
+from .table_profiles import TableProfiles
+from .ocr_corrections import CorrectionMap
+from .session_checkpoint import SessionCheckpoint
+from .skill_ids import canonicalize_skills
+from .target_query import TargetQuery
 
 
 class GameLogic:
@@ -39,6 +54,15 @@ class GameLogic:
         weapon_name: str = "Unknown",
         weapon_element: str = "Unknown",
         confirmed_count: int = 0,
+        target_query: str = "",
+        resume: bool = False,
+        profile: str = None,
+        table_manager: TableManager = None,
+        profiles: TableProfiles = None,
+        corrections: CorrectionMap = None,
+        fast_forward: bool = FAST_FORWARD,
+        calibration_cycles: int = 0,
+        cancel_token: CancellationToken = None,
     ):
         self.logger = logging.getLogger(__name__)
         if timestamp is None:
@@ -48,14 +72,105 @@ class GameLogic:
         self.logger.info(f"Session directory created: {self.session_dir}")
 
         self.session_timestamp = timestamp
+        self.stop_requested = False
+        # 中断要求。中断キーで set され、入力・待機・書き込みの各処理がこれを確認する
+        self.cancel = cancel_token if cancel_token is not None else CancellationToken()
+
+        self.stop_on_match = stop_on_match
+        self.return_to_title_enabled = return_to_title
+
+        # 早送り: 厳選表に記録済みの回数は入力のみ行い、N回に1回だけ表と照合する
+        self.fast_forward = fast_forward
+        self.fast_forward_verify_interval = max(1, FAST_FORWARD_VERIFY_INTERVAL)
+
+        # ターゲット組み合わせの設定
+        if target_combination:
+            self.target_combinations = target_combination
+        else:
+            self.target_combinations = TARGET_COMBINATIONS
+
+        # ターゲット条件を正規IDの組に展開
+        self.target_query_text = target_query
+        self.target_query = TargetQuery.from_combinations(self.target_combinations)
+        if target_query:
+            self.target_query.extend(TargetQuery.parse(target_query))
+
+        self.ocr = OCRHandler()
+        self.screen_reader = ScreenReader()
+        # 見本が記録されていれば、固定の待機の代わりに画面の切り替わりを待つ
+        self.screen_states = (
+            ScreenStateClassifier(self.screen_reader) if SCREEN_STATE_ENABLED else None
+        )
+        # 待機時間 (計測済みのタイミングプロファイルがあればその値)
+        self.delays = load_delays()
+        self.input_manager = InputManager(self.screen_states, self.delays, self.cancel)
+
+        # 待機時間の計測: 最初の calibration_cycles 回は固定の待機の代わりに
+        # 画面の切り替わりまでの時間を計測し、終了時にタイミングプロファイルを書き出す
+        self.calibration_cycles = calibration_cycles
+        self.calibrator = None
+        self.calibration_summary = None
+        if calibration_cycles > 0:
+            self.calibrator = TimingCalibrator(
+                self.screen_states or ScreenStateClassifier(self.screen_reader)
+            )
+            self.input_manager.calibrator = self.calibrator
+            # すべての回で演出を計測するため早送りしない
+            self.fast_forward = False
+
+        self.corrections = corrections if corrections is not None else CorrectionMap()
+        # セーブデータごとの厳選表 (指定がなければ最後に選択したプロファイル)
+        # GUIと同じ TableManager を渡すと、1回ごとの更新がそのまま画面に通知される
+        # GUIと同じ TableProfiles を渡すと、記録した残りポイントを画面からそのまま参照できる
+        self.profiles = (
+            profiles
+            if profiles is not None
+            else TableProfiles(corrections=self.corrections)
+        )
+        self.profile = profile or self.profiles.active
+        self.table_manager = (
+            table_manager
+            if table_manager is not None
+            else self.profiles.table(self.profile)
+        )
+        if self.corrections.mine_table(self.table_manager):
+            self.table_manager.recanonicalize()
+
+        # 前回異常終了したセッションの記録を厳選表に反映し、必要なら続きから再開する
+        self.checkpoint = SessionCheckpoint(
+            output_dir=str(self.profiles.profile_dir(self.profile))
+        )
+        self.unfinished_session = self.checkpoint.merge_unfinished(self.table_manager)
+        self.resume_requested = resume
+
+        self._prepare_session(
+            weapon_name, weapon_element, confirmed_count, max_attempts, resume
+        )
 
+        self.logger.info(
+            f"GameLogic initialized. Profile: {self.profile}, Weapon: {self.weapon_name} ({self.weapon_element}), ConfirmedCount: {self.confirmed_count}"
+        )
+
+    def _prepare_session(
+        self,
+        weapon_name: str,
+        weapon_element: str,
+        confirmed_count: int,
+        max_attempts: int,
+        resume: bool = False,
+    ):
+        """1つの武器_属性についての実行状態を初期化する (バッチ実行ではジョブごとに呼ぶ)"""
         self.initial_materials = []
         self.history = []
 
         # 今回の実行で取得したスキル結果を保持
         self.current_session_results = []
+        # 各結果のOCR認識スコア (早送りや中断からの再開分は None)
+        self.current_session_scores = []
 
         self.total_points_start = 0
+        # 今回の実行でスキル再付与を行った回数 (素材の消費量の計算に使う)
+        self.rerolls_performed = 0
         if weapon_name is None:
             weapon_name = "Unknown"
         if weapon_element is None:
@@ -67,28 +182,45 @@ class GameLogic:
 
         self.max_attempts = max_attempts
         self.current_attempt = 0
-        self.stop_requested = False
-
-        self.stop_on_match = stop_on_match
-        self.return_to_title_enabled = return_to_title
-
-        # ターゲット組み合わせの設定
-        if target_combination:
-            self.target_combinations = target_combination
-        else:
-            self.target_combinations = TARGET_COMBINATIONS
+        self.fast_forwarded = 0
+        self.desync_detected = False
+        # 表とのずれや例外で停止した場合の理由 (中断キーでの停止は None)
+        self.failure = None
+        # 当たりで停止した (結果を確認画面に残している)
+        self.target_stopped = False
+
+        # 厳選表に書き込み済みの結果の件数
+        self.table_written = 0
+        self.resume_offset = 0
+        unfinished = self.unfinished_session
+        if resume and unfinished:
+            if (
+                unfinished["weapon"] == self.weapon_name
+                and unfinished["element"] == self.weapon_element
+            ):
+                self.confirmed_count = unfinished["confirmed_count"]
+                self.current_session_results = list(unfinished["results"])
+                self.current_session_scores = [None] * len(self.current_session_results)
+                self.resume_offset = len(self.current_session_results)
+                # 中断分は merge_unfinished で反映済み
+                self.table_written = self.resume_offset
+                self.logger.info(
+                    f"Resuming session {unfinished['timestamp']} from count "
+                    f"{self.confirmed_count + self.resume_offset + 1}."
+                )
+            else:
+                self.logger.warning(
+                    f"Unfinished session is for {unfinished['weapon']}_{unfinished['element']}. "
+                    "Starting a new session instead of resuming."
+                )
 
-        self.ocr = OCRHandler()
-        self.screen_reader = ScreenReader()
-        self.input_manager = InputManager()
-        self.table_manager = TableManager()
+    def run(self, focus: bool = True):
+        with self.cancel.listening():
+            self._run_session(focus)
 
-        self.logger.info(
-            f"GameLogic initialized. Weapon: {self.weapon_name} ({self.weapon_element}), ConfirmedCount: {self.confirmed_count}"
-        )
-
-    def run(self):
-        self.input_manager.focus_window()
+    def _run_session(self, focus: bool):
+        if focus:
+            self.input_manager.focus_window()
         available_attempts = self._calculate_available_attempts()
 
         if self.max_attempts == 0:
@@ -106,34 +238,87 @@ class GameLogic:
                 )
                 self.max_attempts = available_attempts
 
+        if self.calibrator is not None and self.max_attempts > self.calibration_cycles:
+            self.logger.info(
+                f"Calibration mode: limiting attempts to {self.calibration_cycles} cycles."
+            )
+            self.max_attempts = self.calibration_cycles
+
         self.logger.info(
             f"Starting reroll loop. Press '{STOP_KEY}' to stop gracefully."
         )
         self.logger.info("Sequence: G -> Space -> Space -> Wait -> Up -> Space")
 
+        self.checkpoint.start(
+            self.weapon_name,
+            self.weapon_element,
+            self.confirmed_count,
+            self.session_timestamp,
+            resume=self.resume_offset > 0,
+        )
+        # チェックポイントを書き始めたため、前回の未完了のセッションからは再開できない
+        self.unfinished_session = None
+        self.current_attempt = self.resume_offset
+        total_attempts = self.resume_offset + self.max_attempts
+
         try:
             for i in range(self.max_attempts):
                 # 中断キーの確認
                 if self._check_stop_key():
                     break
 
-                self.current_attempt = i + 1
+                if self.calibrator is not None:
+                    self.calibrator.begin_cycle()
+
+                self.current_attempt = self.resume_offset + i + 1
                 self.logger.info(
-                    f"--- Attempt {self.current_attempt} / {self.max_attempts} ---"
+                    f"--- Attempt {self.current_attempt} / {total_attempts} ---"
                 )
 
+                count = self.confirmed_count + len(self.current_session_results) + 1
+                known = self._known_cell(count)
+                if known is not None and not self._needs_recognition(known):
+                    # 記録済みの回数は短い待機で入力のみ行う (キャプチャ・OCRなし)
+                    self._perform_reroll_action()
+                    if self._wait_for_result(self.delays["FAST_FORWARD_ANIMATION"]):
+                        break
+                    self._record_fast_forward(known)
+                    self.input_manager.select_no_and_confirm()
+                    continue
+
                 # リロール実行
                 self._perform_reroll_action()
 
                 # 演出待機中も中断キーを監視
-                if self._sleep_with_check(DELAYS["REROLL_ANIMATION"]):
+                if self._wait_for_result(self.delays["REROLL_ANIMATION"]):
                     break
 
                 # スキル検出
-                skills = self._analyze_result()
+                skills, score = self._analyze_result()
+                for detected in skills:
+                    self.corrections.learn_from_text(detected)
+
+                if known is not None and not self._verify_known(count, known, skills):
+                    # 表とずれている場合は、これ以上記録すると表が壊れるため停止する
+                    self.desync_detected = True
+                    self.failure = f"{count}回目が厳選表の記録と一致しません"
+                    self.stop_requested = True
+                    break
 
                 skills_str_for_csv = "+".join(skills) if skills else ""
                 self.current_session_results.append(skills_str_for_csv)
+                self.current_session_scores.append(score)
+                self.checkpoint.append(
+                    self.confirmed_count + len(self.current_session_results),
+                    skills_str_for_csv,
+                )
+                # 中断した場合は終了時にまとめて書き込む
+                if LIVE_TABLE_UPDATES and not self.cancel.is_set():
+                    try:
+                        self._write_pending_results()
+                    except Exception as e:
+                        # 書き込めなかった分は終了時にまとめて書き込む
+                        self.logger.error(f"Failed to update table: {e}")
 
                 self.logger.info(f"Detected skills: {skills}")
 
@@ -149,7 +334,7 @@ class GameLogic:
                     }
                 )
 
-                if self.target_combinations:
+                if self.target_query:
                     if is_target:
                         self.logger.info("!!! TARGET COMBINATION FOUND !!!")
                         self._save_screenshot(
@@ -161,6 +346,7 @@ class GameLogic:
                             self.logger.info(
                                 "Stop on Match enabled. Stopping at confirmation screen."
                             )
+                            self.target_stopped = True
                             break
                         else:
                             self.logger.info("Stop on Match disabled. Continuing...")
@@ -179,6 +365,9 @@ class GameLogic:
                     self.logger.info("Discarding result and continuing...")
                     self.input_manager.select_no_and_confirm()
 
+                if self.calibrator is not None:
+                    self.calibrator.end_cycle()
+
             self.logger.info("Loop finished.")
 
             if not self.stop_requested:
@@ -199,23 +388,201 @@ class GameLogic:
             self.stop_requested = True
         except Exception as e:
             self.logger.error(f"An error occurred: {e}", exc_info=True)
+            self.failure = str(e)
             self.stop_requested = True
         finally:
             self._finalize()
 
+    def run_batch(self, queue: BatchQueue, on_progress=None):
+        """
+        キューの未完了のジョブ (武器_属性ごとの回数) を順に実行する。
+        最初のジョブはその武器のスキル再付与画面を開いた状態で始め、2件目以降は
+        タイトルに戻ってロードし直し、次の武器の画面に移動してから始める。
+        どのジョブも画面の武器名・属性を確認してから記録するため、別の列には書き込まない。
+        on_progress にはジョブの状態が変わるたびにキューが渡される。
+        """
+        with self.cancel.listening():
+            self._run_jobs(queue, on_progress)
+
+    def _run_jobs(self, queue: BatchQueue, on_progress):
+        jobs = list(queue.unfinished())
+        if not jobs:
+            self.logger.info("Batch queue has no unfinished jobs.")
+            return
+
+        def notify():
+            if on_progress is not None:
+                on_progress(queue)
+
+        base_dir = self.session_dir
+        confirmed_count = self.confirmed_count
+        return_to_title = self.return_to_title_enabled
+        # タイトルに戻るかはジョブの結果を見てからここで決める
+        # (当たりで停止した場合に、保存せずにタイトルに戻って結果を失わないように)
+        self.return_to_title_enabled = False
+        self.input_manager.focus_window()
+
+        for position, (index, job) in enumerate(jobs):
+            if self.stop_requested:
+                break
+            self.logger.info(
+                f"=== Batch job {position + 1} / {len(jobs)}: {job.weapon_element} ({job.attempts or 'all'} attempts) ==="
+            )
+
+            navigated = bool(
+                BATCH_NAVIGATE_KEYS or BATCH_WEAPON_KEYS.get(job.weapon_element)
+            )
+            if position > 0 and not self._load_and_navigate(job):
+                break
+            # 移動のキーが設定されていない場合は、手動で画面を開くまで待つ
+            timeout = (
+                BATCH_NAVIGATE_TIMEOUT
+                if position > 0 and not navigated
+                else SCREEN_STATE_TIMEOUT
+            )
+            if not self._wait_for_weapon(job, timeout):
+                if not self.stop_requested:
+                    # 列には何も書き込んでいないため、次回のバッチ実行でやり直せる
+                    queue.update(index, message="画面の武器名・属性が一致しません")
+                    notify()
+                    self.stop_requested = True
+                break
+
+            self.session_dir = base_dir / f"{index + 1:02d}_{job.weapon_element}"
+            self.session_dir.mkdir(parents=True, exist_ok=True)
+            self._prepare_session(
+                job.weapon,
+                job.element,
+                confirmed_count,
+                job.attempts,
+                resume=position == 0 and self.resume_requested,
+            )
+            queue.update(index, status=RUNNING, message="")
+            notify()
+
+            self.run(focus=False)
+
+            if self.failure:
+                queue.update(
+                    index,
+                    status=FAILED,
+                    performed=self.current_attempt,
+                    message=self.failure,
+                )
+            elif self.stop_requested:
+                # 中断したジョブは次回のバッチ実行で最初から行う
+                queue.update(
+                    index, performed=self.current_attempt, message="中断しました"
+                )
+            elif self.target_stopped:
+                # 結果を確認画面に残したまま止める。保存してから次回のバッチ実行で続ける
+                queue.update(
+                    index,
+                    status=PENDING,
+                    performed=self.current_attempt,
+                    message="当たりが出たため停止しました",
+                )
+                notify()
+                self.logger.info("Target found. Stopping batch at confirmation screen.")
+                break
+            else:
+                queue.update(index, status=DONE, performed=self.current_attempt)
+            notify()
+
+            if self.stop_requested:
+                break
+            # 次のジョブがある場合は、ロードし直すためにタイトルに戻る
+            if return_to_title or position < len(jobs) - 1:
+                self.input_manager.return_to_title()
+
+        self.session_dir = base_dir
+        self.return_to_title_enabled = return_to_title
+        self.logger.info("Batch finished.\n" + queue.progress_text())
+
+    def _load_and_navigate(self, job: BatchJob) -> bool:
+        """
+        タイトル画面からロードし直し、設定されたキーで job の武器のスキル再付与画面に移動する。
+        中断キーが押された場合は False を返す。
+        """
+        self.logger.info("Loading save data from title...")
+        self.input_manager.wait_for("title", 0.0)
+        self.input_manager.press_keys(BATCH_LOAD_KEYS)
+        if self._sleep_with_check(BATCH_LOAD_DELAY):
+            return False
+
+        keys = BATCH_NAVIGATE_KEYS + BATCH_WEAPON_KEYS.get(job.weapon_element, [])
+        if keys:
+            self.input_manager.press_keys(keys)
+        else:
+            self.logger.info(
+                f"No navigation keys configured. Open the reroll screen for {job.weapon_element} manually."
+            )
+        return True
+
+    def _wait_for_weapon(self, job: BatchJob, timeout: float) -> bool:
+        """画面の武器名・属性が job と一致するまで待つ (timeout 秒以内に一致しなければ False)"""
+        end_time = time.time() + timeout
+        while True:
+            weapon, element = self._read_weapon()
+            if weapon == job.weapon and element == job.element:
+                self.logger.info(f"Verified weapon on screen: {job.weapon_element}")
+                return True
+            if time.time() >= end_time:
+                self.logger.error(
+                    f"Weapon on screen is {weapon}_{element}, expected {job.weapon_element}."
+                )
+                return False
+            if self._sleep_with_check(BATCH_VERIFY_INTERVAL):
+                return False
+
+    def _read_weapon(self) -> tuple[str | None, str | None]:
+        """武器情報の領域から武器種と属性を読み取る (読み取れない場合は None)"""
+        full_img = self.screen_reader.capture_screen()
+        texts = []
+        for area in ("WEAPON_NAME", "WEAPON_ELEMENT"):
+            cropped = self.screen_reader.crop_from_rect(full_img, COORDINATES[area])
+            texts.append("".join(self.ocr.extract_text(cropped)).replace(" ", ""))
+        return _find_name(texts[0], WEAPONS), _find_name(texts[1], ELEMENTS)
+
     def _check_stop_key(self) -> bool:
-        if keyboard.is_pressed(STOP_KEY):
-            self.logger.info(f"Stop key '{STOP_KEY}' pressed. Stopping...")
+        if self.cancel.is_set():
+            if not self.stop_requested:
+                self.logger.info(f"Stop key '{STOP_KEY}' pressed. Stopping...")
             self.stop_requested = True
             return True
         return False
 
-    def _sleep_with_check(self, duration: float, interval: float = 0.1) -> bool:
-        end_time = time.time() + duration
-        while time.time() < end_time:
+    def _sleep_with_check(self, duration: float) -> bool:
+        """duration 秒待つ。中断キーが押された場合はその時点で True を返す"""
+        self.cancel.wait(duration)
+        return self._check_stop_key()
+
+    def _wait_for_result(self, delay: float) -> bool:
+        """
+        結果ダイアログが表示されるまで待つ (判定できない場合は delay 秒待つ)。
+        中断キーが押された場合は True を返す。
+        """
+        if self.calibrator is not None:
+            self.calibrator.measure(
+                "REROLL_ANIMATION",
+                "result",
+                SCREEN_STATE_RESULT_TIMEOUT,
+                cancel=self.cancel,
+            )
+            return self._check_stop_key()
+
+        if not self.input_manager.can_detect("result"):
+            return self._sleep_with_check(delay)
+
+        state = self.screen_states.wait_for_state(
+            ["result"], SCREEN_STATE_RESULT_TIMEOUT, self.cancel
+        )
+        if state is None:
             if self._check_stop_key():
                 return True
-            time.sleep(min(interval, end_time - time.time()))
+            raise ScreenStateError(
+                f"{STATES['result']}になりませんでした ({SCREEN_STATE_RESULT_TIMEOUT:g}秒)"
+            )
         return False
 
     def _calculate_available_attempts(self) -> int:
@@ -254,11 +621,12 @@ class GameLogic:
                 )
 
         if total_points > 0:
-            calc = total_points // 1500
+            calc = total_points // POINTS_PER_ATTEMPT
             self.logger.info(
                 f"Total Points: {total_points}. Calculated Max Attempts: {calc}"
             )
             self.total_points_start = total_points
+            self.profiles.set_material_points(total_points, self.profile)
             return calc
         else:
             self.logger.error("Failed to calculate points using OCR.")
@@ -278,93 +646,40 @@ class GameLogic:
 
     def _perform_reroll_action(self):
         self.input_manager.execute_reroll_sequence()
+        self.rerolls_performed += 1
 
-    def _analyze_result(self) -> list[str]:
+    def _analyze_result(self) -> tuple[list[str], float | None]:
+        """検出したスキルと、その中で最も低い認識スコア (検出なしの場合は None)"""
         cropped_img = self.screen_reader.get_skill_area_image()
-        skills = self.ocr.extract_text(cropped_img)
-        valid_skills = [s.strip() for s in skills if s.strip()]
-        return valid_skills
+        lines = self.ocr.extract_text_with_scores(cropped_img)
+        valid = [(text.strip(), score) for text, score in lines if text.strip()]
+        valid_skills = [text for text, _ in valid]
+        score = min((score for _, score in valid), default=None)
+        return valid_skills, score
 
     def _check_combination_target(
         self, detected_skills: list[str]
     ) -> tuple[bool, bool]:
-        if not self.target_combinations:
+        if not self.target_query:
             return False, False
 
-        for combination in self.target_combinations:
-            all_match_in_combo = True
-            all_exact_match = True
-
-            for target_skill in combination:
-                found_this_skill = False
-                found_exact_skill = False
-
-                for detected in detected_skills:
-                    if self._is_fuzzy_match(target_skill, detected):
-                        # 追加検証: この検出された文字列は本当にターゲットスキルか？
-                        # 全スキルリストの中で、ターゲットスキルよりも高い類似度を持つスキルがあるか確認する
-                        score_target = calculate_similarity(detected, target_skill)
-
-                        best_match_other_score = 0.0
-                        best_match_other_skill = ""
-
-                        for skill in ALL_SKILLS:
-                            if skill == target_skill:
-                                continue
-
-                            score = calculate_similarity(detected, skill)
-                            if score > best_match_other_score:
-                                best_match_other_score = score
-                                best_match_other_skill = skill
-
-                        # 他のスキルの方が明らかに近い場合は誤検出として扱う
-                        # ただし同率の場合はターゲットの可能性を残す
-                        if best_match_other_score > score_target:
-                            self.logger.info(
-                                f"Filtered out false positive: '{detected}' matched '{target_skill}' ({score_target:.2f}) "
-                                f"but matches '{best_match_other_skill}' ({best_match_other_score:.2f}) better."
-                            )
-                            continue
-
-                        found_this_skill = True
-                        if target_skill in detected:
-                            found_exact_skill = True
-                        break
-
-                if not found_this_skill:
-                    all_match_in_combo = False
-                    break
-
-                if not found_exact_skill:
-                    all_exact_match = False
-
-            if all_match_in_combo:
-                self.logger.info(f"Combination Matched: {combination}")
-                return True, all_exact_match
-
-        return False, False
-
-    def _is_fuzzy_match(self, target: str, skill: str) -> bool:
-        if target in skill:
-            return True
-
-        len_t = len(target)
-        len_s = len(skill)
-
-        if len_s < len_t:
-            ratio = SequenceMatcher(None, target, skill).ratio()
-            return ratio >= MATCH_THRESHOLD
+        # 検出結果を正規IDに変換し、展開済みの条件を辞書引きで判定する
+        series_id, group_id, confidence = canonicalize_skills(
+            detected_skills, self.corrections, MATCH_THRESHOLD
+        )
+        entry = self.target_query.match(series_id, group_id)
+        if entry is None:
+            return False, False
 
-        for i in range(len_s - len_t + 1):
-            window = skill[i : i + len_t]
-            ratio = SequenceMatcher(None, target, window).ratio()
-            if ratio >= MATCH_THRESHOLD:
-                return True
-        return False
+        self.logger.info(
+            f"Combination Matched: {entry.label()} (confidence: {confidence:.2f})"
+        )
+        return True, confidence >= 1.0
 
     def _save_screenshot(
         self, skills: list[str], prefix: str = "", exact_match: bool = True
     ):
+        # 中断が要求されていても結果の画面は表示されたままのため保存する
         safe_skills = (
             "+".join(skills).replace("/", "_").replace("\\", "_").replace(":", "_")
         )
@@ -397,33 +712,153 @@ class GameLogic:
                 f"Updating table with {len(self.current_session_results)} results..."
             )
             try:
-                self.table_manager.update_table(
-                    weapon=self.weapon_name,
-                    element=self.weapon_element,
-                    new_results=self.current_session_results,
-                    confirmed_count=self.confirmed_count,
-                )
+                self._write_pending_results()
+                # 1回ごとの更新はジャーナルに追記されるため、終了時にCSVへ反映しておく
+                # (表計算ソフトで開く厳選表が最新になるように)
+                self.table_manager.compact()
+                self.checkpoint.finish()
             except Exception as e:
+                # チェックポイントを残し、次回起動時に反映できるようにする
+                self.checkpoint.close()
                 self.logger.error(f"Failed to update table: {e}", exc_info=True)
         else:
+            self.checkpoint.finish()
             self.logger.warning("No results to update in table.")
 
+        if self.total_points_start:
+            # 厳選ルートの予算計算用に、残りのポイントを記録する
+            remaining = max(
+                0, self.total_points_start - self.rerolls_performed * POINTS_PER_ATTEMPT
+            )
+            self.profiles.set_material_points(remaining, self.profile)
+
+        if self.calibrator is not None and self.calibrator.overheads:
+            self.calibration_summary = self.calibrator.save(self.delays)
+            self.logger.info(
+                f"Calibration: {self.calibration_summary['delays_before']} -> "
+                f"{self.calibration_summary['delays_after']}, attempts/hour "
+                f"{self.calibration_summary['attempts_per_hour_before']} -> "
+                f"{self.calibration_summary['attempts_per_hour_after']}"
+            )
+
+        self.corrections.save()
         self._generate_report()
 
+    def _known_cell(self, count: int):
+        """早送りできる (厳選表に記録済みの) 回数ならそのセルを返す"""
+        if not self.fast_forward or self.desync_detected:
+            return None
+        cell = self.table_manager.get_cell(
+            count, f"{self.weapon_name}_{self.weapon_element}"
+        )
+        # 空欄は未記録と区別できないため、記録し直す
+        if cell is None or not cell.text:
+            return None
+        return cell
+
+    def _needs_recognition(self, known) -> bool:
+        """記録済みの回数でも画面を読み取る必要があるか"""
+        # N回に1回は表とずれていないか照合する
+        if self.fast_forwarded % self.fast_forward_verify_interval == (
+            self.fast_forward_verify_interval - 1
+        ):
+            return True
+        # 当たりで停止する場合は、停止する回を実際に確認する
+        if self.stop_on_match and self.target_query:
+            return self.target_query.match(known.series_id, known.group_id) is not None
+        return False
+
+    def _record_fast_forward(self, known):
+        """早送りした回の結果として厳選表の値を記録する"""
+        self.fast_forwarded += 1
+        self.current_session_results.append(known.text)
+        self.current_session_scores.append(None)
+        self.checkpoint.append(
+            self.confirmed_count + len(self.current_session_results), known.text
+        )
+        # 表と同じ値のため、書き込み済みとして扱う
+        if self.table_written == len(self.current_session_results) - 1:
+            self.table_written += 1
+
+        is_target = bool(
+            self.target_query
+            and self.target_query.match(known.series_id, known.group_id)
+        )
+        self.history.append(
+            {
+                "attempt": self.current_attempt,
+                "skills": known.text.split("+"),
+                "target": is_target,
+                "timestamp": datetime.now().strftime("%H:%M:%S"),
+                "fast_forward": True,
+            }
+        )
+        self.logger.info(f"Fast-forwarded (table): {known.text}")
+
+    def _verify_known(self, count: int, known, skills: list[str]) -> bool:
+        """読み取った結果が厳選表の記録と一致するか確認する"""
+        self.fast_forwarded += 1
+        series_id, group_id, _ = canonicalize_skills(
+            skills, self.corrections, MATCH_THRESHOLD
+        )
+        if (series_id, group_id) == (known.series_id, known.group_id):
+            self.logger.info(f"Fast-forward check passed at count {count}.")
+            return True
+
+        self.logger.error(
+            f"Fast-forward desync at count {count}: table has '{known.text}', "
+            f"detected {skills}. Stopping."
+        )
+        return False
+
+    def _write_pending_results(self):
+        """まだ厳選表に書き込んでいない結果を書き込む"""
+        pending = self.current_session_results[self.table_written :]
+        if not pending:
+            return
+        self.table_manager.update_table(
+            weapon=self.weapon_name,
+            element=self.weapon_element,
+            new_results=pending,
+            confirmed_count=self.confirmed_count + self.table_written,
+            scores=self.current_session_scores[self.table_written :],
+        )
+        self.table_written += len(pending)
+
     def _generate_report(self):
         report_path = self.session_dir / f"{REPORT_NAME}.md"
         try:
             with open(report_path, "w", encoding="utf-8") as f:
                 f.write(f"# {REPORT_NAME}\n\n")
                 f.write(f"- **実行日時**: {self.session_timestamp}\n")
+                f.write(f"- **プロファイル**: {self.profile}\n")
                 f.write(f"- **武器名**: {self.weapon_name}\n")
                 f.write(f"- **属性**: {self.weapon_element}\n")
                 f.write(f"- **開始時ポイント合計**: {self.total_points_start}\n")
                 f.write(f"- **スキル再付与を行った回数**: {self.current_attempt}\n")
+                if self.fast_forward:
+                    f.write(f"- **早送りした回数**: {self.fast_forwarded}\n")
+                if self.desync_detected:
+                    f.write(
+                        "- **厳選表とのずれを検出したため停止しました。確定済み回数を確認してください。**\n"
+                    )
+                if self.calibration_summary:
+                    summary = self.calibration_summary
+                    f.write(
+                        f"- **待機時間の計測**: {len(self.calibrator.overheads)}回\n"
+                    )
+                    for name, before in summary["delays_before"].items():
+                        f.write(
+                            f"  - {name}: {before:g}秒 → {summary['delays_after'][name]:g}秒\n"
+                        )
+                    f.write(
+                        f"  - 1時間あたりの見込み回数: {summary['attempts_per_hour_before']:g} → "
+                        f"{summary['attempts_per_hour_after']:g}\n"
+                    )
                 f.write(f"- **ターゲットの組み合わせ**:\n")
-                if self.target_combinations:
-                    for combo in self.target_combinations:
-                        f.write(f"  - {combo}\n")
+                if self.target_query:
+                    for entry in self.target_query.entries:
+                        f.write(f"  - {entry.label()} (重み: {entry.weight})\n")
                 else:
                     f.write("  - (なし)\n")
                 f.write("\n")
@@ -448,8 +883,16 @@ class GameLogic:
                     )
                     target_mark = "**あり**" if entry["target"] else "-"
                     safe_skills = skills_str.replace("\n", " ")
+                    if entry.get("fast_forward"):
+                        safe_skills += " (早送り)"
                     f.write(
                         f"| {entry['attempt']} | {entry['timestamp']} | {safe_skills} | {target_mark} |\n"
                     )
         except Exception as e:
             self.logger.error(f"Failed to generate report: {e}")
+
+
+def _find_name(text: str, names: list[str]) -> str | None:
+    """text に含まれる名前のうち最も長いもの (「ガンランス」を「ランス」と誤認しないため)"""
+    found = [name for name in names if name in text]
+    return max(found, key=len) if found else None
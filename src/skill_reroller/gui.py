@@ -17,11 +17,27 @@ from .config import (
     ELEMENTS,
     LAST_WEAPON,
     LAST_ELEMENT,
-    CURRENT_CONFIRMED_COUNT,
     MATCH_THRESHOLD,
+    TARGET_QUERY,
+    FAST_FORWARD,
+    INCOME_PER_HUNT,
+    POINTS_PER_ATTEMPT,
+    RECOMMEND_ROWS,
+    SKILL_WEIGHTS,
+    CALIBRATION_CYCLES,
+    STOP_KEY,
 )
 from .game_logic import GameLogic
-from .table_manager import TableManager  # インポート追加
+from .table_manager import column_sort_key
+from .table_profiles import TableProfiles
+from .ocr_corrections import CorrectionMap
+from .target_query import TargetQuery
+from .route_planner import RoutePlanner
+from .column_recommender import ColumnRecommender
+from .analytics import TableAnalytics, SkillWeights
+from .session_checkpoint import SessionCheckpoint
+from .batch_queue import BatchQueue
+from .cancellation import CancellationToken
 
 
 def setup_logging(timestamp: str):
@@ -52,7 +68,16 @@ def create_app(page: ft.Page):
     page.window.max_width = 960
     page.window.max_height = 2160
 
-    table_manager = TableManager()  # TableManagerの初期化
+    corrections = CorrectionMap()
+    # セーブデータごとの厳選表。選択中のプロファイルの厳選表は profiles.table() で参照する
+    profiles = TableProfiles(corrections=corrections)
+
+    def merge_unfinished_session():
+        # 前回異常終了したセッションがあれば、記録済みの結果を厳選表に反映する
+        checkpoint = SessionCheckpoint(output_dir=str(profiles.profile_dir()))
+        return checkpoint.merge_unfinished(profiles.table())
+
+    unfinished_session = merge_unfinished_session()
 
     def get_directory_result(e):
         if e.path:
@@ -106,7 +131,7 @@ def create_app(page: ft.Page):
 
     confirmed_count_input = ft.TextField(
         label="確定済み回数",
-        value=str(CURRENT_CONFIRMED_COUNT),
+        value=str(profiles.confirmed_count()),
         expand=True,
         keyboard_type=ft.KeyboardType.NUMBER,
         input_filter=ft.InputFilter(
@@ -123,10 +148,10 @@ def create_app(page: ft.Page):
     )
 
     def reload_table_action(e):
-        # TableManagerのデータを再読み込み
-        table_manager.data.clear()
-        table_manager.headers = ["回数"]
-        table_manager.load_table()
+        # 補正辞書を読み込み直し、厳選表は前回以降の更新分だけを取り込む
+        corrections.entries.clear()
+        corrections.load()
+        profiles.table().refresh()
 
         page.snack_bar = ft.SnackBar(
             ft.Text("厳選表を再読み込みしました"),
@@ -140,11 +165,121 @@ def create_app(page: ft.Page):
         spacing=10,
     )
 
+    # --- プロファイル (セーブデータ) ---
+    profile_dropdown = ft.Dropdown(
+        label="プロファイル",
+        options=[ft.dropdown.Option(name) for name in profiles.names()],
+        value=profiles.active,
+        expand=True,
+        border_color=ft.Colors.GREY_500,
+    )
+
+    new_profile_input = ft.TextField(
+        label="新しいプロファイル名",
+        expand=True,
+        border_color=ft.Colors.GREY_500,
+    )
+
+    def on_profile_change(e):
+        # 切り替えは参照先を変えるだけ (読み込み済みの厳選表はそのまま使う)
+        nonlocal unfinished_session
+        profiles.switch(profile_dropdown.value)
+        confirmed_count_input.value = str(profiles.confirmed_count())
+        material_points_input.value = str(profiles.material_points())
+        unfinished_session = merge_unfinished_session()
+        update_resume_checkbox()
+        load_batch_queue()
+        page.update()
+
+    def add_profile_action(e):
+        try:
+            profiles.create(new_profile_input.value or "")
+        except ValueError as ex:
+            show_error(str(ex))
+            return
+
+        profile_dropdown.options = [
+            ft.dropdown.Option(name) for name in profiles.names()
+        ]
+        profile_dropdown.value = new_profile_input.value.strip()
+        new_profile_input.value = ""
+        on_profile_change(e)
+
+    profile_dropdown.on_change = on_profile_change
+
+    add_profile_button = ft.IconButton(
+        icon=ft.Icons.ADD,
+        tooltip="プロファイルを追加",
+        on_click=add_profile_action,
+    )
+
+    profile_row = ft.Row(
+        [profile_dropdown, new_profile_input, add_profile_button],
+        spacing=10,
+    )
+
     confirmed_count_row = ft.Row(
         [confirmed_count_input],
         alignment=ft.MainAxisAlignment.CENTER,
     )
 
+    # --- 現在の回数の特定 ---
+    locate_input = ft.TextField(
+        label="直近の結果から現在の回数を探す (1行に1回、古い順)",
+        multiline=True,
+        min_lines=2,
+        max_lines=6,
+        hint_text="巨戟龍の黙示録 + ヌシの魂\n黒蝕竜の力 + ヌシの誇り",
+        expand=True,
+        border_color=ft.Colors.GREY_500,
+        hint_style=ft.TextStyle(color=ft.Colors.GREY_500),
+    )
+
+    def locate_action(e):
+        observed = [
+            "+".join(part.strip() for part in line.split("+") if part.strip())
+            for line in (locate_input.value or "").splitlines()
+            if line.strip()
+        ]
+        if not observed:
+            show_error("直近の結果を入力してください")
+            return
+
+        positions = profiles.table().locate(
+            weapon_dropdown.value, element_dropdown.value, observed
+        )
+        if not positions:
+            show_error("厳選表に一致する位置が見つかりませんでした")
+            return
+        if len(positions) > 1:
+            candidates = ", ".join(f"{count}回目" for count, _ in positions[:10])
+            show_error(
+                f"候補が複数あります ({candidates})。結果をもう少し追加してください"
+            )
+            return
+
+        # 一致する位置が1つに絞れた場合は確定済み回数に反映する
+        count, mismatches = positions[0]
+        confirmed_count_input.value = str(count)
+        profiles.set_confirmed_count(count)
+        message = f"現在の回数は{count}回目です"
+        if mismatches:
+            message += f" ({mismatches}件の不一致あり)"
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=ft.Colors.GREEN)
+        page.snack_bar.open = True
+        page.update()
+
+    locate_button = ft.IconButton(
+        icon=ft.Icons.MY_LOCATION,
+        tooltip="厳選表から現在の回数を探す",
+        on_click=locate_action,
+    )
+
+    locate_row = ft.Row(
+        [locate_input, locate_button],
+        alignment=ft.MainAxisAlignment.CENTER,
+    )
+
     skill_sets = []
 
     max_attempts_input = ft.TextField(
@@ -159,12 +294,116 @@ def create_app(page: ft.Page):
         border_color=ft.Colors.GREY_500,
     )
 
+    material_points_input = ft.TextField(
+        label="所持ポイント (厳選ルートの予算)",
+        value=str(profiles.material_points()),
+        expand=True,
+        keyboard_type=ft.KeyboardType.NUMBER,
+        input_filter=ft.InputFilter(
+            allow=True, regex_string=r"^\d*$", replacement_string=""
+        ),
+        text_align=ft.TextAlign.RIGHT,
+        border_color=ft.Colors.GREY_500,
+    )
+
+    income_input = ft.TextField(
+        label="1回の狩猟で得られるポイント",
+        value=str(INCOME_PER_HUNT),
+        expand=True,
+        keyboard_type=ft.KeyboardType.NUMBER,
+        input_filter=ft.InputFilter(
+            allow=True, regex_string=r"^\d*$", replacement_string=""
+        ),
+        text_align=ft.TextAlign.RIGHT,
+        border_color=ft.Colors.GREY_500,
+    )
+
     return_title_checkbox = ft.Checkbox(
         label="終了後セーブせずタイトルに戻る",
         value=RETURN_TO_TITLE,
         expand=True,
     )
 
+    fast_forward_checkbox = ft.Checkbox(
+        label="厳選表に記録済みの回数は早送りする (OCRを省略)",
+        value=FAST_FORWARD,
+    )
+
+    calibration_checkbox = ft.Checkbox(
+        label=f"待機時間を計測する (最初の{CALIBRATION_CYCLES}回、結果は通常どおり記録)",
+        value=False,
+    )
+
+    # --- バッチ実行 (複数の武器種・属性を続けて記録) ---
+    batch_checkbox = ft.Checkbox(
+        label="バッチ実行 (複数の武器種・属性を続けて記録する)",
+        value=False,
+    )
+
+    batch_input = ft.TextField(
+        label="バッチのジョブ (1行に1件: 武器 属性 回数)",
+        multiline=True,
+        min_lines=2,
+        max_lines=8,
+        hint_text="大剣 火 100\n太刀 水 100",
+        border_color=ft.Colors.GREY_500,
+        hint_style=ft.TextStyle(color=ft.Colors.GREY_500),
+    )
+
+    batch_status_text = ft.Text("", size=12, color=ft.Colors.GREY_500)
+
+    def load_batch_queue():
+        """選択中のプロファイルのバッチのジョブと進捗を表示する"""
+        queue = BatchQueue(str(profiles.profile_dir()))
+        batch_input.value = "\n".join(
+            f"{job.weapon} {job.element} {job.attempts}" for job in queue.jobs
+        )
+        batch_status_text.value = queue.progress_text()
+
+    load_batch_queue()
+
+    def update_batch_status(queue):
+        batch_status_text.value = queue.progress_text()
+        page.update()
+
+    def prepare_batch_queue():
+        """
+        バッチのジョブを解析してキューを用意する。書式エラーの場合はエラーを表示して None を返す。
+        ジョブが前回と同じで未完了のジョブがあれば、その続きから再開する。
+        """
+        try:
+            jobs = BatchQueue.parse(batch_input.value or "")
+        except ValueError as e:
+            show_error(f"バッチのジョブの書式が正しくありません: {e}")
+            return None
+        if not jobs:
+            show_error("バッチのジョブを入力してください")
+            return None
+
+        queue = BatchQueue(str(profiles.profile_dir()))
+        previous = [(job.weapon, job.element, job.attempts) for job in queue.jobs]
+        current = [(job.weapon, job.element, job.attempts) for job in jobs]
+        if previous != current or not queue.has_unfinished():
+            queue.set_jobs(jobs)
+        update_batch_status(queue)
+        return queue
+
+    resume_checkbox = ft.Checkbox(value=False)
+
+    def update_resume_checkbox():
+        resume_checkbox.label = (
+            f"中断したセッションの続きから記録する ({unfinished_session['weapon']}_{unfinished_session['element']}、"
+            f"{unfinished_session['confirmed_count'] + len(unfinished_session['results'])}回目まで記録済み)"
+            if unfinished_session
+            else ""
+        )
+        resume_checkbox.value = False
+        resume_checkbox.visible = bool(
+            unfinished_session and unfinished_session["results"]
+        )
+
+    update_resume_checkbox()
+
     stop_match_checkbox = ft.Checkbox(
         label="当たりが出たら停止",
         value=STOP_ON_MATCH,
@@ -202,6 +441,44 @@ def create_app(page: ft.Page):
         )
         skill_sets.append((series_skill, group_skill))
 
+    target_query_input = ft.TextField(
+        label="詳細条件 (任意)",
+        value=TARGET_QUERY,
+        multiline=True,
+        min_lines=2,
+        max_lines=8,
+        hint_text="* + ヌシの魂 @ 2\n巨戟龍の黙示録|黒蝕竜の力 + ヌシの魂|ヌシの誇り",
+        border_color=ft.Colors.GREY_500,
+        hint_style=ft.TextStyle(color=ft.Colors.GREY_500),
+    )
+
+    skill_weights_input = ft.TextField(
+        label="スキルの重み (任意)",
+        value=SKILL_WEIGHTS,
+        multiline=True,
+        min_lines=2,
+        max_lines=8,
+        hint_text="巨戟龍の黙示録 @ 3\nヌシの魂 @ 2",
+        border_color=ft.Colors.GREY_500,
+        hint_style=ft.TextStyle(color=ft.Colors.GREY_500),
+    )
+
+    def parse_skill_weights():
+        """スキルの重みを解析する。書式エラーの場合はエラーを表示して None を返す。"""
+        try:
+            return SkillWeights.parse(skill_weights_input.value or "")
+        except ValueError as e:
+            show_error(f"スキルの重みの書式が正しくありません: {e}")
+            return None
+
+    def parse_target_query():
+        """詳細条件を解析する。書式エラーの場合はエラーを表示して None を返す。"""
+        try:
+            return TargetQuery.parse(target_query_input.value or "")
+        except ValueError as e:
+            show_error(f"詳細条件の書式が正しくありません: {e}")
+            return None
+
     run_button = ft.Button(
         "厳選開始",
         icon=ft.Icons.PLAY_ARROW,
@@ -228,10 +505,14 @@ def create_app(page: ft.Page):
     )
 
     def open_output_folder(e):
+        # ジャーナルに溜まっている更新をCSVに反映してから開く
+        profiles.table().compact()
+
         path = output_path.value
         if path:
-            # 相対パスを絶対パスに変換
-            abs_path = Path(path).resolve()
+            # 相対パスを絶対パスに変換 (プロファイルのフォルダーを開く)
+            profile_subdir = profiles.profile_dir().relative_to(profiles.output_dir)
+            abs_path = (Path(path) / profile_subdir).resolve()
             if abs_path.exists():
                 os.startfile(str(abs_path))
             else:
@@ -282,14 +563,23 @@ def create_app(page: ft.Page):
             config_data["reroll"]["max_attempts"] = max_attempts_val
             config_data["reroll"]["stop_on_match"] = stop_match_checkbox.value
             config_data["reroll"]["return_to_title"] = return_title_checkbox.value
+            config_data["reroll"]["fast_forward"] = fast_forward_checkbox.value
+            config_data["reroll"]["income_per_hunt"] = (
+                int(income_input.value) if income_input.value.isdigit() else 0
+            )
+            if material_points_input.value.isdigit():
+                profiles.set_material_points(int(material_points_input.value))
 
             try:
                 confirmed_cnt = int(confirmed_count_input.value)
             except ValueError:
                 confirmed_cnt = 0
             config_data["reroll"]["current_confirmed_count"] = confirmed_cnt
+            profiles.set_confirmed_count(confirmed_cnt)
 
             config_data["reroll"]["target_combinations"] = new_target_combinations
+            config_data["reroll"]["target_query"] = target_query_input.value or ""
+            config_data["reroll"]["skill_weights"] = skill_weights_input.value or ""
 
             # 前回選択値を保存
             if "selection" not in config_data:
@@ -308,18 +598,30 @@ def create_app(page: ft.Page):
             logging.getLogger(__name__).error(error_msg)
             show_error(error_msg)
 
+    # 実行中の中断要求 (実行していない間は None)
+    cancel_token = None
+
     def on_run_click(e):
+        nonlocal cancel_token
+        if cancel_token is not None:
+            # 実行中は停止ボタンとして使い、中断キーと同じく中断を要求する
+            cancel_token.set()
+            run_button.disabled = True
+            page.update()
+            return
+
         # 二重起動防止とボタン表示変更
-        run_button.text = "Alt+Qで停止"
+        cancel_token = CancellationToken()
+        run_button.text = f"停止 ({STOP_KEY.title()})"
         run_button.icon = ft.Icons.STOP
         run_button.style.bgcolor = ft.Colors.GREY_700
-        run_button.disabled = True
         page.update()
 
         save_settings()
 
         # 別スレッドで実行 (GUIフリーズ防止)
         def run_game():
+            nonlocal cancel_token
             try:
                 timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                 setup_logging(timestamp)
@@ -333,12 +635,26 @@ def create_app(page: ft.Page):
                         g_val = group_skill.value if group_skill.value else ""
                         target_combos.append([s_val, g_val])
 
-                if not target_combos:
+                if parse_target_query() is None:
+                    return
+
+                if not target_combos and not target_query_input.value.strip():
                     msg = "スキル組み合わせが選択されていません"
                     logger.warning(msg)
                     show_error(msg)
                     return
 
+                batch_queue = None
+                weapon_name = weapon_dropdown.value
+                weapon_element = element_dropdown.value
+                if batch_checkbox.value:
+                    batch_queue = prepare_batch_queue()
+                    if batch_queue is None:
+                        return
+                    # 最初のジョブの武器のスキル再付与画面から始める
+                    _, first_job = next(batch_queue.unfinished())
+                    weapon_name, weapon_element = first_job.weapon, first_job.element
+
                 logger.info("Starting Artian Weapon Reroll Automation Tool")
                 logger.info(f"Target combinations: {target_combos}")
 
@@ -353,15 +669,30 @@ def create_app(page: ft.Page):
                     target_combination=target_combos,
                     stop_on_match=stop_match_checkbox.value,
                     return_to_title=return_title_checkbox.value,
-                    weapon_name=weapon_dropdown.value,  # 新規引数
-                    weapon_element=element_dropdown.value,  # 新規引数
+                    weapon_name=weapon_name,  # 新規引数
+                    weapon_element=weapon_element,  # 新規引数
                     confirmed_count=(
                         int(confirmed_count_input.value)
                         if confirmed_count_input.value.isdigit()
                         else 0
                     ),  # 新規引数
+                    target_query=target_query_input.value or "",
+                    resume=resume_checkbox.value,
+                    profile=profiles.active,
+                    # 画面と同じ厳選表に書き込み、1回ごとの結果を厳選ルートに反映する
+                    table_manager=profiles.table(),
+                    profiles=profiles,
+                    corrections=corrections,
+                    fast_forward=fast_forward_checkbox.value,
+                    calibration_cycles=(
+                        CALIBRATION_CYCLES if calibration_checkbox.value else 0
+                    ),
+                    cancel_token=cancel_token,
                 )
-                game.run()
+                if batch_queue is not None:
+                    game.run_batch(batch_queue, on_progress=update_batch_status)
+                else:
+                    game.run()
 
                 logger.info("Tool finished.")
 
@@ -370,6 +701,11 @@ def create_app(page: ft.Page):
                 logger.critical(f"Unhandled exception: {ex}", exc_info=True)
                 show_error(f"エラーが発生しました: {ex}")
             finally:
+                cancel_token = None
+                resume_checkbox.value = False
+                resume_checkbox.visible = False
+                # 実行後の残りポイントを厳選ルートの予算に反映する
+                material_points_input.value = str(profiles.material_points())
                 run_button.text = "厳選開始"
                 run_button.icon = ft.Icons.PLAY_ARROW
                 run_button.style.bgcolor = ft.Colors.PRIMARY
@@ -405,14 +741,31 @@ def create_app(page: ft.Page):
                     color=ft.Colors.PRIMARY,
                 ),
                 path_row,  # 移動
+                profile_row,
                 ft.Divider(height=1),  # 追加
                 selection_row,
                 ft.Row([max_attempts_input], alignment=ft.MainAxisAlignment.START),
+                ft.Row(
+                    [material_points_input, income_input],
+                    alignment=ft.MainAxisAlignment.START,
+                    spacing=10,
+                ),
                 ft.Row(
                     [return_title_checkbox, stop_match_checkbox],
                     alignment=ft.MainAxisAlignment.START,
                     spacing=15,
                 ),
+                fast_forward_checkbox,
+                calibration_checkbox,
+                batch_checkbox,
+                batch_input,
+                batch_status_text,
+                ft.Text(
+                    "最初のジョブの武器のスキル再付与画面を開いてから開始してください。2件目以降はタイトルに戻ってロードし直し、config.toml の [batch] のキーで移動します (未設定の場合は手動で画面を開くまで待ちます)。画面の武器名・属性が一致しない場合は記録せずに停止します。",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                ),
+                resume_checkbox,
                 ft.Divider(height=1),  # 追加
                 confirmed_count_row,
                 ft.Text(  # 内容修正
@@ -420,6 +773,12 @@ def create_app(page: ft.Page):
                     size=12,
                     color=ft.Colors.GREY_500,
                 ),
+                locate_row,
+                ft.Text(
+                    "回数がわからなくなった場合は、セーブ後に手動で何回か再付与した結果を入力すると、選択中の武器種・属性の厳選表から位置を探します。位置が1つに絞れたら確定済み回数に反映します。",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                ),
             ],
             spacing=15,
         ),
@@ -453,6 +812,19 @@ def create_app(page: ft.Page):
                         color=ft.Colors.GREY_500,
                     ),
                     *skill_controls,
+                    ft.Divider(height=1),
+                    target_query_input,
+                    ft.Text(
+                        "1行に1条件を「シリーズ + グループ」の形式で書きます。* は任意のスキル、| は「いずれか」、末尾の @ 数値は重みです。",
+                        size=12,
+                        color=ft.Colors.GREY_500,
+                    ),
+                    skill_weights_input,
+                    ft.Text(
+                        "1行に1スキルを「スキル名 @ 重み」の形式で書きます。厳選ルートで、シリーズとグループの重みの合計 (ターゲットに該当する場合はその重みも加算) が高い武器を回数ごとに表示します。",
+                        size=12,
+                        color=ft.Colors.GREY_500,
+                    ),
                 ],
                 spacing=15,
             ),
@@ -477,18 +849,21 @@ def create_app(page: ft.Page):
 
 #### 厳選表
 
-本ツールで厳選を実行すると`reroll_table.csv`というファイルが設定したフォルダーに自動で作成、更新されます。これは各武器各属性において「何回目にどのスキルの組み合わせが出たか」を記録した表、いわゆる厳選表です。ExcelやGoogle スプレッドシートなどで開けます。またこの表から導出した「何回目にどの武器にスキル付与すればよいか」を「厳選ルート」ボタンから確認できます。
+本ツールで厳選を実行すると`reroll_table.csv`というファイルが設定したフォルダーに自動で作成、更新されます。これは各武器各属性において「何回目にどのスキルの組み合わせが出たか」を記録した表、いわゆる厳選表です。ExcelやGoogle スプレッドシートなどで開けます。厳選中の更新はいったん`reroll_table_journal.csv`に追記され、「厳選表の場所」ボタンを押したときや一定量溜まったときに`reroll_table.csv`へ反映されます。またこの表から導出した「何回目にどの武器にスキル付与すればよいか」を「厳選ルート」ボタンから確認できます。
 
 なお表の更新時には「確定済み回数」より後のデータのみを更新します。ゲーム内で厳選後セーブを行って結果を確定させた回数をここに入力してください。例えば、厳選を開始して10回目に狙いたいスキルが出てセーブした場合10と入力してください。
 
 ### 備考
 
 - **厳選中に他のウィンドウに切り替えないでください！**
+- 複数のセーブデータで厳選する場合はプロファイルを追加して切り替えてください。厳選表と確定済み回数をプロファイルごとに記録します (既定以外のプロファイルは出力フォルダーの`profiles`内に保存されます)。
 - 途中で停止した場合もレポートは保存されます。
+- ツールが異常終了した場合も、それまでの結果は次回起動時に厳選表へ反映されます。ゲームをロードし直していなければ「中断したセッションの続きから記録する」で続きから記録できます。
 - スキルの組み合わせはシリーズスキルかグループスキルのどちらか一方のみの設定でも問題ありません。
 - 所持している素材分で抽選できる回数以上を指定した場合は、所持している素材分抽選しきった段階で終了します。
 - 「当たりが出たら停止」をチェックしておけば、設定したスキルの組み合わせが出たらそこで停止します。スキルを実際に付与するかどうかの確認画面で終了します。
 - 「終了後セーブせずタイトルに戻る」のチェックを外すとタイトルに戻りません。
+- 「記録済みの回数は早送りする」をチェックすると、厳選表に記録済みの回数は画面を読み取らずに短い待機で進めます。一定回数ごとに画面と厳選表を照合し、ずれていた場合は停止します。
 - 武器種によっては状態異常属性と無属性のテーブルが同じ場合があるかもしれません。
 
 ### 本ツールを作った理由
@@ -536,7 +911,456 @@ def create_app(page: ft.Page):
     page.padding = 0
 
     # --- Routes View ---
+    # 表示中の厳選ルート画面の状態。厳選表の変更通知を受けて変わった部分だけを更新する
+    routes_state = {}
+    # 画面遷移と実行スレッドからの更新が重ならないようにする (作り直しの中で再び取得する)
+    routes_lock = threading.RLock()
+    # 厳選表ごとの集計 (表が変わらなければ配列を作り直さない)
+    analytics_by_table = {}
+    subscribed_tables = set()
+
+    def watch_table(table_manager):
+        if id(table_manager) in subscribed_tables:
+            return
+        subscribed_tables.add(id(table_manager))
+        table_manager.subscribe(lambda change: on_table_change(table_manager, change))
+
+    def build_stats_card(weapon_element, combos):
+        combo_lines = []
+        for combo_str, count in sorted(combos.items(), key=lambda x: -x[1]):
+            combo_lines.append(
+                ft.Row(
+                    [
+                        ft.Text("•", size=14, color=ft.Colors.AMBER),
+                        ft.Text(
+                            f"{combo_str}: {count}回",
+                            size=14,
+                        ),
+                    ],
+                    spacing=5,
+                )
+            )
+
+        return ft.Card(
+            content=ft.Container(
+                content=ft.Column(
+                    [
+                        ft.Text(
+                            weapon_element,
+                            size=16,
+                            weight=ft.FontWeight.BOLD,
+                        ),
+                        ft.Divider(height=5, color="transparent"),
+                        *combo_lines,
+                    ]
+                ),
+                padding=15,
+            ),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_match_card(m):
+        count = m["count"]
+        w_e = m["weapon_element"]
+        combo = m["matched_combo"]
+        detected = m.get("raw_skills", "")
+        is_exact_match = m.get("is_exact_match", True)
+
+        # コンボ表示用
+        combo_str = " + ".join([c for c in combo if c])
+
+        # タイトル行の要素を作成
+        title_row_controls = [
+            ft.Text(
+                f"{count}回目",
+                size=20,
+                weight=ft.FontWeight.BOLD,
+                color=ft.Colors.AMBER,
+            ),
+        ]
+
+        # カードコンテンツ
+        card_controls = [
+            ft.Row(
+                [
+                    ft.Row(
+                        title_row_controls,
+                        spacing=10,
+                        vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                    ),
+                    ft.Container(
+                        content=ft.Text(
+                            w_e,
+                            size=14,
+                            weight=ft.FontWeight.BOLD,
+                            color=ft.Colors.ON_PRIMARY_CONTAINER,
+                        ),
+                        bgcolor=ft.Colors.PRIMARY_CONTAINER,
+                        padding=ft.padding.symmetric(horizontal=10, vertical=5),
+                        border_radius=5,
+                    ),
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            ),
+            ft.Divider(height=10, color="transparent"),
+            ft.Text(
+                f"付与したいスキルの組み合わせ: {combo_str}",
+                size=14,
+                weight=ft.FontWeight.BOLD,
+            ),
+            ft.Text(
+                f"ゲーム画面のOCR結果: {detected}",
+                size=12,
+                color=ft.Colors.GREY_500,
+            ),
+        ]
+
+        if not is_exact_match:
+            card_controls.append(
+                ft.Text(
+                    "OCR結果が微妙に誤っているようです。念のため、「ゲーム画面のOCR結果」を確認して他のスキルの可能性がないか確認してください。",
+                    size=11,
+                    color=ft.Colors.RED_400,
+                    weight=ft.FontWeight.BOLD,
+                )
+            )
+
+        return ft.Card(
+            content=ft.Container(
+                content=ft.Column(card_controls),
+                padding=15,
+            ),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_plan_card(title, plan, note=None):
+        lines = [
+            ft.Text(title, size=16, weight=ft.FontWeight.BOLD),
+            ft.Text(
+                f"{plan.last_count}回目まで (当たり{plan.hits}回 / 捨て{plan.burns}回)",
+                size=13,
+                color=ft.Colors.GREY_500,
+            ),
+        ]
+        if note:
+            lines.append(ft.Text(note, size=12, color=ft.Colors.RED_400))
+        lines.append(ft.Divider(height=5, color="transparent"))
+
+        max_steps = 30
+        for step in plan.steps[:max_steps]:
+            if step.weapon_element is None:
+                label = (
+                    f"{step.start}回目"
+                    if step.length == 1
+                    else f"{step.start}〜{step.end}回目"
+                )
+                text = f"{label}: 捨て ({step.length}回、任意の武器)"
+                color = ft.Colors.GREY_500
+            else:
+                combo_str = " + ".join([c for c in step.combo if c])
+                text = f"{step.start}回目: {step.weapon_element} ({combo_str})"
+                color = None
+            lines.append(ft.Text(text, size=14, color=color))
+        if len(plan.steps) > max_steps:
+            lines.append(
+                ft.Text(
+                    f"...ほか{len(plan.steps) - max_steps}手",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                )
+            )
+        if not plan.steps:
+            lines.append(
+                ft.Text("該当する手順はありません。", color=ft.Colors.GREY_500)
+            )
+
+        return ft.Card(
+            content=ft.Container(content=ft.Column(lines, spacing=2), padding=15),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_budget_card(budget):
+        lines = [
+            ft.Text(
+                "所持ポイントで実行できるルート", size=16, weight=ft.FontWeight.BOLD
+            ),
+            ft.Text(
+                f"{budget.points}ポイント → {budget.attempts}回 (当たり{budget.plan.hits}回、重みの合計 {budget.plan.total_weight:g})",
+                size=14,
+            ),
+        ]
+        if budget.next_hit_points is not None:
+            lines.append(
+                ft.Text(
+                    f"次の当たりまで、あと{budget.next_hit_points}ポイント必要です",
+                    size=13,
+                )
+            )
+        if budget.required_points is not None:
+            shortfall = budget.required_points - budget.points
+            lines.append(
+                ft.Text(
+                    f"すべて揃えるには{budget.required_points}ポイント必要です"
+                    + (f" (あと{shortfall}ポイント)" if shortfall > 0 else " (予算内)"),
+                    size=13,
+                )
+            )
+        for extra, extra_points, gain in budget.marginal_attempts:
+            lines.append(
+                ft.Text(
+                    f"あと{extra_points}ポイント ({extra}回) 増やすと、重みの合計 +{gain:g}",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                )
+            )
+        for extra, gain in budget.marginal:
+            lines.append(
+                ft.Text(
+                    f"狩猟をあと{extra}回行うと、重みの合計 +{gain:g}",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                )
+            )
+        return ft.Card(
+            content=ft.Container(content=ft.Column(lines, spacing=2), padding=15),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_recommend_card(scores, rows):
+        lines = [
+            ft.Text("次に記録するとよい武器・属性", size=16, weight=ft.FontWeight.BOLD),
+            ft.Text(
+                f"{rows}回分を記録した場合に増える当たりの期待値 (1万ポイントあたり)",
+                size=13,
+                color=ft.Colors.GREY_500,
+            ),
+        ]
+        for score in scores[:5]:
+            lines.append(
+                ft.Text(
+                    f"{score.weapon_element}: {score.per_point * 10000:.2f} "
+                    f"(期待値 {score.expected_hits:.1f}、記録済み {score.recorded}/{rows}行)",
+                    size=14,
+                )
+            )
+        return ft.Card(
+            content=ft.Container(content=ft.Column(lines, spacing=2), padding=15),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_gaps_card(gaps):
+        lines = [
+            ft.Text(
+                "ターゲットの出現間隔 (いずれかの武器)",
+                size=16,
+                weight=ft.FontWeight.BOLD,
+            )
+        ]
+        for gap in gaps:
+            if not gap.occurrences:
+                text = f"{gap.label}: 出現なし"
+            elif gap.mean_gap is None:
+                text = f"{gap.label}: {gap.first}回目のみ"
+            else:
+                text = (
+                    f"{gap.label}: {gap.occurrences}回、"
+                    f"平均{gap.mean_gap:.1f}回おき (最大{gap.max_gap}回)"
+                )
+            lines.append(ft.Text(text, size=14))
+        return ft.Card(
+            content=ft.Container(content=ft.Column(lines, spacing=2), padding=15),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def build_picks_card(picks):
+        max_rows = 30
+        lines = [
+            ft.Text(
+                "回数ごとのおすすめ (スキルの重みの合計順)",
+                size=16,
+                weight=ft.FontWeight.BOLD,
+            )
+        ]
+        for pick in picks[:max_rows]:
+            entries = []
+            for weapon_element, score, series, group in pick.picks:
+                skills = " + ".join([c for c in (series, group) if c])
+                entries.append(f"{weapon_element} {score:g} ({skills})")
+            lines.append(ft.Text(f"{pick.count}回目: " + " / ".join(entries), size=13))
+        if len(picks) > max_rows:
+            lines.append(
+                ft.Text(
+                    f"...ほか{len(picks) - max_rows}回分",
+                    size=12,
+                    color=ft.Colors.GREY_500,
+                )
+            )
+        return ft.Card(
+            content=ft.Container(content=ft.Column(lines, spacing=2), padding=15),
+            margin=ft.margin.only(bottom=10),
+        )
+
+    def update_recommendations():
+        # 次に記録する列の候補 (所持ポイントがあればその回数分、なければ既定の回数分)
+        points = routes_state["points"]
+        rows = points // POINTS_PER_ATTEMPT if points else RECOMMEND_ROWS
+        scores = routes_state["recommender"].rank(routes_state["min_count"], rows)
+        routes_state["recommend_column"].controls = (
+            [build_recommend_card(scores, rows)] if scores else []
+        )
+
+    def update_plans():
+        # 表示中の検索結果から計画を立て直す (表全体は検索し直さない)
+        planner = routes_state["planner"]
+        min_count = routes_state["min_count"]
+        matches = [
+            m
+            for column_matches in routes_state["matches"].values()
+            for m in column_matches.values()
+        ]
+        plan_controls = []
+        if matches:
+            if routes_state["points"]:
+                budget = planner.plan_within_budget(
+                    min_count,
+                    routes_state["points"],
+                    income_per_hunt=routes_state["income"],
+                    matches=matches,
+                )
+                plan_controls.append(build_budget_card(budget))
+                plan_controls.append(
+                    build_plan_card("予算内で重みの合計が最大になるルート", budget.plan)
+                )
+            plan_controls.append(
+                build_plan_card(
+                    "重みの合計が最大になるルート",
+                    planner.plan_max_weight(min_count, matches=matches),
+                )
+            )
+            try:
+                plan = planner.plan_required(min_count, matches=matches)
+                note = None
+                if not plan.complete:
+                    note = f"厳選表の範囲では揃いません: {', '.join(plan.missing)}"
+                plan_controls.append(
+                    build_plan_card(
+                        "すべての組み合わせを最短で揃えるルート", plan, note
+                    )
+                )
+            except ValueError as e:
+                logging.getLogger(__name__).warning(f"Route planning skipped: {e}")
+            plan_controls.append(ft.Divider(height=20, color=ft.Colors.GREY_700))
+        routes_state["plan_column"].controls = plan_controls
+
+    def update_stats_cards(columns):
+        # 武器_属性ごとのスキル組み合わせ出現回数を、表示中の結果から数え直す
+        for weapon_element in columns:
+            combos = {}
+            for m in routes_state["matches"].get(weapon_element, {}).values():
+                combo_str = " + ".join([c for c in m["matched_combo"] if c])
+                combos[combo_str] = combos.get(combo_str, 0) + 1
+            if combos:
+                routes_state["stats_cards"][weapon_element] = build_stats_card(
+                    weapon_element, combos
+                )
+            else:
+                routes_state["stats_cards"].pop(weapon_element, None)
+
+    def layout_routes():
+        # 作成済みのカードを表の列順・回数順に並べる (変更のないカードは作り直さない)
+        stats_controls = []
+        if routes_state["stats_cards"]:
+            stats_controls.append(
+                ft.Container(
+                    content=ft.Text(
+                        "各武器のスキル組み合わせ出現回数",
+                        size=18,
+                        weight=ft.FontWeight.BOLD,
+                        color=ft.Colors.PRIMARY,
+                    ),
+                    padding=ft.padding.only(bottom=10),
+                )
+            )
+            for weapon_element in sorted(
+                routes_state["stats_cards"], key=column_sort_key
+            ):
+                stats_controls.append(routes_state["stats_cards"][weapon_element])
+            stats_controls.append(ft.Divider(height=20, color=ft.Colors.GREY_700))
+        routes_state["stats_column"].controls = stats_controls
+
+        match_keys = sorted(
+            routes_state["match_cards"],
+            key=lambda key: (key[0], column_sort_key(key[1])),
+        )
+        if match_keys:
+            match_controls = [routes_state["match_cards"][key] for key in match_keys]
+        else:
+            match_controls = [
+                ft.Container(
+                    content=ft.Text(
+                        "条件に一致する厳選ルートは見つかりませんでした。",
+                        color=ft.Colors.GREY_500,
+                    ),
+                    alignment=ft.alignment.center,
+                    padding=20,
+                )
+            ]
+        routes_state["list_view"].controls = [
+            routes_state["description"],
+            routes_state["recommend_column"],
+            routes_state["plan_column"],
+            *([routes_state["gaps_card"]] if routes_state["gaps_card"] else []),
+            *([routes_state["picks_card"]] if routes_state["picks_card"] else []),
+            routes_state["stats_column"],
+            *match_controls,
+        ]
+
+    def on_table_change(table_manager, change):
+        # 実行スレッドから呼び出される。厳選ルート画面を表示中の場合のみ更新する
+        # 作り直し・差分更新とも routes_lock の中で行い、画面遷移による再描画と重ならないようにする
+        with routes_lock:
+            if (
+                page.route != "/routes"
+                or routes_state.get("table") is not table_manager
+            ):
+                return
+            if change.full:
+                route_change(None)
+                return
+
+            new_matches = table_manager.find_changed_combinations(
+                routes_state["targets"],
+                routes_state["min_count"],
+                MATCH_THRESHOLD,
+                change.columns,
+                query=routes_state["query"],
+            )
+
+            # 変更された範囲の結果を入れ替える
+            for weapon_element, (lo, hi) in change.columns.items():
+                column_matches = routes_state["matches"].get(weapon_element, {})
+                for count in [c for c in column_matches if lo <= c <= hi]:
+                    del column_matches[count]
+                    del routes_state["match_cards"][(count, weapon_element)]
+            for m in new_matches:
+                key = (m["count"], m["weapon_element"])
+                routes_state["matches"].setdefault(key[1], {})[key[0]] = m
+                routes_state["match_cards"][key] = build_match_card(m)
+
+            update_stats_cards(change.columns)
+            update_plans()
+            update_recommendations()
+            layout_routes()
+            page.update()
+
     def routes_view():
+        # 作り直している間の変更通知は、これから行う検索に含まれるため無視させる
+        routes_state.clear()
+        # 実行スレッドによる更新を取り込む (変更がなければキャッシュが使われる)
+        table_manager = profiles.table()
+        watch_table(table_manager)
+        table_manager.refresh()
+
         # 現在の設定を取得
         targets = []
         for series_skill, group_skill in skill_sets:
@@ -553,8 +1377,9 @@ def create_app(page: ft.Page):
         )
 
         # 検索実行
+        query = parse_target_query() or TargetQuery()
         matches = table_manager.find_target_combinations(
-            targets, min_count, MATCH_THRESHOLD
+            targets, min_count, MATCH_THRESHOLD, query=query
         )
 
         # 説明欄
@@ -565,6 +1390,8 @@ def create_app(page: ft.Page):
 
 - 確定済み回数 (現在は{min_count}回) より後の回数のみが表示されます。
 - 「付与したいスキルの組み合わせ」はあなたが設定したスキルの組み合わせです。
+- 各回の結果を受け取れるのは1つの武器だけです。上部のルートは、当たりのない回を別の武器で消化する (捨て) 前提で、回ごとの武器を決めたものです。
+- 厳選の実行中は、新しい結果が自動で反映されます。
 """
         routes_description_container = ft.Container(
             content=ft.Markdown(
@@ -579,164 +1406,64 @@ def create_app(page: ft.Page):
             margin=ft.margin.only(bottom=20),
         )
 
-        # 武器_属性ごとのスキル組み合わせ出現回数を集計
-        from collections import defaultdict
-
-        combo_stats = defaultdict(lambda: defaultdict(int))
-
-        for m in matches:
-            weapon_element = m["weapon_element"]
-            combo = m["matched_combo"]
-            combo_str = " + ".join([c for c in combo if c])
-            combo_stats[weapon_element][combo_str] += 1
+        # 武器_属性ごとのスキル組み合わせ出現回数と出現間隔を、表全体の配列から集計する
+        analytics = analytics_by_table.get(id(table_manager))
+        if analytics is None or analytics.table_manager is not table_manager:
+            analytics = TableAnalytics(table_manager)
+            analytics_by_table[id(table_manager)] = analytics
+        combo_stats = analytics.combo_counts(targets, min_count, query=query)
+        gaps = analytics.combo_gaps(targets, min_count, query=query)
+        weights = parse_skill_weights()
+        picks = (
+            analytics.top_picks(weights, min_count, targets=targets, query=query)
+            if weights
+            else []
+        )
 
-        # 集計結果を表示
-        stats_items = []
-        if combo_stats:
-            stats_items.append(
-                ft.Container(
-                    content=ft.Text(
-                        "各武器のスキル組み合わせ出現回数",
-                        size=18,
-                        weight=ft.FontWeight.BOLD,
-                        color=ft.Colors.PRIMARY,
+        with routes_lock:
+            routes_state.clear()
+            routes_state.update(
+                {
+                    "table": table_manager,
+                    "targets": targets,
+                    "min_count": min_count,
+                    "query": query,
+                    # {武器_属性: {回数: 検索結果}}
+                    "matches": {},
+                    "match_cards": {},
+                    "stats_cards": {},
+                    "description": routes_description_container,
+                    "planner": RoutePlanner(table_manager, targets, query=query),
+                    "points": (
+                        int(material_points_input.value)
+                        if material_points_input.value.isdigit()
+                        else 0
                     ),
-                    padding=ft.padding.only(bottom=10),
-                )
-            )
-
-            # 表の列順に従って表示
-            ordered_weapon_elements = [
-                h for h in table_manager.headers if h != "回数" and h in combo_stats
-            ]
-
-            for weapon_element in ordered_weapon_elements:
-                combos = combo_stats[weapon_element]
-                combo_lines = []
-                for combo_str, count in sorted(combos.items(), key=lambda x: -x[1]):
-                    combo_lines.append(
-                        ft.Row(
-                            [
-                                ft.Text("•", size=14, color=ft.Colors.AMBER),
-                                ft.Text(
-                                    f"{combo_str}: {count}回",
-                                    size=14,
-                                ),
-                            ],
-                            spacing=5,
-                        )
-                    )
-
-                stats_items.append(
-                    ft.Card(
-                        content=ft.Container(
-                            content=ft.Column(
-                                [
-                                    ft.Text(
-                                        weapon_element,
-                                        size=16,
-                                        weight=ft.FontWeight.BOLD,
-                                    ),
-                                    ft.Divider(height=5, color="transparent"),
-                                    *combo_lines,
-                                ]
-                            ),
-                            padding=15,
-                        ),
-                        margin=ft.margin.only(bottom=10),
-                    )
-                )
-
-            stats_items.append(ft.Divider(height=20, color=ft.Colors.GREY_700))
-
-        # 結果リスト構築
-        list_items = [routes_description_container] + stats_items
-        if not matches:
-            list_items.append(
-                ft.Container(
-                    content=ft.Text(
-                        "条件に一致する厳選ルートは見つかりませんでした。",
-                        color=ft.Colors.GREY_500,
+                    "income": (
+                        int(income_input.value) if income_input.value.isdigit() else 0
                     ),
-                    alignment=ft.alignment.center,
-                    padding=20,
-                )
+                    "plan_column": ft.Column(spacing=0),
+                    "recommender": ColumnRecommender(
+                        table_manager, targets, query=query
+                    ),
+                    "recommend_column": ft.Column(spacing=0),
+                    "stats_column": ft.Column(spacing=0),
+                    "gaps_card": build_gaps_card(gaps) if gaps else None,
+                    "picks_card": build_picks_card(picks) if picks else None,
+                    "list_view": ft.ListView(expand=True, padding=20),
+                }
             )
-        else:
             for m in matches:
-                count = m["count"]
-                w_e = m["weapon_element"]
-                combo = m["matched_combo"]
-                detected = m.get("raw_skills", "")
-                is_exact_match = m.get("is_exact_match", True)
-
-                # コンボ表示用
-                combo_str = " + ".join([c for c in combo if c])
-
-                # タイトル行の要素を作成
-                title_row_controls = [
-                    ft.Text(
-                        f"{count}回目",
-                        size=20,
-                        weight=ft.FontWeight.BOLD,
-                        color=ft.Colors.AMBER,
-                    ),
-                ]
-
-                # カードコンテンツ
-                card_controls = [
-                    ft.Row(
-                        [
-                            ft.Row(
-                                title_row_controls,
-                                spacing=10,
-                                vertical_alignment=ft.CrossAxisAlignment.CENTER,
-                            ),
-                            ft.Container(
-                                content=ft.Text(
-                                    w_e,
-                                    size=14,
-                                    weight=ft.FontWeight.BOLD,
-                                    color=ft.Colors.ON_PRIMARY_CONTAINER,
-                                ),
-                                bgcolor=ft.Colors.PRIMARY_CONTAINER,
-                                padding=ft.padding.symmetric(horizontal=10, vertical=5),
-                                border_radius=5,
-                            ),
-                        ],
-                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                    ),
-                    ft.Divider(height=10, color="transparent"),
-                    ft.Text(
-                        f"付与したいスキルの組み合わせ: {combo_str}",
-                        size=14,
-                        weight=ft.FontWeight.BOLD,
-                    ),
-                    ft.Text(
-                        f"ゲーム画面のOCR結果: {detected}",
-                        size=12,
-                        color=ft.Colors.GREY_500,
-                    ),
-                ]
-
-                if not is_exact_match:
-                    card_controls.append(
-                        ft.Text(
-                            "OCR結果が微妙に誤っているようです。念のため、「ゲーム画面のOCR結果」を確認して他のスキルの可能性がないか確認してください。",
-                            size=11,
-                            color=ft.Colors.RED_400,
-                            weight=ft.FontWeight.BOLD,
-                        )
-                    )
-
-                card = ft.Card(
-                    content=ft.Container(
-                        content=ft.Column(card_controls),
-                        padding=15,
-                    ),
-                    margin=ft.margin.only(bottom=10),
+                key = (m["count"], m["weapon_element"])
+                routes_state["matches"].setdefault(key[1], {})[key[0]] = m
+                routes_state["match_cards"][key] = build_match_card(m)
+            for weapon_element, combos in combo_stats.items():
+                routes_state["stats_cards"][weapon_element] = build_stats_card(
+                    weapon_element, combos
                 )
-                list_items.append(card)
+            update_plans()
+            update_recommendations()
+            layout_routes()
 
         return ft.View(
             "/routes",
@@ -751,11 +1478,7 @@ def create_app(page: ft.Page):
                 ),
                 ft.Container(
                     content=ft.Container(
-                        content=ft.ListView(
-                            controls=list_items,
-                            expand=True,
-                            padding=20,
-                        ),
+                        content=routes_state["list_view"],
                         width=600,
                         padding=20,
                         alignment=ft.alignment.top_center,
@@ -769,38 +1492,40 @@ def create_app(page: ft.Page):
 
     # --- Routing ---
     def route_change(route):
-        page.views.clear()
-
-        # Main View
-        page.views.append(
-            ft.View(
-                "/",
-                [
-                    ft.AppBar(
-                        title=ft.Text("巨戟アーティア武器スキル厳選自動化ツール"),
-                        center_title=True,
-                        bgcolor="surfaceVariant",
-                        actions=[
-                            ft.Container(
-                                content=reload_table_button,
-                                margin=ft.margin.only(right=10),
-                            )
-                        ],
-                    ),
-                    ft.Container(
-                        content=main_container,
-                        expand=True,
-                        alignment=ft.alignment.top_center,
-                    ),
-                ],
-                padding=0,
+        # 実行スレッドの変更通知による作り直しと重ならないようにする
+        with routes_lock:
+            page.views.clear()
+
+            # Main View
+            page.views.append(
+                ft.View(
+                    "/",
+                    [
+                        ft.AppBar(
+                            title=ft.Text("巨戟アーティア武器スキル厳選自動化ツール"),
+                            center_title=True,
+                            bgcolor="surfaceVariant",
+                            actions=[
+                                ft.Container(
+                                    content=reload_table_button,
+                                    margin=ft.margin.only(right=10),
+                                )
+                            ],
+                        ),
+                        ft.Container(
+                            content=main_container,
+                            expand=True,
+                            alignment=ft.alignment.top_center,
+                        ),
+                    ],
+                    padding=0,
+                )
             )
-        )
 
-        if page.route == "/routes":
-            page.views.append(routes_view())
+            if page.route == "/routes":
+                page.views.append(routes_view())
 
-        page.update()
+            page.update()
 
     def view_pop(view):
         page.views.pop()
@@ -2,16 +2,37 @@ import pydirectinput
 import time
 import logging
 import ctypes
+from contextlib import contextmanager
 
-from .config import KEYBINDS, DELAYS, WINDOW_TITLE
+from .config import (
+    KEYBINDS,
+    WINDOW_TITLE,
+    SCREEN_STATE_POLL_INTERVAL,
+    SCREEN_STATE_TIMEOUT,
+    SCREEN_STATE_TITLE_TIMEOUT,
+)
+from .screen_state import STATES, ScreenStateError
+from .timing_profile import load_delays
+from .cancellation import CancellationToken
 
 
 pydirectinput.FAILSAFE = True
 
 
 class InputManager:
-    def __init__(self):
+    def __init__(self, screen_states=None, delays=None, cancel=None):
         self.logger = logging.getLogger(__name__)
+        # 中断要求 (CancellationToken)。set された後はシーケンスの外ではキーを押さず、待機もすぐに終える
+        self.cancel = cancel if cancel is not None else CancellationToken()
+        # 実行中のシーケンスの数。シーケンスの途中では中断を確認しない
+        self._in_sequence = 0
+        # 画面の状態の判定 (ScreenStateClassifier)。
+        # 見本のある状態は、その画面になるまで待ってから次の入力を送る
+        self.screen_states = screen_states
+        # 待機時間 (計測済みのタイミングプロファイルがあればその値)
+        self.delays = delays if delays is not None else load_delays()
+        # 待機時間の計測中は TimingCalibrator を設定し、固定の待機の代わりに計測する
+        self.calibrator = None
 
     def focus_window(self):
         try:
@@ -32,49 +53,142 @@ class InputManager:
         """Altキーの空打ちハックを使用してWindowsのフォアグラウンドロックを回避する"""
         self.logger.info("Simulating ALT key press to bypass foreground lock...")
         pydirectinput.press("alt")
-        time.sleep(0.1)
+        self._sleep(0.1)
         ctypes.windll.user32.SetForegroundWindow(hwnd)
-        time.sleep(1.0)
+
+        # 前面に来るまで待つ (最大1秒)
+        end_time = time.time() + 1.0
+        while ctypes.windll.user32.GetForegroundWindow() != hwnd:
+            if time.time() >= end_time:
+                self.logger.warning("Window did not come to the foreground within 1 second.")
+                return
+            if self._sleep(SCREEN_STATE_POLL_INTERVAL):
+                return
+
+    @contextmanager
+    def _sequence(self):
+        """
+        with の間の入力と待機は、中断が要求されても最後まで行う。
+        確認・結果ダイアログを開いたまま止まらないよう、リロールと「いいえ」の選択に使う。
+        タイトルへ戻る操作などの画面の移動は、キーを押すごとに中断を確認する。
+        """
+        self._in_sequence += 1
+        try:
+            yield
+        finally:
+            self._in_sequence -= 1
+
+    def _active_cancel(self):
+        """待機中に確認する中断要求 (シーケンスの途中は None)"""
+        return None if self._in_sequence else self.cancel
+
+    def _sleep(self, duration: float) -> bool:
+        """duration 秒待つ。シーケンスの外で中断が要求された場合はすぐに True を返す"""
+        cancel = self._active_cancel()
+        if cancel is None:
+            time.sleep(duration)
+            return False
+        return cancel.wait(duration)
 
     def _press(self, key: str, delay: float = 0.0):
+        cancel = self._active_cancel()
+        if cancel is not None and cancel.is_set():
+            self.logger.debug(f"Cancelled. Skipping key: {key}")
+            return
         try:
             self.logger.debug(f"Pressing key: {key}")
             pydirectinput.press(key)
             if delay > 0:
-                time.sleep(delay)
+                self._sleep(delay)
         except Exception as e:
             self.logger.error(f"Key press failed: {e}")
 
+    def can_detect(self, state: str) -> bool:
+        """state の画面を判定できるか (見本が記録されているか)"""
+        return self.screen_states is not None and self.screen_states.has(state)
+
+    def wait_for(self, state: str, delay: float, timeout: float = SCREEN_STATE_TIMEOUT):
+        """
+        state の画面になるまで待つ。判定できない状態は従来どおり delay 秒待つ。
+        timeout 秒以内にならない場合は、別の画面に入力を送らないよう ScreenStateError を送出する。
+        """
+        if not self.can_detect(state):
+            if delay > 0:
+                self._sleep(delay)
+            return
+        cancel = self._active_cancel()
+        if self.screen_states.wait_for_state([state], timeout, cancel) is None:
+            if cancel is not None and cancel.is_set():
+                return
+            raise ScreenStateError(f"{STATES[state]}になりませんでした ({timeout:g}秒)")
+
+    def _after_click(self, state=None):
+        """入力後の AFTER_CLICK の待機。計測中は画面が切り替わるまでの時間を計測する"""
+        if self.calibrator is not None:
+            self.calibrator.measure("AFTER_CLICK", state, cancel=self._active_cancel())
+        elif state is not None:
+            self.wait_for(state, self.delays["AFTER_CLICK"])
+        else:
+            self._sleep(self.delays["AFTER_CLICK"])
+
     def execute_reroll_sequence(self):
         self.logger.info("Executing reroll sequence (G -> Space -> Space)...")
-        self._press(KEYBINDS["AUTO_SELECT"], delay=DELAYS["AFTER_CLICK"])
-        self._press(KEYBINDS["CONFIRM"], delay=DELAYS["AFTER_CLICK"])
-        self._press(KEYBINDS["CONFIRM"])
+        with self._sequence():
+            self.wait_for("reroll", 0.0)
+            self._press(KEYBINDS["AUTO_SELECT"])
+            self._after_click("confirm")
+            # 2つの確認ダイアログは見分けられないため、間は固定の待機とする
+            self._press(KEYBINDS["CONFIRM"])
+            self._after_click()
+            self._press(KEYBINDS["CONFIRM"])
         self.logger.info("Reroll sequence initiated.")
 
     def return_to_title(self):
         self.logger.info("Executing return to title sequence...")
-        for _ in range(5):
-            self._press(KEYBINDS["MENU"], delay=DELAYS["RETURN_TO_TITLE"])
+        if self.can_detect("menu"):
+            # メニューが開いた時点で戻るのをやめる
+            for _ in range(5):
+                self._press(KEYBINDS["MENU"])
+                if self.screen_states.wait_for_state(
+                    ["menu"], self.delays["RETURN_TO_TITLE"], self.cancel
+                ):
+                    break
+                if self.cancel.is_set():
+                    return
+            else:
+                raise ScreenStateError(f"{STATES['menu']}になりませんでした")
+        else:
+            for _ in range(5):
+                self._press(KEYBINDS["MENU"], delay=self.delays["RETURN_TO_TITLE"])
 
-        self._press(KEYBINDS["TAB_LEFT"], delay=DELAYS["RETURN_TO_TITLE"])
+        self._press(KEYBINDS["TAB_LEFT"], delay=self.delays["RETURN_TO_TITLE"])
 
         for _ in range(2):
-            self._press(KEYBINDS["UP"], delay=DELAYS["AFTER_CLICK"])
+            self._press(KEYBINDS["UP"], delay=self.delays["AFTER_CLICK"])
 
-        self._press(KEYBINDS["CONFIRM"], delay=DELAYS["AFTER_CLICK"])
-        self._press(KEYBINDS["DOWN"], delay=DELAYS["AFTER_CLICK"])
+        self._press(KEYBINDS["CONFIRM"], delay=self.delays["AFTER_CLICK"])
+        self._press(KEYBINDS["DOWN"], delay=self.delays["AFTER_CLICK"])
 
-        for _ in range(2):
-            self._press(KEYBINDS["CONFIRM"], delay=DELAYS["RETURN_TO_TITLE"])
+        self._press(KEYBINDS["CONFIRM"], delay=self.delays["RETURN_TO_TITLE"])
+        self._press(KEYBINDS["CONFIRM"])
+        self.wait_for("title", self.delays["RETURN_TO_TITLE"], timeout=SCREEN_STATE_TITLE_TIMEOUT)
 
         self.logger.info("Return to title sequence finished.")
 
+    def press_keys(self, keys):
+        """設定されたキーを順に押す (ロードや画面の移動用)"""
+        self.logger.info(f"Actions: {' -> '.join(keys)}")
+        for key in keys:
+            self._press(key, delay=self.delays["RETURN_TO_TITLE"])
+
     def select_no_and_confirm(self):
         self.logger.info("Actions: Select No (Up -> Space)")
-        self._press(KEYBINDS["UP"])
-        time.sleep(DELAYS["AFTER_CLICK"])
-        self._press(KEYBINDS["CONFIRM"])
+        with self._sequence():
+            self.wait_for("result", 0.0)
+            self._press(KEYBINDS["UP"])
+            self._after_click()
+            self._press(KEYBINDS["CONFIRM"])
+            self.wait_for("reroll", 0.0)
 
     def cancel_selection(self):
         self.logger.info("Actions: Cancel")
@@ -0,0 +1,102 @@
+import csv
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Observation(NamedTuple):
+    """1セルに対する1回分の読み取り結果"""
+
+    text: str
+    # OCRの認識スコア (0〜1)。チェックポイントからの復旧など不明な場合は None
+    score: Optional[float]
+    timestamp: str
+
+
+class ObservationLog:
+    """
+    厳選表の各セルについて、これまでの読み取り結果をすべて記録する追記専用のログ。
+    厳選表のセルには、このログから求めた多数決の結果を書き込む。
+
+    1行1件の CSV (回数, 列名, OCR結果, 認識スコア, 日時)。
+    ジャーナルと同様に、前回読んだ位置以降だけを読み込む。
+    """
+
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+        self.logger = logging.getLogger(__name__)
+        # 列名 -> {回数: [読み取り結果]}
+        self._columns: Dict[str, Dict[int, List[Observation]]] = {}
+        self._offset = 0
+
+    def clear_cache(self):
+        self._columns.clear()
+        self._offset = 0
+
+    def column(self, column_name: str) -> Dict[int, List[Observation]]:
+        """指定した列の読み取り結果"""
+        self._sync()
+        return self._columns.setdefault(column_name, {})
+
+    def iter_cells(self) -> Iterator[Tuple[str, int, List[Observation]]]:
+        """全セルの (列名, 回数, 読み取り結果) を返す"""
+        self._sync()
+        for column_name, cells in self._columns.items():
+            for count, observations in cells.items():
+                yield column_name, count, observations
+
+    def append(self, column_name: str, records: List[Tuple[int, Observation]]):
+        """読み取り結果を追記する"""
+        if not records:
+            return
+        try:
+            with open(self.filepath, mode="a", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                for count, observation in records:
+                    writer.writerow(
+                        [
+                            count,
+                            column_name,
+                            observation.text,
+                            "" if observation.score is None else observation.score,
+                            observation.timestamp,
+                        ]
+                    )
+        except Exception as e:
+            self.logger.error(f"Failed to append to observation log: {e}")
+        # 追記した分は他のインスタンスの追記と同じく読み込んで反映する
+        self._sync()
+
+    def _sync(self):
+        """前回読んだ位置以降を読み込む"""
+        if not self.filepath.exists():
+            return
+
+        try:
+            if self.filepath.stat().st_size < self._offset:
+                # 作り直された場合は最初から読み込む
+                self.clear_cache()
+            with open(self.filepath, mode="rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except Exception as e:
+            self.logger.error(f"Failed to read observation log: {e}")
+            return
+
+        # 書き込み途中で中断された末尾の不完全な行は読み飛ばす
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return
+
+        lines = chunk[:end].decode("utf-8").splitlines()
+        for record in csv.reader(lines):
+            if len(record) < 5:
+                continue
+            try:
+                count = int(record[0])
+                score = float(record[3]) if record[3] else None
+            except ValueError:
+                continue
+            cells = self._columns.setdefault(record[1], {})
+            cells.setdefault(count, []).append(Observation(record[2], score, record[4]))
+        self._offset += end
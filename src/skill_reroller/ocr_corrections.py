@@ -0,0 +1,178 @@
+import json
+import logging
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+from .config import (
+    OUTPUT_DIR,
+    CORRECTION_FILE_NAME,
+    CORRECTION_MIN_SIMILARITY,
+    CORRECTION_MAX_ENTRIES,
+    CORRECTION_STALE_DAYS,
+    SERIES_SKILLS,
+    GROUP_SKILLS,
+)
+from .utils import find_best_match
+
+# 全スキルリストを作成
+ALL_SKILLS = SERIES_SKILLS + GROUP_SKILLS
+ALL_SKILLS_SET = set(ALL_SKILLS)
+
+
+class CorrectionMap:
+    """
+    OCRの誤読 (観測文字列 -> 正しいスキル名) を記録する補正辞書。
+    あいまい検索の前に参照し、既知の誤読は辞書引き1回で解決する。
+    """
+
+    def __init__(
+        self,
+        output_dir: str = OUTPUT_DIR,
+        filename: str = CORRECTION_FILE_NAME,
+        min_similarity: float = CORRECTION_MIN_SIMILARITY,
+        max_entries: int = CORRECTION_MAX_ENTRIES,
+        stale_days: int = CORRECTION_STALE_DAYS,
+    ):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.filepath = self.output_dir / filename
+        self.logger = logging.getLogger(__name__)
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self.stale_days = stale_days
+        # observed -> {"canonical": str, "count": int, "last_seen": "YYYY-MM-DD"}
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        """JSONファイルから補正辞書を読み込む"""
+        if not self.filepath.exists():
+            return
+
+        try:
+            with open(self.filepath, mode="r", encoding="utf-8") as f:
+                raw = json.load(f)
+            for observed, entry in raw.items():
+                # スキル一覧の変更で無効になったエントリは読み捨てる
+                if entry.get("canonical") in ALL_SKILLS_SET:
+                    self.entries[observed] = entry
+            self.logger.info(
+                f"Loaded {len(self.entries)} OCR corrections from {self.filepath}"
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to load OCR corrections: {e}")
+
+    def save(self):
+        """補正辞書をJSONファイルに保存する"""
+        self.evict_stale()
+        try:
+            with open(self.filepath, mode="w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            self.logger.info(f"OCR corrections saved to {self.filepath}")
+        except Exception as e:
+            self.logger.error(f"Failed to save OCR corrections: {e}")
+
+    def lookup(self, observed: str) -> Optional[str]:
+        """
+        観測文字列に対応する正しいスキル名を返す。未登録の場合は None。
+        """
+        if observed in ALL_SKILLS_SET:
+            return observed
+
+        entry = self.entries.get(observed)
+        if entry is None:
+            return None
+        return entry["canonical"]
+
+    def learn(self, observed: str, canonical: str, count: int = 1):
+        """観測文字列と正しいスキル名の組を登録する"""
+        if observed in ALL_SKILLS_SET or canonical not in ALL_SKILLS_SET:
+            return
+
+        today = date.today().isoformat()
+        entry = self.entries.get(observed)
+        if entry is None or entry["canonical"] != canonical:
+            if entry is not None:
+                self.logger.warning(
+                    f"Correction for '{observed}' changed: '{entry['canonical']}' -> '{canonical}'"
+                )
+            self.entries[observed] = {
+                "canonical": canonical,
+                "count": count,
+                "last_seen": today,
+            }
+            self.logger.info(f"Learned OCR correction: '{observed}' -> '{canonical}'")
+        else:
+            entry["count"] += count
+            entry["last_seen"] = today
+
+    def learn_from_text(self, observed: str) -> Optional[str]:
+        """
+        あいまい検索で観測文字列の正しいスキル名を推定し、確実な場合のみ登録する。
+        最も近いスキルが閾値以上で、かつ2番目の候補より明確に近い場合を確実とみなす。
+        """
+        canonical = self.lookup(observed)
+        if canonical is not None:
+            if canonical != observed:
+                self.learn(observed, canonical)
+            return canonical
+
+        best_skill, best_score, second_score = find_best_match(observed, ALL_SKILLS)
+        if best_score < self.min_similarity or best_score <= second_score:
+            return None
+
+        self.learn(observed, best_skill)
+        return best_skill
+
+    def mine_table(self, table_manager) -> int:
+        """
+        厳選表に記録済みのOCR結果から誤読の組を抽出する。
+        既に登録済みの文字列は再計算しない。戻り値は新たに登録した件数。
+        """
+        occurrences: Dict[str, int] = {}
+        for text, n in table_manager.text_counts().items():
+            if not text:
+                continue
+            for detected in text.split("+"):
+                if detected in ALL_SKILLS_SET or detected in self.entries:
+                    continue
+                occurrences[detected] = occurrences.get(detected, 0) + n
+
+        learned = 0
+        for detected, count in occurrences.items():
+            best_skill, best_score, second_score = find_best_match(
+                detected, ALL_SKILLS
+            )
+            if best_score < self.min_similarity or best_score <= second_score:
+                continue
+            self.learn(detected, best_skill, count=count)
+            learned += 1
+
+        if learned:
+            self.logger.info(f"Mined {learned} OCR corrections from the table.")
+        return learned
+
+    def evict_stale(self):
+        """
+        一定期間観測されていないエントリを削除し、上限件数を超えた分は
+        観測回数の少ないものから削除する。
+        """
+        cutoff = (date.today() - timedelta(days=self.stale_days)).isoformat()
+        stale = [
+            observed
+            for observed, entry in self.entries.items()
+            if entry["last_seen"] < cutoff
+        ]
+        for observed in stale:
+            del self.entries[observed]
+
+        if len(self.entries) > self.max_entries:
+            ranked = sorted(
+                self.entries.items(),
+                key=lambda x: (x[1]["count"], x[1]["last_seen"]),
+                reverse=True,
+            )
+            self.entries = dict(ranked[: self.max_entries])
+
+        if stale:
+            self.logger.info(f"Evicted {len(stale)} stale OCR corrections.")
@@ -1,7 +1,7 @@
 from paddleocr import PaddleOCR
 import logging
 import numpy as np
-from typing import List
+from typing import List, Tuple
 from .config import OCR_LANG
 
 
@@ -16,6 +16,10 @@ class OCRHandler:
             raise
 
     def extract_text(self, image: np.ndarray) -> List[str]:
+        return [text for text, _ in self.extract_text_with_scores(image)]
+
+    def extract_text_with_scores(self, image: np.ndarray) -> List[Tuple[str, float]]:
+        """認識した各行の (文字列, 認識スコア) のリスト"""
         if image is None or image.size == 0:
             self.logger.warning("Empty image provided to extract_text.")
             return []
@@ -34,7 +38,14 @@ class OCRHandler:
             # 辞書形式のレスポンス (新しいPaddleOCR)
             if isinstance(page_result, dict):
                 if "rec_texts" in page_result:
-                    return [text.strip() for text in page_result["rec_texts"]]
+                    texts = page_result["rec_texts"]
+                    scores = page_result.get("rec_scores")
+                    if scores is None or len(scores) != len(texts):
+                        scores = [1.0] * len(texts)
+                    return [
+                        (text.strip(), float(score))
+                        for text, score in zip(texts, scores)
+                    ]
 
             # リスト形式のレスポンス
             if isinstance(page_result, list):
@@ -43,7 +54,8 @@ class OCRHandler:
                         text_info = line[1]
                         if len(text_info) > 0:
                             text = text_info[0].strip()
-                            extracted_texts.append(text)
+                            score = float(text_info[1]) if len(text_info) > 1 else 1.0
+                            extracted_texts.append((text, score))
 
             return extracted_texts
 
@@ -0,0 +1,338 @@
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from .config import MATCH_THRESHOLD, POINTS_PER_ATTEMPT, MARGINAL_HUNTS
+from .table_manager import TableManager, column_sort_key
+from .target_query import QueryEntry, TargetQuery
+
+# 「すべて揃える」計画で扱える条件の数 (状態数は 2 の条件数乗)
+MAX_GOALS = 16
+
+
+class RouteStep(NamedTuple):
+    """
+    計画の1手。weapon_element が None の場合は、start〜end 回目を
+    ターゲットではない武器で消化する (捨て回)。
+    """
+
+    start: int
+    end: int
+    weapon_element: Optional[str]
+    combo: List[str]
+    weight: float
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+
+class RoutePlan(NamedTuple):
+    steps: List[RouteStep]
+    total_weight: float
+    hits: int
+    burns: int
+    # 計画の最後の回数 (何もしない場合は確定済み回数)
+    last_count: int
+    # 「すべて揃える」計画で揃う条件と揃わない条件の表示名
+    reached: List[str]
+    missing: List[str]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class BudgetPlan(NamedTuple):
+    # 予算内で重みの合計が最大になる計画
+    plan: RoutePlan
+    # 所持ポイントと見込み収入で実行できる回数
+    attempts: int
+    points: int
+    # 次の当たりに届くまでに追加で必要なポイント (表の範囲にない場合は None)
+    next_hit_points: Optional[int]
+    # 狩猟を1〜N回増やした場合の (追加の狩猟回数, 増える重みの合計)。見込み収入が 0 の場合は空
+    marginal: List[Tuple[int, float]]
+    # 実行回数を1〜N回増やした場合の (追加の回数, 追加で必要なポイント, 増える重みの合計)
+    marginal_attempts: List[Tuple[int, int, float]]
+    # すべて揃える計画と、それに必要なポイント (揃わない・条件が多すぎる場合は None)
+    required: Optional[RoutePlan]
+    required_points: Optional[int]
+
+
+class RoutePlanner:
+    """
+    厳選表全体から、確定済み回数以降の各回をどの武器_属性に使うか (または捨てるか) を決める。
+    1回分の結果を受け取れるのは1つの武器だけで、ターゲットのない回も別の武器で消化する必要がある。
+
+    - plan_max_weight: ターゲットの重みの合計が最大になる計画
+    - plan_required: 指定した条件をすべて揃えるまでの回数が最小になる計画
+
+    候補は転置インデックスから引いたターゲット一致セルのみのため、
+    計算量は表の大きさではなく一致件数に比例する。
+    """
+
+    def __init__(
+        self,
+        table_manager: TableManager,
+        targets: List[List[str]],
+        query: Optional[TargetQuery] = None,
+        threshold: float = MATCH_THRESHOLD,
+    ):
+        self.table_manager = table_manager
+        self.targets = targets
+        self.query = query
+        self.threshold = threshold
+        self.compiled = TargetQuery.from_combinations(targets)
+        if query:
+            self.compiled.extend(query)
+        self.logger = logging.getLogger(__name__)
+
+    def hits(
+        self,
+        min_count: int,
+        horizon: Optional[int] = None,
+        matches: Optional[List[Dict]] = None,
+    ) -> Dict[int, List]:
+        """
+        min_count より後 (horizon 回以内) のターゲット一致を回数ごとにまとめる。
+        matches には find_target_combinations の結果を渡せる (省略時は検索する)。
+        """
+        if matches is None:
+            matches = self.table_manager.find_target_combinations(
+                self.targets, min_count, self.threshold, query=self.query
+            )
+        last = min_count + horizon if horizon is not None else None
+        by_count: Dict[int, List] = {}
+        for m in matches:
+            if m["count"] <= min_count or (last is not None and m["count"] > last):
+                continue
+            by_count.setdefault(m["count"], []).append(m)
+        return by_count
+
+    def plan_max_weight(
+        self,
+        min_count: int,
+        horizon: Optional[int] = None,
+        matches: Optional[List[Dict]] = None,
+    ) -> RoutePlan:
+        """
+        ターゲットの重みの合計が最大になる計画。
+        各回の選択は他の回に影響しないため、回ごとに最も重い一致を選べば最適になる。
+        """
+        chosen = []
+        for count, count_matches in sorted(
+            self.hits(min_count, horizon, matches).items()
+        ):
+            best = max(
+                count_matches,
+                key=lambda m: (
+                    m["weight"],
+                    m["is_exact_match"],
+                    # 同じ重みなら表の左の列を優先する
+                    tuple(-k for k in column_sort_key(m["weapon_element"])),
+                ),
+            )
+            chosen.append(best)
+        return self._build_plan(min_count, chosen, [], [])
+
+    def plan_required(
+        self,
+        min_count: int,
+        horizon: Optional[int] = None,
+        matches: Optional[List[Dict]] = None,
+    ) -> RoutePlan:
+        """
+        条件をすべて揃えるまでの回数が最小になる計画。
+        揃えた条件の集合をビット列で表し、回数順に到達可能な集合を広げる動的計画法で求める。
+        揃えられない場合は、揃う条件の重みの合計が最大 (同じなら早く終わる) の計画を返す。
+        """
+        goals = self._goals()
+        if len(goals) > MAX_GOALS:
+            raise ValueError(
+                f"すべて揃える計画の条件は{MAX_GOALS}件までです (現在{len(goals)}件)"
+            )
+        if not goals:
+            return self._build_plan(min_count, [], [], [])
+
+        size = 1 << len(goals)
+        full = size - 1
+        masks = np.arange(size, dtype=np.int64)
+        reachable = np.zeros(size, dtype=bool)
+        reachable[0] = True
+        # 各集合に初めて到達した手 (直前の集合と、使った一致の番号)
+        parent_mask = np.full(size, -1, dtype=np.int64)
+        parent_hit = np.full(size, -1, dtype=np.int64)
+        reached_at = np.full(size, min_count, dtype=np.int64)
+        goal_weights = np.array([weight for _, weight in goals])
+        mask_weights = np.zeros(size)
+        for bit, weight in enumerate(goal_weights):
+            mask_weights[masks & (1 << bit) != 0] += weight
+
+        used = []
+        goal_mask_cache: Dict[Tuple[int, int], int] = {}
+        for count, count_matches in sorted(
+            self.hits(min_count, horizon, matches).items()
+        ):
+            # 同じ回の一致は1つしか使えないため、この回より前の到達状態から広げる
+            sources = masks[reachable]
+            for m in count_matches:
+                key = (m["series_id"], m["group_id"])
+                goal_mask = goal_mask_cache.get(key)
+                if goal_mask is None:
+                    goal_mask = sum(
+                        1 << bit
+                        for bit, (entry, _) in enumerate(goals)
+                        if entry.matches(*key)
+                    )
+                    goal_mask_cache[key] = goal_mask
+                if not goal_mask:
+                    continue
+
+                targets = sources | goal_mask
+                fresh = ~reachable[targets]
+                if not fresh.any():
+                    continue
+                parent_mask[targets[fresh]] = sources[fresh]
+                parent_hit[targets[fresh]] = len(used)
+                reached_at[targets[fresh]] = count
+                reachable[targets[fresh]] = True
+                used.append(m)
+
+            if reachable[full]:
+                break
+
+        if reachable[full]:
+            best = full
+        else:
+            # 揃う重みが最大で、到達が最も早い集合
+            candidates = masks[reachable]
+            order = np.lexsort((reached_at[candidates], -mask_weights[candidates]))
+            best = int(candidates[order[0]])
+
+        chosen = []
+        mask = best
+        while mask:
+            chosen.append(used[parent_hit[mask]])
+            mask = int(parent_mask[mask])
+        chosen.reverse()
+
+        reached = [
+            goals[bit][0].label() for bit in range(len(goals)) if best >> bit & 1
+        ]
+        missing = [
+            goals[bit][0].label() for bit in range(len(goals)) if not best >> bit & 1
+        ]
+        return self._build_plan(min_count, chosen, reached, missing)
+
+    def plan_within_budget(
+        self,
+        min_count: int,
+        points: int,
+        income_per_hunt: int = 0,
+        hunts: int = 0,
+        matches: Optional[List[Dict]] = None,
+        points_per_attempt: int = POINTS_PER_ATTEMPT,
+        marginal_hunts: int = MARGINAL_HUNTS,
+    ) -> BudgetPlan:
+        """
+        所持ポイント (と hunts 回分の狩猟で得られる見込みのポイント) の範囲で計画を立てる。
+        回数ごとの最大の重みの累積和を一度求め、予算を増やした場合の増分はそこから引く。
+        増分は、狩猟の回数 (見込み収入がある場合) と実行回数について marginal_hunts 回分まで求める。
+        """
+        hits = self.hits(min_count, matches=matches)
+        budget = points + income_per_hunt * hunts
+        attempts = max(0, budget // points_per_attempt)
+
+        # best[i] は min_count + i + 1 回目で得られる最大の重み
+        span = max(hits) - min_count if hits else 0
+        best = np.zeros(span)
+        for count, count_matches in hits.items():
+            best[count - min_count - 1] = max(m["weight"] for m in count_matches)
+        gained = np.concatenate(([0.0], np.cumsum(best)))
+
+        def value(n: int) -> float:
+            return float(gained[min(n, span)])
+
+        marginal = []
+        if income_per_hunt > 0:
+            for extra in range(1, marginal_hunts + 1):
+                more = (budget + income_per_hunt * extra) // points_per_attempt
+                marginal.append((extra, value(more) - value(attempts)))
+        marginal_attempts = [
+            (
+                extra,
+                (attempts + extra) * points_per_attempt - budget,
+                value(attempts + extra) - value(attempts),
+            )
+            for extra in range(1, marginal_hunts + 1)
+        ]
+
+        later = np.flatnonzero(best[attempts:] > 0)
+        next_hit_points = (
+            int((attempts + later[0] + 1) * points_per_attempt - budget)
+            if len(later)
+            else None
+        )
+
+        required = None
+        required_points = None
+        try:
+            required = self.plan_required(min_count, matches=matches)
+        except ValueError as e:
+            self.logger.warning(f"Required plan skipped: {e}")
+        if required is not None and required.steps and required.complete:
+            required_points = (required.last_count - min_count) * points_per_attempt
+
+        return BudgetPlan(
+            plan=self.plan_max_weight(min_count, attempts, matches),
+            attempts=attempts,
+            points=budget,
+            next_hit_points=next_hit_points,
+            marginal=marginal,
+            marginal_attempts=marginal_attempts,
+            required=required,
+            required_points=required_points,
+        )
+
+    def _goals(self) -> List[Tuple[QueryEntry, float]]:
+        """条件ごとの (条件, 重み)。同じ条件が重複している場合は1つにまとめる"""
+        goals: Dict[Tuple, Tuple[QueryEntry, float]] = {}
+        for entry in self.compiled.entries:
+            key = (entry.series_ids, entry.group_ids)
+            if key not in goals or entry.weight > goals[key][1]:
+                goals[key] = (entry, entry.weight)
+        return list(goals.values())
+
+    def _build_plan(
+        self,
+        min_count: int,
+        chosen: List[Dict],
+        reached: List[str],
+        missing: List[str],
+    ) -> RoutePlan:
+        """使う一致の一覧から、間の捨て回を含めた計画を作る"""
+        steps = []
+        position = min_count
+        for m in chosen:
+            if m["count"] > position + 1:
+                steps.append(RouteStep(position + 1, m["count"] - 1, None, [], 0.0))
+            steps.append(
+                RouteStep(
+                    m["count"],
+                    m["count"],
+                    m["weapon_element"],
+                    m["matched_combo"],
+                    m["weight"],
+                )
+            )
+            position = m["count"]
+
+        return RoutePlan(
+            steps=steps,
+            total_weight=sum(m["weight"] for m in chosen),
+            hits=len(chosen),
+            burns=(position - min_count) - len(chosen),
+            last_count=position,
+            reached=reached,
+            missing=missing,
+        )
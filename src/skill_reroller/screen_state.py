@@ -0,0 +1,263 @@
+import argparse
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import cv2
+import numpy as np
+from .config import (
+    OUTPUT_DIR,
+    SCREEN_STATE_FILE_NAME,
+    SCREEN_STATE_MARKERS,
+    SCREEN_STATE_THUMBNAIL_SIZE,
+    SCREEN_STATE_MATCH_THRESHOLD,
+    SCREEN_STATE_POLL_INTERVAL,
+    SCREEN_STATE_TIMEOUT,
+)
+from .screen_reader import ScreenReader
+
+# 判定する画面の状態と表示名
+STATES = {
+    "reroll": "スキル再付与画面",
+    "confirm": "確認ダイアログ",
+    "result": "結果ダイアログ",
+    "menu": "メニュー",
+    "title": "タイトル画面",
+}
+
+
+class ScreenStateError(RuntimeError):
+    """期待した画面にならなかった (別の画面に入力が送られるのを防ぐため停止する)"""
+
+
+class ScreenStateClassifier:
+    """
+    画面の目印となる領域の縮小画像 (サムネイル) を、状態ごとに記録した見本と比べて
+    現在の画面の状態を判定する。
+
+    見本は状態ごとに複数枚記録でき、最も近い見本との平均輝度差が
+    しきい値以下の状態を現在の状態とする。
+    """
+
+    def __init__(
+        self,
+        screen_reader: Optional[ScreenReader] = None,
+        filepath: Optional[Path] = None,
+        markers: List[Tuple[float, ...]] = SCREEN_STATE_MARKERS,
+        thumbnail_size: Tuple[int, int] = SCREEN_STATE_THUMBNAIL_SIZE,
+        threshold: float = SCREEN_STATE_MATCH_THRESHOLD,
+        poll_interval: float = SCREEN_STATE_POLL_INTERVAL,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.screen_reader = screen_reader or ScreenReader()
+        self.filepath = (
+            Path(filepath)
+            if filepath is not None
+            else Path(OUTPUT_DIR) / SCREEN_STATE_FILE_NAME
+        )
+        self.markers = list(markers)
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+        # 状態 -> 見本 (枚数, 特徴量の次元)
+        self.references: Dict[str, np.ndarray] = {}
+        self.load()
+
+    def _layout(self) -> np.ndarray:
+        """見本を記録したときの目印の領域とサムネイルの大きさ"""
+        return np.array(
+            [len(self.markers), *self.thumbnail_size]
+            + [v for rect in self.markers for v in rect],
+            dtype=np.float64,
+        )
+
+    def load(self):
+        self.references = {}
+        if not self.filepath.exists():
+            return
+        try:
+            with np.load(self.filepath) as data:
+                if "_layout" not in data or not np.array_equal(
+                    data["_layout"], self._layout()
+                ):
+                    # 目印の設定が変わった見本は比較できない
+                    self.logger.warning(
+                        "Screen state references were recorded with different markers. Ignoring them."
+                    )
+                    return
+                self.references = {
+                    state: data[state] for state in data.files if state in STATES
+                }
+        except Exception as e:
+            self.logger.error(f"Failed to load screen state references: {e}")
+
+    def save(self):
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(self.filepath, _layout=self._layout(), **self.references)
+        except Exception as e:
+            self.logger.error(f"Failed to save screen state references: {e}")
+
+    def has(self, state: str) -> bool:
+        """見本が記録されている (判定できる) 状態か"""
+        return state in self.references
+
+    def thumbnail(self, image: np.ndarray) -> np.ndarray:
+        """目印の領域をグレースケールで縮小してつなげた特徴量"""
+        parts = []
+        for rect in self.markers:
+            cropped = self.screen_reader.crop_from_rect(image, rect)
+            if cropped.size == 0:
+                parts.append(np.zeros(self.thumbnail_size[0] * self.thumbnail_size[1]))
+                continue
+            gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
+            small = cv2.resize(gray, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+            parts.append(small.ravel())
+        return np.concatenate(parts).astype(np.float32)
+
+    def record(self, state: str, image: Optional[np.ndarray] = None):
+        """現在の画面 (または image) を state の見本として追加する"""
+        if state not in STATES:
+            raise ValueError(f"不明な画面の状態です: {state}")
+        if image is None:
+            image = self.screen_reader.capture_screen()
+        sample = self.thumbnail(image)[np.newaxis]
+        if state in self.references:
+            sample = np.vstack([self.references[state], sample])
+        self.references[state] = sample
+        self.save()
+
+    def clear(self, state: Optional[str] = None):
+        """state の見本 (省略時はすべて) を削除する"""
+        if state is None:
+            self.references = {}
+        else:
+            self.references.pop(state, None)
+        self.save()
+
+    def distances(self, image: np.ndarray) -> Dict[str, float]:
+        """状態ごとの、最も近い見本との平均輝度差"""
+        features = self.thumbnail(image)
+        return {
+            state: float(np.abs(samples - features).mean(axis=1).min())
+            for state, samples in self.references.items()
+        }
+
+    def classify(self, image: Optional[np.ndarray] = None) -> Optional[str]:
+        """現在の画面の状態 (どの見本にも近くない場合は None)"""
+        if not self.references:
+            return None
+        if image is None:
+            image = self.screen_reader.capture_screen()
+        distances = self.distances(image)
+        state = min(distances, key=distances.get)
+        return state if distances[state] <= self.threshold else None
+
+    def wait_for_state(
+        self,
+        states: Iterable[str],
+        timeout: float = SCREEN_STATE_TIMEOUT,
+        cancel: Optional[threading.Event] = None,
+    ) -> Optional[str]:
+        """
+        states のいずれかの画面になるまで待ち、その状態を返す。
+        timeout 秒以内にならない場合、または cancel が set された場合は None。
+        """
+        states = set(states)
+        end_time = time.time() + timeout
+        current = None
+        while True:
+            current = self.classify()
+            if current in states:
+                return current
+            if cancel is not None and cancel.is_set():
+                return None
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                break
+            if cancel is not None:
+                cancel.wait(min(self.poll_interval, remaining))
+            else:
+                time.sleep(min(self.poll_interval, remaining))
+
+        self.logger.warning(
+            f"Timed out waiting for screen state {sorted(states)} (current: {current})."
+        )
+        return None
+
+
+def main(argv=None) -> int:
+    """
+    画面の状態の見本を記録・確認する。
+    例: uv run python -m src.skill_reroller.screen_state record result --delay 3
+    """
+    parser = argparse.ArgumentParser(description="画面の状態の見本を記録・確認する")
+    parser.add_argument(
+        "command",
+        choices=["record", "check", "list", "clear"],
+        help="record: 見本を追加 / check: 現在の画面を判定 / list: 見本の枚数 / clear: 見本を削除",
+    )
+    parser.add_argument(
+        "state",
+        nargs="?",
+        choices=list(STATES),
+        help="record/clear の対象の状態 (clear で省略するとすべて削除)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=3.0,
+        help="ゲームの画面に切り替えるまでの待ち時間 (秒)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    classifier = ScreenStateClassifier()
+
+    if args.command == "list":
+        for state, label in STATES.items():
+            samples = classifier.references.get(state)
+            print(f"{state} ({label}): {0 if samples is None else len(samples)}枚")
+        return 0
+
+    if args.command == "clear":
+        classifier.clear(args.state)
+        print(f"見本を削除しました: {args.state or 'すべて'}")
+        return 0
+
+    if args.command == "record" and args.state is None:
+        print("記録する状態を指定してください")
+        return 1
+
+    print(f"{args.delay:g}秒後に画面をキャプチャします...")
+    time.sleep(args.delay)
+    image = classifier.screen_reader.capture_screen()
+
+    if args.command == "record":
+        classifier.record(args.state, image)
+        print(
+            f"{STATES[args.state]} の見本を記録しました ({len(classifier.references[args.state])}枚)"
+        )
+        return 0
+
+    distances = classifier.distances(image)
+    if not distances:
+        print("見本が記録されていません")
+        return 1
+    for state, distance in sorted(distances.items(), key=lambda x: x[1]):
+        print(f"{state} ({STATES[state]}): {distance:.1f}")
+    state = classifier.classify(image)
+    print(
+        f"判定: {STATES[state] if state else '不明'} (しきい値 {classifier.threshold:g})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+from .config import OUTPUT_DIR, CHECKPOINT_FILE_NAME, CHECKPOINT_FSYNC_INTERVAL
+
+
+class SessionCheckpoint:
+    """
+    実行中のセッションの結果を1回ごとに追記するチェックポイントファイル。
+    異常終了しても記録済みの結果を次回起動時に厳選表へ反映できる。
+
+    1行目はセッション情報、2行目以降は各回の結果 (JSON Lines)。
+    正常終了時にファイルを削除するため、ファイルが残っていれば未完了のセッションがある。
+    """
+
+    def __init__(
+        self,
+        output_dir: str = OUTPUT_DIR,
+        filename: str = CHECKPOINT_FILE_NAME,
+        fsync_interval: int = CHECKPOINT_FSYNC_INTERVAL,
+    ):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.filepath = self.output_dir / filename
+        self.fsync_interval = max(1, fsync_interval)
+        self.logger = logging.getLogger(__name__)
+        self._file = None
+        self._pending = 0
+
+    def start(
+        self,
+        weapon: str,
+        element: str,
+        confirmed_count: int,
+        session_timestamp: str,
+        resume: bool = False,
+    ):
+        """記録を開始する。resume の場合は既存のファイルに追記する"""
+        if resume and self.filepath.exists():
+            self._file = self._open_for_append()
+            return
+
+        self._file = open(self.filepath, mode="w", encoding="utf-8")
+        self._write(
+            {
+                "type": "session",
+                "weapon": weapon,
+                "element": element,
+                "confirmed_count": confirmed_count,
+                "timestamp": session_timestamp,
+            }
+        )
+        self._sync()
+
+    def append(self, count: int, skills: str):
+        """
+        1回分の結果を追記する。プロセスが強制終了されても失われないよう毎回 flush し、
+        電源断に備えた fsync は fsync_interval 回ごとにまとめて行う
+        """
+        if self._file is None:
+            return
+        self._write({"type": "attempt", "count": count, "skills": skills})
+        self._pending += 1
+        if self._pending >= self.fsync_interval:
+            self._sync()
+
+    def finish(self):
+        """セッションが正常に終了した。チェックポイントを削除する"""
+        self.close()
+        try:
+            self.filepath.unlink(missing_ok=True)
+        except Exception as e:
+            self.logger.error(f"Failed to remove session checkpoint: {e}")
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self._sync()
+            self._file.close()
+        except Exception as e:
+            self.logger.error(f"Failed to close session checkpoint: {e}")
+        self._file = None
+
+    def _open_for_append(self):
+        # 中断で末尾が改行で終わっていない場合は、次の記録と混ざらないよう改行を補う
+        needs_newline = not self.filepath.read_bytes().endswith(b"\n")
+        f = open(self.filepath, mode="a", encoding="utf-8")
+        if needs_newline:
+            f.write("\n")
+        return f
+
+    def _write(self, record: Dict):
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+        except Exception as e:
+            self.logger.error(f"Failed to write session checkpoint: {e}")
+
+    def _sync(self):
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except Exception as e:
+            self.logger.error(f"Failed to sync session checkpoint: {e}")
+        self._pending = 0
+
+    def load_unfinished(self) -> Optional[Dict]:
+        """
+        未完了のセッションを読み込む。存在しない場合は None。
+        戻り値はセッション情報に "results" (回数順の結果文字列のリスト) を加えたもの。
+        """
+        if not self.filepath.exists():
+            return None
+
+        session = None
+        attempts: Dict[int, str] = {}
+        merged = 0
+        try:
+            with open(self.filepath, mode="r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 書き込み途中で中断された行は無視する
+                        continue
+                    if record.get("type") == "session":
+                        session = record
+                    elif record.get("type") == "attempt":
+                        attempts[record["count"]] = record["skills"]
+                    elif record.get("type") == "merged":
+                        merged = record["results"]
+        except Exception as e:
+            self.logger.error(f"Failed to read session checkpoint: {e}")
+            return None
+
+        if session is None:
+            return None
+
+        # 確定済み回数の直後から連続している分のみを採用する
+        results = []
+        count = session["confirmed_count"] + 1
+        while count in attempts:
+            results.append(attempts[count])
+            count += 1
+
+        session["results"] = results
+        # 厳選表に反映済みの件数
+        session["merged"] = merged
+        return session
+
+    def merge_unfinished(self, table_manager) -> Optional[Dict]:
+        """
+        未完了のセッションの記録を厳選表に反映する。
+        反映したセッション情報を返す (未完了のセッションがない場合は None)。
+        チェックポイントファイルは再開できるように残す。
+        """
+        session = self.load_unfinished()
+        if session is None or not session["results"]:
+            return session
+        if session["merged"] >= len(session["results"]):
+            return session
+
+        self.logger.info(
+            f"Recovering {len(session['results'])} results of unfinished session "
+            f"{session['timestamp']} ({session['weapon']}_{session['element']})."
+        )
+        table_manager.update_table(
+            weapon=session["weapon"],
+            element=session["element"],
+            new_results=session["results"],
+            confirmed_count=session["confirmed_count"],
+        )
+
+        # 二重に反映しないよう、反映済みの件数を記録しておく
+        try:
+            with self._open_for_append() as f:
+                record = {"type": "merged", "results": len(session["results"])}
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            self.logger.error(f"Failed to mark session checkpoint as merged: {e}")
+        session["merged"] = len(session["results"])
+        return session
@@ -0,0 +1,98 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from .config import SERIES_SKILLS, GROUP_SKILLS, MATCH_THRESHOLD
+from .utils import is_fuzzy_match, find_best_match
+
+# 全スキルリストを作成
+ALL_SKILLS = SERIES_SKILLS + GROUP_SKILLS
+
+# スキル名 -> 正規ID (config.toml のスキル一覧の並び順)
+SERIES_IDS = {name: i for i, name in enumerate(SERIES_SKILLS)}
+GROUP_IDS = {name: i for i, name in enumerate(GROUP_SKILLS)}
+
+# スキルが検出できなかった枠のID
+UNKNOWN_ID = -1
+
+
+def series_name(series_id: int) -> str:
+    """シリーズスキルIDをスキル名に変換する (不明な場合は空文字)"""
+    return SERIES_SKILLS[series_id] if 0 <= series_id < len(SERIES_SKILLS) else ""
+
+
+def group_name(group_id: int) -> str:
+    """グループスキルIDをスキル名に変換する (不明な場合は空文字)"""
+    return GROUP_SKILLS[group_id] if 0 <= group_id < len(GROUP_SKILLS) else ""
+
+
+@lru_cache(maxsize=4096)
+def _resolve_fuzzy(text: str, threshold: float) -> Tuple[str, float]:
+    # 部分一致するスキルがあれば、それを正とする
+    for skill in ALL_SKILLS:
+        if skill in text:
+            return skill, 1.0
+
+    # 全スキルの中で最も近いものを採用する (他のスキルの方が近い誤検出を防ぐ)
+    best_skill, best_score, _ = find_best_match(text, ALL_SKILLS)
+    if best_skill and is_fuzzy_match(best_skill, text, threshold):
+        return best_skill, best_score
+    return "", best_score
+
+
+def canonicalize_skill(
+    text: str, corrections=None, threshold: float = MATCH_THRESHOLD
+) -> Tuple[str, float]:
+    """
+    OCRで読み取った1行をスキル名に正規化する。
+    戻り値は (スキル名, 信頼度)。該当なしの場合スキル名は空文字。
+    corrections (CorrectionMap) が指定された場合は、あいまい検索の前に参照する。
+    """
+    if text in SERIES_IDS or text in GROUP_IDS:
+        return text, 1.0
+
+    if corrections is not None:
+        corrected = corrections.lookup(text)
+        if corrected is not None:
+            return corrected, find_best_match(text, [corrected])[1]
+
+    return _resolve_fuzzy(text, threshold)
+
+
+def canonicalize_skills(
+    detected_skills: List[str],
+    corrections=None,
+    threshold: float = MATCH_THRESHOLD,
+) -> Tuple[int, int, float]:
+    """
+    OCR結果の行リストを (series_id, group_id, 信頼度) に変換する。
+    信頼度は検出できた各スキルの信頼度の最小値。何も検出できない場合は 0.0。
+    """
+    series_id = UNKNOWN_ID
+    group_id = UNKNOWN_ID
+    confidence: Optional[float] = None
+
+    for detected in detected_skills:
+        if not detected:
+            continue
+        skill, score = canonicalize_skill(detected, corrections, threshold)
+        if not skill:
+            continue
+        if skill in SERIES_IDS and series_id == UNKNOWN_ID:
+            series_id = SERIES_IDS[skill]
+        elif skill in GROUP_IDS and group_id == UNKNOWN_ID:
+            group_id = GROUP_IDS[skill]
+        else:
+            continue
+        confidence = score if confidence is None else min(confidence, score)
+
+    if confidence is None:
+        return series_id, group_id, 0.0
+    return series_id, group_id, round(confidence, 3)
+
+
+def canonicalize_cell(
+    skills_str: str, corrections=None, threshold: float = MATCH_THRESHOLD
+) -> Tuple[int, int, float]:
+    """厳選表のセル文字列 ("シリーズ+グループ") を正規IDに変換する"""
+    if not skills_str:
+        return UNKNOWN_ID, UNKNOWN_ID, 0.0
+    return canonicalize_skills(skills_str.split("+"), corrections, threshold)
@@ -0,0 +1,111 @@
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+# (回数, 列名, OCR結果, series_id, group_id, 信頼度)
+CellRecord = Tuple[int, str, str, int, int, float]
+
+
+class SqliteTableStore:
+    """
+    厳選表を (回数, 列名) をキーとしてSQLiteに保存するストア。
+    WALモードで開くため、実行スレッドが書き込み中でもGUI側の接続から読み込める。
+    各行には更新順の通し番号 (seq) を振り、前回以降に変わった行だけを取得できる。
+    """
+
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.filepath), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cells (
+                count INTEGER NOT NULL,
+                column_name TEXT NOT NULL,
+                text TEXT NOT NULL,
+                series_id INTEGER NOT NULL,
+                group_id INTEGER NOT NULL,
+                confidence REAL NOT NULL,
+                seq INTEGER NOT NULL,
+                PRIMARY KEY (count, column_name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cells_column ON cells (column_name, count);
+            CREATE INDEX IF NOT EXISTS idx_cells_combo ON cells (series_id, group_id, count);
+            CREATE INDEX IF NOT EXISTS idx_cells_seq ON cells (seq);
+            """)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM cells LIMIT 1").fetchone() is None
+
+    def max_seq(self) -> int:
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(seq) FROM cells").fetchone()
+        return row[0] or 0
+
+    def upsert(self, records: Iterable[CellRecord]) -> int:
+        """セルをまとめて書き込む (1トランザクション)。書き込みに付けた通し番号を返す"""
+        with self._lock:
+            with self.conn:
+                # 通し番号の読み込みから書き込みまでを1つの書き込みトランザクションにし、
+                # 別の接続・プロセスと同じ番号を振らないようにする
+                self.conn.execute("BEGIN IMMEDIATE")
+                seq = (
+                    self.conn.execute("SELECT MAX(seq) FROM cells").fetchone()[0] or 0
+                ) + 1
+                self.conn.executemany(
+                    """
+                    INSERT INTO cells
+                        (count, column_name, text, series_id, group_id, confidence, seq)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (count, column_name) DO UPDATE SET
+                        text = excluded.text,
+                        series_id = excluded.series_id,
+                        group_id = excluded.group_id,
+                        confidence = excluded.confidence,
+                        seq = excluded.seq
+                    """,
+                    [record + (seq,) for record in records],
+                )
+        return seq
+
+    def read_since(self, seq: int = 0) -> Tuple[List[CellRecord], int]:
+        """
+        通し番号が seq より大きい (前回の読み込み以降に変わった) セルを返す。
+        戻り値は (セルのリスト, 読み込んだ中で最大の通し番号)。
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT count, column_name, text, series_id, group_id, confidence, seq
+                FROM cells WHERE seq > ? ORDER BY seq
+                """,
+                (seq,),
+            ).fetchall()
+
+        if not rows:
+            return [], seq
+        return [tuple(row[:6]) for row in rows], rows[-1][6]
+
+    def combo_positions(
+        self, series_id: int, group_id: int, after_count: int = 0
+    ) -> List[Tuple[int, str]]:
+        """指定した組み合わせが after_count より後に出現する (回数, 列名) の一覧"""
+        with self._lock:
+            return self.conn.execute(
+                """
+                SELECT count, column_name FROM cells
+                WHERE series_id = ? AND group_id = ? AND count > ?
+                ORDER BY count, column_name
+                """,
+                (series_id, group_id, after_count),
+            ).fetchall()
@@ -1,41 +1,887 @@
+import bisect
 import csv
+import hashlib
+import json
 import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import (
+    Callable,
+    Iterator,
+    List,
+    Dict,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+import numpy as np
 from .config import (
     TABLE_FILE_NAME,
     OUTPUT_DIR,
     CURRENT_CONFIRMED_COUNT,
+    MATCH_THRESHOLD,
+    QUERY_CACHE_SIZE,
+    JOURNAL_COMPACT_THRESHOLD,
+    TABLE_BACKEND,
+    COLUMNAR_SNAPSHOT,
+    LAZY_COLUMNS,
+    LOADED_COLUMN_LIMIT,
+    MERGE_PARALLEL_THRESHOLD,
+    LOCATOR_GRAM_SIZE,
+    LOCATOR_MAX_MISMATCHES,
+    OBSERVATION_MIN_SCORE,
     WEAPONS,
     ELEMENTS,
     SERIES_SKILLS,
     GROUP_SKILLS,
 )
-from .utils import is_fuzzy_match, calculate_similarity
+from .ocr_corrections import CorrectionMap
+from .skill_ids import canonicalize_cell, UNKNOWN_ID
+from .sqlite_store import SqliteTableStore
+from .columnar_store import ABSENT, write_columnar, build_lookup, ColumnarTable
+from .observation_log import Observation, ObservationLog
+from .target_query import TargetQuery
+
+# スキル一覧が変わると正規IDの対応も変わるため、保存時に一覧の指紋を記録する
+SKILLS_FINGERPRINT = hashlib.sha1(
+    "\n".join(SERIES_SKILLS + ["|"] + GROUP_SKILLS).encode("utf-8")
+).hexdigest()
+
+
+# 同じファイルを扱う TableManager 同士 (GUIと実行スレッド) で共有するロック
+_FILE_LOCKS: Dict[str, threading.RLock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+def _file_lock(path: Path) -> threading.RLock:
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(str(path.resolve()), threading.RLock())
+
+
+def _canonicalize_texts(
+    texts: List[str], corrections: Optional[CorrectionMap], threshold: float
+) -> List[Tuple[int, int, float]]:
+    # ProcessPoolExecutor から呼び出すため、モジュールの関数にしておく
+    return [canonicalize_cell(text, corrections, threshold) for text in texts]
+
+
+def journal_path(path: Path) -> Path:
+    """厳選表 (CSV) に対応するジャーナルのパス"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}_journal.csv")
 
-# 全スキルリストを作成
-ALL_SKILLS = SERIES_SKILLS + GROUP_SKILLS
+
+def table_file_exists(path: Path) -> bool:
+    """厳選表のCSVかジャーナルのどちらかがあれば True (ジャーナルだけの表もある)"""
+    return Path(path).exists() or journal_path(path).exists()
+
+
+def _read_table_file(path: Path) -> Iterator[Tuple[int, str, str]]:
+    """
+    CSV (スナップショット) とそのジャーナルを順に読み、(回数, 列名, OCR結果) を返す。
+    同じセルは後に返したものが新しい。空欄は記録なしとして返さない。
+    """
+    path = Path(path)
+    if path.exists():
+        with open(path, mode="r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            for row in reader if headers else []:
+                try:
+                    count = int(row[0])
+                except (ValueError, IndexError):
+                    continue
+                for column_name, text in zip(headers[1:], row[1:]):
+                    if text:
+                        yield count, column_name, text
+
+    journal_filepath = journal_path(path)
+    if journal_filepath.exists():
+        with open(journal_filepath, mode="r", encoding="utf-8", newline="") as f:
+            for record in csv.reader(f):
+                if len(record) < 3 or not record[2]:
+                    continue
+                try:
+                    count = int(record[0])
+                except ValueError:
+                    continue
+                yield count, record[1], record[2]
+
+
+def _freeze(value):
+    """
+    キャッシュする検索結果を書き換えられない形にする。
+    一致の一覧 (辞書のリスト) はタプルに、集計 (辞書の辞書) は読み取り専用の辞書にする。
+    """
+    if isinstance(value, list):
+        return tuple(MappingProxyType(m) for m in value)
+    return MappingProxyType({k: MappingProxyType(v) for k, v in value.items()})
+
+
+def column_sort_key(header: str) -> Tuple[int, int]:
+    """列 (武器_属性) を武器順・属性順に並べるためのキー"""
+    try:
+        parts = header.split("_")
+        if len(parts) >= 2:
+            weapon = parts[0]
+            element = parts[1]
+            w_idx = WEAPONS.index(weapon) if weapon in WEAPONS else 999
+            e_idx = ELEMENTS.index(element) if element in ELEMENTS else 999
+            return (w_idx, e_idx)
+        return (999, 999)
+    except Exception:
+        return (999, 999)
+
+
+class Cell(NamedTuple):
+    """厳選表の1セル。OCR結果の文字列と、書き込み時に正規化したスキルIDを持つ"""
+
+    text: str
+    series_id: int
+    group_id: int
+    confidence: float
+
+
+class TableChange(NamedTuple):
+    """
+    厳選表の変更通知。columns は {列名: (変更された最小の回数, 最大の回数)}。
+    読み込み直しなどで全体が変わった場合は full が True になる。
+    """
+
+    columns: Dict[str, Tuple[int, int]]
+    full: bool = False
+
+
+class _TableSnapshot(NamedTuple):
+    """
+    ファイルに書き出す時点の厳選表。読み込み済みのセルは行ごとに複製し、
+    未読み込みの列は読み込まずに列指向のスナップショット (columnar) から書き出す
+    """
+
+    headers: List[str]
+    data: Dict[int, Dict[str, Cell]]
+    canonical: Dict[str, Tuple[int, int, float]]
+    columnar: Optional[ColumnarTable]
+    unloaded: List[str]
 
 
 class TableManager:
-    def __init__(self, output_dir: str = OUTPUT_DIR, filename: str = TABLE_FILE_NAME):
+    def __init__(
+        self,
+        output_dir: str = OUTPUT_DIR,
+        filename: str = TABLE_FILE_NAME,
+        corrections: Optional[CorrectionMap] = None,
+        threshold: float = MATCH_THRESHOLD,
+        backend: str = TABLE_BACKEND,
+    ):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.filepath = self.output_dir / filename
+        # OCR結果の文字列 -> 正規ID の対応 (CSVは人が読める形のまま残す)
+        self.canonical_filepath = self.filepath.with_name(
+            f"{self.filepath.stem}_canonical.json"
+        )
+        # 更新は追記専用のジャーナルに書き、CSVへの反映 (コンパクション) はまとめて行う
+        self.journal_filepath = journal_path(self.filepath)
+        self.journal_compact_threshold = JOURNAL_COMPACT_THRESHOLD
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._snapshot_mtime: Optional[float] = None
+        # 列指向のバイナリ形式 (numpy.memmap で開ける) のスナップショット
+        self.columnar_dirpath = self.filepath.with_name(
+            f"{self.filepath.stem}_columnar"
+        )
+        self.columnar_snapshot = COLUMNAR_SNAPSHOT
+        # 各セルのこれまでの読み取り結果。セルにはその多数決の結果を書き込む
+        self.observations = ObservationLog(
+            self.filepath.with_name(f"{self.filepath.stem}_observations.csv")
+        )
+        self.resample_filepath = self.filepath.with_name(
+            f"{self.filepath.stem}_resample.md"
+        )
+        self._lock = _file_lock(self.filepath)
+        # コンパクションは同じファイルにつき1つずつ行う (書き出しの間は self._lock を持たない)
+        self._compact_lock = _file_lock(
+            self.filepath.with_name(f"{self.filepath.name}.compact")
+        )
+        self._compacting = False
+        self._compacting_guard = threading.Lock()
+        # コンパクションの書き出し中に変更された列 (書き出し中でなければ None)
+        self._modified_during_compaction: Optional[Set[str]] = None
         self.logger = logging.getLogger(__name__)
-        self.data: Dict[int, Dict[str, str]] = {}
+        # backend = "sqlite" の場合はSQLiteを正とし、CSVはエクスポート先として扱う
+        self.store: Optional[SqliteTableStore] = None
+        self._store_seq = 0
+        if backend == "sqlite":
+            self.store = SqliteTableStore(
+                self.filepath.with_name(f"{self.filepath.stem}.sqlite3")
+            )
+        # 列指向のスナップショットがCSVより新しい場合、各列は初めて使う時に読み込む
+        self.lazy_columns = (
+            LAZY_COLUMNS and self.columnar_snapshot and self.store is None
+        )
+        self.loaded_column_limit = max(1, LOADED_COLUMN_LIMIT)
+        self._columnar: Optional[ColumnarTable] = None
+        self._unloaded_columns: Set[str] = set()
+        # スナップショットから読み込んだ列 (使われた順)。上限を超えたら古いものから捨てる
+        self._loaded_columns: OrderedDict = OrderedDict()
+        # スナップショット以降に変更された列は捨てない
+        self._dirty_columns: Set[str] = set()
+        self.corrections = corrections
+        self.threshold = threshold
+        self.data: Dict[int, Dict[str, Cell]] = {}
         self.headers: List[str] = ["回数"]
+        self.canonical: Dict[str, Tuple[int, int, float]] = {}
+        # 転置インデックス: 正規ID -> (回数, 列名) の昇順リスト
+        # skill_postings のキーは ("series" | "group", スキルID)
+        self.skill_postings: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
+        self.combo_postings: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+        # 読み込み済みのセルの、列ごとのシリーズ/グループスキルの正規IDごとの出現数
+        # (先頭は不明)。転置インデックスと合わせて差分更新する
+        self._slot_counts: Dict[str, Tuple[List[int], List[int]]] = {}
+        # id_matrix の結果と、その後に変更されたセル。次の呼び出しで変更されたセルだけを書き換える
+        self._matrix: Optional[Tuple[int, List[str], np.ndarray, np.ndarray]] = None
+        self._matrix_changes: Set[Tuple[int, str]] = set()
+        # 内容が変わるたびに増える版数。検索結果のキャッシュキーに使う
+        self.version = 0
+        self.query_cache_size = QUERY_CACHE_SIZE
+        self._query_cache: OrderedDict = OrderedDict()
+        # 変更通知の購読者と、まだ通知していない変更範囲 (列名 -> [最小, 最大])
+        self._listeners: List[Callable[[TableChange], None]] = []
+        self._changed: Dict[str, List[int]] = {}
+        self._changed_full = False
+        # 位置特定用の q-gram 索引 (列名 -> (版数, 索引))
+        self.locator_gram_size = max(1, LOCATOR_GRAM_SIZE)
+        self._gram_index: Dict[str, Tuple[int, Dict[Tuple, List[int]]]] = {}
         self.load_table()
+        self._changed_full = False
+
+    def reload(self):
+        """内部データを破棄してファイルから読み込み直す"""
+        with self._lock:
+            self.data.clear()
+            self.headers = ["回数"]
+            self.canonical.clear()
+            self.skill_postings = {}
+            self.combo_postings = {}
+            self.load_table()
+
+    def subscribe(self, callback: Callable[[TableChange], None]) -> Callable[[], None]:
+        """
+        変更通知を受け取る関数を登録する。戻り値は登録を解除する関数。
+        通知は書き込んだスレッドから呼び出される。
+        """
+        self._listeners.append(callback)
+
+        def unsubscribe():
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+        return unsubscribe
+
+    def _emit_changes(self):
+        """溜まっている変更をまとめて購読者に通知する"""
+        with self._lock:
+            if not self._changed and not self._changed_full:
+                return
+            change = TableChange(
+                {column: (lo, hi) for column, (lo, hi) in self._changed.items()},
+                self._changed_full,
+            )
+            self._changed = {}
+            self._changed_full = False
+
+        for listener in list(self._listeners):
+            try:
+                listener(change)
+            except Exception as e:
+                self.logger.error(f"Table change listener failed: {e}")
+
+    def make_cell(self, text: str) -> Cell:
+        """OCR結果の文字列からセルを作成する。正規化は文字列ごとに一度だけ行う"""
+        canonical = self.canonical.get(text)
+        if canonical is None:
+            canonical = canonicalize_cell(text, self.corrections, self.threshold)
+            self.canonical[text] = canonical
+        return Cell(text, *canonical)
+
+    def recanonicalize(self):
+        """補正辞書の更新などを反映するため、全セルの正規IDを計算し直す"""
+        with self._lock:
+            self._load_all_columns()
+            # スナップショットの正規IDは古くなるため、次のコンパクションまで全列を保持する
+            self._dirty_columns.update(self._loaded_columns)
+            self.canonical.clear()
+            for row_data in self.data.values():
+                for column_name, cell in row_data.items():
+                    row_data[column_name] = self.make_cell(cell.text)
+            self.rebuild_index()
+            self._save_canonical()
+            self._changed_full = True
+        self._emit_changes()
+
+    def rebuild_index(self):
+        """全セルから転置インデックスを作り直す"""
+        self.version += 1
+        self.skill_postings = {}
+        self.combo_postings = {}
+        self._slot_counts = {}
+        self._matrix = None
+        for count, row_data in self.data.items():
+            for column_name, cell in row_data.items():
+                for key, postings in self._posting_keys(cell):
+                    postings.setdefault(key, []).append((count, column_name))
+                self._count_slots(column_name, cell, 1)
+
+        for postings in (self.skill_postings, self.combo_postings):
+            for posting_list in postings.values():
+                posting_list.sort()
+
+    def _posting_keys(self, cell: Cell):
+        keys = []
+        if cell.series_id != UNKNOWN_ID:
+            keys.append((("series", cell.series_id), self.skill_postings))
+        if cell.group_id != UNKNOWN_ID:
+            keys.append((("group", cell.group_id), self.skill_postings))
+        if cell.text:
+            keys.append(((cell.series_id, cell.group_id), self.combo_postings))
+        return keys
+
+    def _set_cell(self, count: int, column_name: str, cell: Cell):
+        """セルを書き込み、転置インデックスを差分更新する"""
+        if self._columnar is not None:
+            self._ensure_column(column_name)
+            self._dirty_columns.add(column_name)
+
+        if self._modified_during_compaction is not None:
+            self._modified_during_compaction.add(column_name)
+
+        row_data = self.data.setdefault(count, {})
+        old_cell = row_data.get(column_name)
+        if old_cell is not None:
+            self._remove_postings(count, column_name, old_cell)
+
+        row_data[column_name] = cell
+        for key, postings in self._posting_keys(cell):
+            bisect.insort(postings.setdefault(key, []), (count, column_name))
+        self._count_slots(column_name, cell, 1)
+        if self._matrix is not None:
+            self._matrix_changes.add((count, column_name))
+
+        span = self._changed.get(column_name)
+        if span is None:
+            self._changed[column_name] = [count, count]
+        else:
+            span[0] = min(span[0], count)
+            span[1] = max(span[1], count)
+
+    def _count_slots(self, column_name: str, cell: Cell, delta: int):
+        """列ごとの正規IDの出現数を差分更新する (スキル未検出のセルは数えない)"""
+        if not cell.text:
+            return
+        entry = self._slot_counts.get(column_name)
+        if entry is None:
+            entry = self._slot_counts[column_name] = (
+                [0] * (len(SERIES_SKILLS) + 1),
+                [0] * (len(GROUP_SKILLS) + 1),
+            )
+        entry[0][cell.series_id + 1] += delta
+        entry[1][cell.group_id + 1] += delta
+
+    def _remove_postings(self, count: int, column_name: str, cell: Cell):
+        self._count_slots(column_name, cell, -1)
+        posting = (count, column_name)
+        for key, postings in self._posting_keys(cell):
+            posting_list = postings.get(key)
+            if not posting_list:
+                continue
+            i = bisect.bisect_left(posting_list, posting)
+            if i < len(posting_list) and posting_list[i] == posting:
+                posting_list.pop(i)
+            if not posting_list:
+                del postings[key]
+
+    def _ensure_column(self, column_name: str, evict: bool = True):
+        """未読み込みの列をスナップショットから読み込む"""
+        if column_name in self._loaded_columns:
+            self._loaded_columns.move_to_end(column_name)
+            return
+        if column_name not in self._unloaded_columns:
+            return
+
+        self._unloaded_columns.discard(column_name)
+        touched = set()
+        for count, (
+            text,
+            series_id,
+            group_id,
+            confidence,
+        ) in self._columnar.read_column(column_name).items():
+            self.canonical.setdefault(text, (series_id, group_id, confidence))
+            cell = Cell(text, series_id, group_id, confidence)
+            self.data.setdefault(count, {})[column_name] = cell
+            for key, postings in self._posting_keys(cell):
+                postings.setdefault(key, []).append((count, column_name))
+                touched.add(key)
+            self._count_slots(column_name, cell, 1)
+
+        for postings in (self.skill_postings, self.combo_postings):
+            for key, posting_list in postings.items():
+                if key in touched:
+                    posting_list.sort()
+
+        self._loaded_columns[column_name] = None
+        self.logger.debug(f"Loaded column {column_name} from columnar table.")
+        if evict:
+            self._evict_columns(keep=column_name)
+
+    def _evict_columns(self, keep: Optional[str] = None):
+        """
+        読み込んだ列が上限を超えた場合、使われていない列から捨てる。
+        keep (読み込んだばかりの列) は、他に捨てられる列がなくても捨てない。
+        """
+        while len(self._loaded_columns) > self.loaded_column_limit:
+            victim = next(
+                (
+                    c
+                    for c in self._loaded_columns
+                    if c not in self._dirty_columns and c != keep
+                ),
+                None,
+            )
+            if victim is None:
+                return
+            self._unload_column(victim)
+
+    def _unload_column(self, column_name: str):
+        del self._loaded_columns[column_name]
+        self._unloaded_columns.add(column_name)
+        for count in list(self.data):
+            row_data = self.data[count]
+            cell = row_data.pop(column_name, None)
+            if cell is None:
+                continue
+            self._remove_postings(count, column_name, cell)
+            if not row_data:
+                del self.data[count]
+
+    def _load_all_columns(self):
+        """全セルを扱う処理 (保存・再正規化など) の前に全列を読み込む"""
+        for column_name in list(self._unloaded_columns):
+            self._ensure_column(column_name, evict=False)
+
+    def _match_unloaded(
+        self, values: Dict[Tuple[int, int], int], after_count: int
+    ) -> List[Tuple[int, str, int, Cell]]:
+        """
+        未読み込みの列から正規IDの組が values に含まれるセルを探す。
+        戻り値は (回数, 列名, values の値, セル) の一覧。
+        """
+        with self._lock:
+            if self._columnar is None or not self._unloaded_columns or not values:
+                return []
+
+            lookup = build_lookup(values, len(SERIES_SKILLS), len(GROUP_SKILLS))
+            matches = []
+            for column_name in self._unloaded_columns:
+                for count, value, cell in self._columnar.match_column(
+                    column_name, lookup, after_count
+                ):
+                    matches.append((count, column_name, value, Cell(*cell)))
+            return matches
+
+    def text_counts(self) -> Dict[str, int]:
+        """表に記録されたOCR結果の文字列ごとの件数 (未読み込みの列も含む)"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for row_data in self.data.values():
+                for cell in row_data.values():
+                    counts[cell.text] = counts.get(cell.text, 0) + 1
+            for column_name in self._unloaded_columns:
+                for text, n in self._columnar.text_counts(column_name).items():
+                    counts[text] = counts.get(text, 0) + n
+            return counts
+
+    def slot_counts(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        列ごとの、シリーズ/グループスキルの正規IDごとの出現数 (先頭は不明)。
+        スキル未検出のセルは含めない。未読み込みの列はスナップショットから数える。
+        """
+        with self._lock:
+            counts: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+                column_name: (
+                    np.array(series, dtype=np.int64),
+                    np.array(group, dtype=np.int64),
+                )
+                for column_name, (series, group) in self._slot_counts.items()
+                if any(series)
+            }
+            for column_name in self._unloaded_columns:
+                counts[column_name] = self._columnar.slot_counts(
+                    column_name, len(SERIES_SKILLS), len(GROUP_SKILLS)
+                )
+            return counts
+
+    def id_matrix(self) -> Tuple[int, List[str], np.ndarray, np.ndarray]:
+        """
+        表全体を (回数, 列, 枠) の正規ID配列にする。
+        戻り値は (先頭行の回数, 列名の一覧, ids, detected)。
+        ids は (行数, 列数, 2) の int16 で、未記録・未検出のセルは不明 (-1)。
+        detected はスキルが検出されたセルかどうかの (行数, 列数) の配列。
+        一度作った配列は保持し、次の呼び出しでは変更されたセルだけを書き換える。
+        """
+        with self._lock:
+            if self._matrix is None or not self._update_matrix():
+                self._matrix = self._build_matrix()
+            self._matrix_changes.clear()
+            min_count, columns, ids, detected = self._matrix
+            return min_count, list(columns), ids.copy(), detected.copy()
+
+    def _build_matrix(self) -> Tuple[int, List[str], np.ndarray, np.ndarray]:
+        """
+        正規ID配列を作る。スナップショットから変わっていない列は列指向のスナップショットから
+        まとめて写し、それ以外の列だけセルを1つずつ書き込む
+        """
+        columns = self.headers[1:]
+        column_index = {name: i for i, name in enumerate(columns)}
+        snapshot_columns = set()
+        if self._columnar is not None:
+            snapshot_columns = {
+                c
+                for c in columns
+                if c in self._columnar.column_index and c not in self._dirty_columns
+            }
+        counts = list(self.data)
+        if snapshot_columns and self._columnar.rows:
+            counts += [self._columnar.min_count, int(self._columnar.counts[-1])]
+        min_count = min(counts) if counts else 1
+        rows = (max(counts) - min_count + 1) if counts else 0
+
+        ids = np.full((rows, len(columns), 2), UNKNOWN_ID, dtype=np.int16)
+        detected = np.zeros((rows, len(columns)), dtype=bool)
+        for count, row_data in self.data.items():
+            for column_name, cell in row_data.items():
+                if (
+                    not cell.text
+                    or column_name in snapshot_columns
+                    or column_name not in column_index
+                ):
+                    continue
+                row, col = count - min_count, column_index[column_name]
+                ids[row, col] = (cell.series_id, cell.group_id)
+                detected[row, col] = True
+
+        for column_name in snapshot_columns:
+            column_ids, column_detected = self._columnar.column_cells(column_name)
+            start = self._columnar.min_count - min_count
+            col = column_index[column_name]
+            rows_slice = slice(start, start + len(column_ids))
+            ids[rows_slice, col] = column_ids
+            detected[rows_slice, col] = column_detected
+        return min_count, columns, ids, detected
+
+    def _update_matrix(self) -> bool:
+        """
+        保持している正規ID配列に、その後に変更されたセルを書き込む。
+        追加された行・列は広げる。作り直す必要がある場合は False を返す。
+        """
+        min_count, columns, ids, detected = self._matrix
+        headers = self.headers[1:]
+        if headers[: len(columns)] != columns:
+            # 列の並びが変わった (保存時の並べ替えなど)
+            return False
+        if not self._matrix_changes and len(headers) == len(columns):
+            return True
+
+        counts = [count for count, _ in self._matrix_changes]
+        if counts and min(counts) < min_count:
+            return False
+        rows = max([len(ids)] + [count - min_count + 1 for count in counts])
+        if rows > len(ids) or len(headers) > len(columns):
+            grown_ids = np.full((rows, len(headers), 2), UNKNOWN_ID, dtype=np.int16)
+            grown_detected = np.zeros((rows, len(headers)), dtype=bool)
+            grown_ids[: len(ids), : len(columns)] = ids
+            grown_detected[: len(ids), : len(columns)] = detected
+            ids, detected = grown_ids, grown_detected
+
+        column_index = {name: i for i, name in enumerate(headers)}
+        if any(
+            column_name not in column_index for _, column_name in self._matrix_changes
+        ):
+            return False
+        for count, column_name in self._matrix_changes:
+            cell = self.data.get(count, {}).get(column_name)
+            row, col = count - min_count, column_index[column_name]
+            if cell is not None and cell.text:
+                ids[row, col] = (cell.series_id, cell.group_id)
+                detected[row, col] = True
+            else:
+                ids[row, col] = UNKNOWN_ID
+                detected[row, col] = False
+        self._matrix = (min_count, headers, ids, detected)
+        return True
+
+    def recorded_rows(self, first: int, last: int) -> Dict[str, int]:
+        """first〜last 回目について、列ごとの記録済みの行数"""
+        with self._lock:
+            rows: Dict[str, int] = {}
+            for count in range(first, last + 1):
+                for column_name in self.data.get(count, {}):
+                    rows[column_name] = rows.get(column_name, 0) + 1
+            for column_name in self._unloaded_columns:
+                rows[column_name] = self._columnar.recorded_rows(
+                    column_name, first, last
+                )
+            return rows
+
+    def get_cell(self, count: int, column_name: str) -> Optional[Cell]:
+        """指定した回数・列のセル。記録がない場合は None"""
+        with self._lock:
+            self._ensure_column(column_name)
+            return self.data.get(count, {}).get(column_name)
+
+    def combo_positions(
+        self, series_id: int, group_id: int, after_count: int = 0
+    ) -> List[Tuple[int, str]]:
+        """指定した組み合わせが after_count より後に出現する (回数, 列名) の一覧"""
+        with self._lock:
+            posting_list = self.combo_postings.get((series_id, group_id), [])
+            start = bisect.bisect_right(posting_list, after_count, key=lambda p: p[0])
+            positions = posting_list[start:]
+            unloaded = self._match_unloaded({(series_id, group_id): 0}, after_count)
+            if unloaded:
+                positions = sorted(positions + [m[:2] for m in unloaded])
+            return positions
+
+    def skill_positions(
+        self, kind: str, skill_id: int, after_count: int = 0
+    ) -> List[Tuple[int, str]]:
+        """
+        指定したスキルが after_count より後に出現する (回数, 列名) の一覧
+        kind は "series" または "group"
+        """
+        with self._lock:
+            posting_list = self.skill_postings.get((kind, skill_id), [])
+            start = bisect.bisect_right(posting_list, after_count, key=lambda p: p[0])
+            positions = posting_list[start:]
+            if self._unloaded_columns:
+                if kind == "series":
+                    pairs = [(skill_id, g) for g in range(-1, len(GROUP_SKILLS))]
+                else:
+                    pairs = [(s, skill_id) for s in range(-1, len(SERIES_SKILLS))]
+                unloaded = self._match_unloaded(dict.fromkeys(pairs, 0), after_count)
+                positions = sorted(positions + [m[:2] for m in unloaded])
+            return positions
+
+    def _load_canonical(self):
+        if not self.canonical_filepath.exists():
+            return
+
+        try:
+            with open(self.canonical_filepath, mode="r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("skills_fingerprint") != SKILLS_FINGERPRINT:
+                self.logger.info("Skill list changed. Recomputing canonical IDs.")
+                return
+            for text, (series_id, group_id, confidence) in raw["cells"].items():
+                self.canonical[text] = (series_id, group_id, confidence)
+        except Exception as e:
+            self.logger.error(f"Failed to load canonical IDs: {e}")
+
+    def _save_canonical(self, snapshot: Optional[_TableSnapshot] = None):
+        if snapshot is None:
+            snapshot = self._take_snapshot()
+        # 表に残っている文字列のみ保存する
+        used = {
+            cell.text
+            for row_data in snapshot.data.values()
+            for cell in row_data.values()
+        }
+        if snapshot.unloaded:
+            columnar = snapshot.columnar
+            text_idx = np.asarray(
+                columnar.text_idx[
+                    [columnar.column_index[name] for name in snapshot.unloaded]
+                ]
+            )
+            used.update(
+                columnar.string(int(index))
+                for index in np.unique(text_idx)
+                if index != ABSENT
+            )
+        cells = {
+            text: list(canonical)
+            for text, canonical in snapshot.canonical.items()
+            if text in used
+        }
+        try:
+            with open(self.canonical_filepath, mode="w", encoding="utf-8") as f:
+                json.dump(
+                    {"skills_fingerprint": SKILLS_FINGERPRINT, "cells": cells},
+                    f,
+                    ensure_ascii=False,
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to save canonical IDs: {e}")
 
     def load_table(self):
-        """CSVファイルからデータを読み込む"""
+        """
+        CSVファイル (スナップショット) を読み込み、ジャーナルを再生する
+        SQLiteの場合はデータベースから読み込む (空の場合は初回のみCSVから取り込む)
+        """
+        with self._lock:
+            self._changed = {}
+            self._changed_full = True
+            if self.store is not None:
+                if self.store.is_empty() and (
+                    self.filepath.exists() or self.journal_filepath.exists()
+                ):
+                    self.import_csv(self.filepath)
+                self._load_store()
+                self.logger.info(
+                    f"Loaded table with {len(self.data)} rows and {len(self.headers)-1} data columns"
+                    f" from {self.store.filepath}."
+                )
+                return
+
+            self._load_canonical()
+            self._columnar = self._open_fresh_columnar() if self.lazy_columns else None
+            self._unloaded_columns = set()
+            self._loaded_columns.clear()
+            self._dirty_columns.clear()
+            if self._columnar is not None:
+                # 列の位置だけを把握し、セルは列ごとに初めて使う時に読み込む
+                self._snapshot_mtime = self.filepath.stat().st_mtime
+                self.headers = ["回数"] + list(self._columnar.columns)
+                self._unloaded_columns = set(self._columnar.columns)
+            else:
+                self._load_snapshot()
+            self._journal_offset = 0
+            self._journal_records = 0
+            replayed = self._replay_journal()
+            self.rebuild_index()
+
+            if self.lazy_columns and self._columnar is None and self.data:
+                # 次回以降は遅延読み込みできるよう、スナップショットを書き出しておく
+                self.export_columnar()
+
+        self.logger.info(
+            f"Loaded table with {len(self.data)} rows and {len(self.headers)-1} data columns"
+            f" ({replayed} journal records replayed,"
+            f" {len(self._unloaded_columns)} columns deferred)."
+        )
+
+    def _open_fresh_columnar(self) -> Optional[ColumnarTable]:
+        """CSVより後に書き出された列指向のスナップショットがあれば開く"""
+        if not self.filepath.exists() or not ColumnarTable.exists(
+            self.columnar_dirpath
+        ):
+            return None
+        try:
+            modified_time = ColumnarTable.modified_time(self.columnar_dirpath)
+            if modified_time < self.filepath.stat().st_mtime:
+                return None
+        except OSError:
+            return None
+        return self.open_columnar()
+
+    def _load_store(self):
+        self._store_seq = 0
+        records, self._store_seq = self.store.read_since(0)
+        for count, column_name, text, series_id, group_id, confidence in records:
+            if column_name not in self.headers:
+                self.headers.append(column_name)
+            self.canonical[text] = (series_id, group_id, confidence)
+            self.data.setdefault(count, {})[column_name] = Cell(
+                text, series_id, group_id, confidence
+            )
+        self.rebuild_index()
+
+    def import_csv(self, path: Path) -> int:
+        """
+        CSV (と、あればそのジャーナル) をSQLiteに取り込む。戻り値は取り込んだセル数。
+        スプレッドシートで編集した表を反映する場合にも使う。
+        """
+        if self.store is None:
+            raise RuntimeError("import_csv requires the sqlite backend.")
+
+        source = TableManager(
+            output_dir=str(Path(path).parent),
+            filename=Path(path).name,
+            corrections=self.corrections,
+            threshold=self.threshold,
+            backend="csv",
+        )
+        records = [
+            (
+                count,
+                column_name,
+                cell.text,
+                cell.series_id,
+                cell.group_id,
+                cell.confidence,
+            )
+            for count, row_data in source.data.items()
+            for column_name, cell in row_data.items()
+        ]
+        self.store.upsert(records)
+        self.logger.info(f"Imported {len(records)} cells from {path}.")
+        return len(records)
+
+    def refresh(self) -> bool:
+        """
+        他のインスタンス (実行スレッドなど) による更新を差分だけ取り込む。
+        変更があった場合は True を返す。
+        """
+        with self._lock:
+            before = self.version
+            self._pull_changes()
+            changed = self.version != before
+        self._emit_changes()
+        return changed
+
+    def _pull_changes(self):
+        if self.store is None:
+            self._sync_from_disk()
+            return
+
+        records, self._store_seq = self.store.read_since(self._store_seq)
+        for count, column_name, text, series_id, group_id, confidence in records:
+            if column_name not in self.headers:
+                self.headers.append(column_name)
+            self.canonical[text] = (series_id, group_id, confidence)
+            self._set_cell(
+                count, column_name, Cell(text, series_id, group_id, confidence)
+            )
+        if records:
+            self.version += 1
+
+    def _advance_store_seq(self, seq: int):
+        """
+        自分の書き込みを読み込み済みとして扱う。前回の読み込み以降に他の接続が
+        書き込んでいた場合は進めず、次の _pull_changes でそれらと合わせて読み込む
+        """
+        if seq == self._store_seq + 1:
+            self._store_seq = seq
+
+    def _load_snapshot(self):
         if not self.filepath.exists():
+            self._snapshot_mtime = None
             self.logger.info(
                 f"Existing table not found at {self.filepath}. Starting fresh."
             )
             return
 
         try:
+            self._snapshot_mtime = self.filepath.stat().st_mtime
             with open(self.filepath, mode="r", encoding="utf-8", newline="") as f:
                 reader = csv.reader(f)
                 try:
@@ -54,7 +900,7 @@ class TableManager:
                         for i, cell in enumerate(row[1:], start=1):
                             if i < len(headers):
                                 column_name = headers[i]
-                                row_data[column_name] = cell
+                                row_data[column_name] = self.make_cell(cell)
                         self.data[count] = row_data
                     except ValueError:
                         self.logger.warning(
@@ -62,159 +908,957 @@ class TableManager:
                         )
                         continue
 
-            self.logger.info(
-                f"Loaded table with {len(self.data)} rows and {len(self.headers)-1} data columns."
-            )
-
         except Exception as e:
             self.logger.error(f"Failed to load table: {e}")
 
+    def _replay_journal(self) -> int:
+        """
+        ジャーナルのうち未読の部分を読み込んで反映する。戻り値は反映した件数。
+        書き込み途中で中断された末尾の不完全な行は読み飛ばす。
+        """
+        if not self.journal_filepath.exists():
+            return 0
+
+        try:
+            with open(self.journal_filepath, mode="rb") as f:
+                f.seek(self._journal_offset)
+                chunk = f.read()
+        except Exception as e:
+            self.logger.error(f"Failed to read table journal: {e}")
+            return 0
+
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+
+        replayed = 0
+        lines = chunk[:end].decode("utf-8").splitlines()
+        for record in csv.reader(lines):
+            if len(record) < 3:
+                continue
+            try:
+                count = int(record[0])
+            except ValueError:
+                self.logger.warning(f"Skipping invalid journal record: {record}")
+                continue
+            column_name = record[1]
+            if column_name not in self.headers:
+                self.headers.append(column_name)
+            self._set_cell(count, column_name, self.make_cell(record[2]))
+            replayed += 1
+
+        self._journal_offset += end
+        self._journal_records += replayed
+        if replayed:
+            self.version += 1
+        return replayed
+
+    def _append_journal(self, records: List[List[str]]):
+        try:
+            with open(
+                self.journal_filepath, mode="a", encoding="utf-8", newline=""
+            ) as f:
+                writer = csv.writer(f)
+                writer.writerows(records)
+            self._journal_offset = self.journal_filepath.stat().st_size
+            self._journal_records += len(records)
+        except Exception as e:
+            self.logger.error(f"Failed to append to table journal: {e}")
+
+    def _sync_from_disk(self):
+        """他のインスタンスによる書き込みを取り込む"""
+        snapshot_mtime = (
+            self.filepath.stat().st_mtime if self.filepath.exists() else None
+        )
+        journal_size = (
+            self.journal_filepath.stat().st_size
+            if self.journal_filepath.exists()
+            else 0
+        )
+        if (
+            snapshot_mtime != self._snapshot_mtime
+            or journal_size < self._journal_offset
+        ):
+            # 他のインスタンスがコンパクションした場合は読み込み直す
+            self.reload()
+        else:
+            self._replay_journal()
+
     def update_table(
         self,
         weapon: str,
         element: str,
         new_results: List[str],
         confirmed_count: int = CURRENT_CONFIRMED_COUNT,
+        scores: Optional[List[Optional[float]]] = None,
     ):
         """
         指定された武器・属性の結果でテーブルを更新する
         confirmed_count より後のデータのみを更新・追加する
+        scores は各結果のOCR認識スコア (不明な場合は None)
+        読み取り結果はすべて記録し、セルには多数決の結果を書き込む
+        変更はジャーナルに追記し、件数が閾値を超えたらバックグラウンドでCSVに反映する
         """
         column_name = f"{weapon}_{element}"
+        timestamp = datetime.now().isoformat(timespec="seconds")
 
-        if column_name not in self.headers:
-            self.headers.append(column_name)
-            self.logger.info(f"Added new column: {column_name}")
+        with self._lock:
+            self._pull_changes()
 
-        starting_count = confirmed_count + 1
+            if column_name not in self.headers:
+                self.headers.append(column_name)
+                self.logger.info(f"Added new column: {column_name}")
+            self._ensure_column(column_name)
 
-        for i, skills in enumerate(new_results):
-            current_count = starting_count + i
+            starting_count = confirmed_count + 1
+            history = self.observations.column(column_name)
+            observed = []
+            records = []
 
-            if current_count not in self.data:
-                self.data[current_count] = {}
+            for i, skills in enumerate(new_results):
+                current_count = starting_count + i
+                score = scores[i] if scores is not None and i < len(scores) else None
+                old_cell = self.get_cell(current_count, column_name)
+                if score is None and old_cell is not None and old_cell.text == skills:
+                    # チェックポイントからの書き直しなど、新しい読み取りではないもの
+                    continue
+                previous = history.get(current_count, [])
+                if not previous and old_cell is not None:
+                    # 記録を始める前の値も1件の読み取り結果として扱う
+                    previous = [Observation(old_cell.text, None, "")]
+                    observed.append((current_count, previous[0]))
+
+                observation = Observation(skills, score, timestamp)
+                observed.append((current_count, observation))
+                text, _, _ = self._consensus(previous + [observation])
+                if old_cell is not None and old_cell.text == text:
+                    continue
+
+                cell = self.make_cell(text)
+                self._set_cell(current_count, column_name, cell)
+                if self.store is not None:
+                    records.append((current_count, column_name, *cell))
+                else:
+                    records.append([current_count, column_name, text, timestamp])
+
+            self.observations.append(column_name, observed)
+            if records:
+                self.version += 1
+                if self.store is not None:
+                    self._advance_store_seq(self.store.upsert(records))
+                else:
+                    self._append_journal(records)
 
-            self.data[current_count][column_name] = skills
+        self._emit_changes()
+        if (
+            self.store is None
+            and self._journal_records >= self.journal_compact_threshold
+        ):
+            self.compact_async()
+
+    def _consensus(self, observations: List[Observation]) -> Tuple[str, float, float]:
+        """
+        1セルの読み取り結果から採用する値を決める。
+        正規IDが同じものをまとめ、(認識スコア × 正規化の信頼度) の合計が最も大きいものを採用する。
+        認識スコアのない読み取り (記録を始める前の値など) は、スコアのある読み取りの合計が
+        同じ場合にだけ比べる。それでも同点の場合は新しい読み取りを優先する。
+        戻り値は (採用したOCR結果, 採用した値の重みの割合, 採用した値の最大認識スコア)。
+        """
+        groups: Dict[Tuple[int, int], List[Tuple[int, Observation, float]]] = {}
+        for i, observation in enumerate(observations):
+            series_id, group_id, confidence = self.make_cell(observation.text)[1:]
+            # 信頼度 0 (スキル未検出など) でも票として数えるため下限を設ける
+            weight = max(confidence, 0.01)
+            if observation.score is not None:
+                weight *= observation.score
+            groups.setdefault((series_id, group_id), []).append(
+                (i, observation, weight)
+            )
 
-        self.save_table()
+        def total_weight(members, scored):
+            return sum(w for _, o, w in members if (o.score is not None) == scored)
 
-    def save_table(self):
-        """内部データをCSVに保存する"""
+        winner = max(
+            groups.values(),
+            key=lambda members: (
+                total_weight(members, True),
+                total_weight(members, False),
+                max(m[0] for m in members),
+            ),
+        )
+        # 割合はスコアのある読み取りがあればそれだけで求める
+        scored = any(o.score is not None for o in observations)
+        total = sum(total_weight(members, scored) for members in groups.values())
+        text = max(winner, key=lambda m: (m[1].score is not None, m[2], m[0]))[1].text
+        scores = [m[1].score for m in winner if m[1].score is not None]
+        agreement = total_weight(winner, scored) / total if total else 1.0
+        return text, agreement, max(scores) if scores else 1.0
+
+    def observation_report(
+        self, min_score: float = OBSERVATION_MIN_SCORE
+    ) -> List[Tuple[str, int, int, List[str]]]:
+        """
+        再取得した方がよいセルを列ごとの連続した範囲にまとめて返す。
+        対象は読み取り結果が食い違うセル、認識スコアが min_score 未満のセル、
+        スキルが検出されなかったセル。
+        戻り値は (列名, 開始回数, 終了回数, 理由の一覧) のリスト。
+        """
+        flagged: Dict[str, Dict[int, Set[str]]] = {}
+        for column_name, count, observations in self.observations.iter_cells():
+            text, agreement, score = self._consensus(observations)
+            reasons = set()
+            if agreement < 1.0:
+                reasons.add("食い違い")
+            if score < min_score:
+                reasons.add("低スコア")
+            if not text:
+                reasons.add("スキル未検出")
+            if reasons:
+                flagged.setdefault(column_name, {})[count] = reasons
+
+        ranges = []
+        for column_name in sorted(flagged, key=column_sort_key):
+            cells = flagged[column_name]
+            start = end = None
+            reasons: Set[str] = set()
+            for count in sorted(cells):
+                if end is not None and count == end + 1:
+                    end = count
+                    reasons |= cells[count]
+                    continue
+                if start is not None:
+                    ranges.append((column_name, start, end, sorted(reasons)))
+                start = end = count
+                reasons = set(cells[count])
+            if start is not None:
+                ranges.append((column_name, start, end, sorted(reasons)))
+        return ranges
+
+    def write_observation_report(
+        self,
+        min_score: float = OBSERVATION_MIN_SCORE,
+        ranges: Optional[List[Tuple[str, int, int, List[str]]]] = None,
+    ) -> Path:
+        """再取得の候補を Markdown に書き出す (ranges は observation_report の結果)"""
+        if ranges is None:
+            ranges = self.observation_report(min_score)
         try:
-            all_counts = sorted(self.data.keys())
+            with open(self.resample_filepath, mode="w", encoding="utf-8") as f:
+                f.write("# 再取得の候補\n\n")
+                f.write(f"- **認識スコアの下限**: {min_score}\n\n")
+                f.write("| 武器_属性 | 範囲 | 件数 | 理由 |\n")
+                f.write("| :--- | :--- | :--- | :--- |\n")
+                for column_name, start, end, reasons in ranges:
+                    f.write(
+                        f"| {column_name} | {start}〜{end} | {end - start + 1} | {', '.join(reasons)} |\n"
+                    )
+                if not ranges:
+                    f.write("| - | - | - | - |\n")
+        except Exception as e:
+            self.logger.error(f"Failed to write resample report: {e}")
+        return self.resample_filepath
 
-            # "回数" 以外のヘッダーを武器順・属性順にソート
-            data_headers = [h for h in self.headers if h != "回数"]
+    def compact(self) -> bool:
+        """
+        ジャーナルの内容をCSVに反映し、ジャーナルを空にする
+        SQLiteの場合は最新の内容をCSVにエクスポートする
+        ファイルはロックの中で写した内容から書き出し、書き出しの間は update_table を止めない。
+        書き出しの間に追記されたジャーナルは残す。
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._pull_changes()
+                self._sort_headers()
+                snapshot = self._take_snapshot()
+                journal_offset = self._journal_offset
+                journal_records = self._journal_records
+                ranges = self.observation_report()
+                self._modified_during_compaction = set()
 
-            def sort_key(header):
+            try:
                 try:
-                    parts = header.split("_")
-                    if len(parts) >= 2:
-                        weapon = parts[0]
-                        element = parts[1]
-                        w_idx = WEAPONS.index(weapon) if weapon in WEAPONS else 999
-                        e_idx = ELEMENTS.index(element) if element in ELEMENTS else 999
-                        return (w_idx, e_idx)
-                    return (999, 999)
-                except Exception:
-                    return (999, 999)
-
-            data_headers.sort(key=sort_key)
-            self.headers = ["回数"] + data_headers
-
-            with open(self.filepath, mode="w", encoding="utf-8", newline="") as f:
+                    tmp_filepath = self._write_csv(snapshot)
+                except Exception as e:
+                    self.logger.error(f"Failed to save table: {e}")
+                    return False
+                columnar_saved = False
+                if self.columnar_snapshot:
+                    try:
+                        self._write_columnar(snapshot, self.columnar_dirpath)
+                        columnar_saved = True
+                    except Exception as e:
+                        self.logger.error(f"Failed to save columnar table: {e}")
+                self.write_observation_report(ranges=ranges)
+                self._save_canonical(snapshot)
+
+                with self._lock:
+                    try:
+                        os.replace(tmp_filepath, self.filepath)
+                    except Exception as e:
+                        self.logger.error(f"Failed to save table: {e}")
+                        return False
+                    self.logger.info(f"Table saved to {self.filepath}")
+                    if columnar_saved and self.lazy_columns:
+                        self._switch_columnar(
+                            snapshot, dirty=self._modified_during_compaction
+                        )
+                    if self.store is not None:
+                        return True
+                    if not self._truncate_journal(journal_offset):
+                        return False
+                    self._journal_records -= journal_records
+                    self._snapshot_mtime = self.filepath.stat().st_mtime
+                    self.logger.info("Table journal compacted.")
+                    return True
+            finally:
+                with self._lock:
+                    self._modified_during_compaction = None
+
+    def _truncate_journal(self, offset: int) -> bool:
+        """ジャーナルの先頭 offset バイト (CSVに反映した分) を取り除く"""
+        try:
+            with open(self.journal_filepath, mode="rb") as f:
+                f.seek(offset)
+                tail = f.read()
+            tmp_filepath = self.journal_filepath.with_name(
+                f"{self.journal_filepath.name}.tmp"
+            )
+            with open(tmp_filepath, mode="wb") as f:
+                f.write(tail)
+            os.replace(tmp_filepath, self.journal_filepath)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Failed to truncate table journal: {e}")
+            return False
+        self._journal_offset = max(0, self._journal_offset - offset)
+        return True
+
+    def export_columnar(self, dirpath: Optional[Path] = None) -> bool:
+        """列指向のバイナリ形式で書き出す。保存できた場合は True を返す"""
+        dirpath = Path(dirpath) if dirpath is not None else self.columnar_dirpath
+        with self._lock:
+            snapshot = self._take_snapshot()
+            try:
+                self._write_columnar(snapshot, dirpath)
+                saved = True
+            except Exception as e:
+                self.logger.error(f"Failed to save columnar table: {e}")
+                saved = False
+
+            if saved and self.lazy_columns and dirpath == self.columnar_dirpath:
+                self._switch_columnar(snapshot)
+            return saved
+
+    def _write_columnar(self, snapshot: _TableSnapshot, dirpath: Path):
+        """snapshot を列指向のバイナリ形式で書き出す (未読み込みの列は配列のまま写す)"""
+        write_columnar(
+            dirpath,
+            snapshot.headers,
+            snapshot.data,
+            SKILLS_FINGERPRINT,
+            source=snapshot.columnar,
+            source_columns=snapshot.unloaded,
+        )
+        self.logger.info(f"Columnar table saved to {dirpath}")
+
+    def _switch_columnar(
+        self, snapshot: _TableSnapshot, dirty: Optional[Set[str]] = None
+    ):
+        """
+        書き出した列指向のスナップショットに切り替える。書き出した内容と一致するため、
+        使われていない列は再び捨ててよい (新しい版を開けてから差し替え、None になる間を作らない)
+        dirty は書き出した後に変更された列で、引き続き捨てない。
+        """
+        columnar = self.open_columnar()
+        if columnar is None:
+            return
+        previous, self._columnar = self._columnar, columnar
+        if previous is not None:
+            previous.close()
+        self._dirty_columns = set(dirty or ())
+        # CSVから読み込んだ列も捨てられるようにする (使われた順の先頭に置く)
+        loaded = OrderedDict.fromkeys(
+            c
+            for c in self.headers[1:]
+            if c not in self._unloaded_columns and c not in self._loaded_columns
+        )
+        loaded.update(self._loaded_columns)
+        self._loaded_columns = loaded
+        self._evict_columns()
+
+    def open_columnar(self, dirpath: Optional[Path] = None) -> Optional[ColumnarTable]:
+        """
+        列指向のスナップショットを numpy.memmap で開く。
+        存在しない場合やスキル一覧が変わっている場合は None を返す。
+        最後のコンパクション以降の更新は含まれない点に注意。
+        """
+        dirpath = Path(dirpath) if dirpath is not None else self.columnar_dirpath
+        if not ColumnarTable.exists(dirpath):
+            return None
+        try:
+            table = ColumnarTable(dirpath)
+        except Exception as e:
+            self.logger.error(f"Failed to open columnar table: {e}")
+            return None
+        if table.skills_fingerprint != SKILLS_FINGERPRINT:
+            self.logger.info("Skill list changed. Ignoring columnar table.")
+            return None
+        return table
+
+    def merge_tables(self, paths: List[Path], workers: Optional[int] = None) -> Dict:
+        """
+        他のPCで記録した厳選表 (CSVとジャーナル) をこの表に統合する。
+        各ファイルは1回ずつ読み、(回数, 列名) ごとに揃える。
+        正規IDが食い違うセルは出現したファイル数の多い値 (同数なら信頼度の高い値) を採用し、
+        <表の名前>_conflicts.csv に書き出す。
+        戻り値は {"sources", "cells", "conflicts", "conflicts_file"}。
+        """
+        # この表自身や同じファイルを重ねて指定した場合は、同じ記録を2回数えないよう除く
+        own = self.filepath.resolve()
+        seen = set()
+        inputs = []
+        for path in map(Path, paths):
+            resolved = path.resolve()
+            if resolved == own or resolved in seen:
+                self.logger.warning(f"Skipping {path}: already included in the merge.")
+                continue
+            seen.add(resolved)
+            inputs.append(path)
+        paths = inputs
+
+        with self._lock:
+            self._pull_changes()
+            self._load_all_columns()
+
+            # (回数, 列名) -> {入力の番号: OCR結果}。0番はこの表自身
+            sources = ["(現在の表)"] + [str(p) for p in paths]
+            observations: Dict[Tuple[int, str], Dict[int, str]] = {}
+            for count, row_data in self.data.items():
+                for column_name, cell in row_data.items():
+                    if cell.text:
+                        observations[(count, column_name)] = {0: cell.text}
+            for source, path in enumerate(paths, start=1):
+                read = 0
+                for count, column_name, text in _read_table_file(path):
+                    observations.setdefault((count, column_name), {})[source] = text
+                    read += 1
+                self.logger.info(f"Read {read} cells from {path}.")
+
+            self._canonicalize_many(
+                {text for cell in observations.values() for text in cell.values()},
+                workers,
+            )
+
+            conflicts = []
+            changed = []
+            for (count, column_name), observed in sorted(observations.items()):
+                chosen, conflicting = self._resolve_observations(observed)
+                if conflicting:
+                    conflicts.append((count, column_name, chosen, observed))
+                current = self.data.get(count, {}).get(column_name)
+                if current is not None and current.text == chosen:
+                    continue
+                if column_name not in self.headers:
+                    self.headers.append(column_name)
+                cell = self.make_cell(chosen)
+                self._set_cell(count, column_name, cell)
+                changed.append((count, column_name, *cell))
+
+            if changed:
+                self.version += 1
+                if self.store is not None:
+                    self._advance_store_seq(self.store.upsert(changed))
+
+            conflicts_file = None
+            if conflicts:
+                conflicts_file = self._write_conflicts(conflicts, sources)
+
+        # コンパクションはロックを外した状態で行う (書き出しの間はロックを持たないため)
+        self.compact()
+        self._emit_changes()
+        self.logger.info(
+            f"Merged {len(paths)} tables: {len(changed)} cells updated,"
+            f" {len(conflicts)} conflicts."
+        )
+        return {
+            "sources": len(paths),
+            "cells": len(changed),
+            "conflicts": len(conflicts),
+            "conflicts_file": conflicts_file,
+        }
+
+    def _canonicalize_many(self, texts: Set[str], workers: Optional[int] = None):
+        """未計算の文字列をまとめて正規化する。件数が多い場合は全コアで並列に行う"""
+        pending = [text for text in texts if text not in self.canonical]
+        if len(pending) < MERGE_PARALLEL_THRESHOLD:
+            for text in pending:
+                self.make_cell(text)
+            return
+
+        workers = workers or os.cpu_count() or 1
+        chunk_size = max(1, -(-len(pending) // (workers * 4)))
+        chunks = [
+            pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)
+        ]
+        self.logger.info(
+            f"Canonicalizing {len(pending)} strings with {workers} processes."
+        )
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _canonicalize_texts, chunk, self.corrections, self.threshold
+                )
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                for text, canonical in zip(chunk, future.result()):
+                    self.canonical[text] = canonical
+
+    def _resolve_observations(self, observed: Dict[int, str]) -> Tuple[str, bool]:
+        """
+        1セルに対する複数の記録から採用する値を決める。
+        戻り値は (採用したOCR結果, 正規IDの食い違いがあるか)。
+        """
+        groups: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+        for source, text in observed.items():
+            series_id, group_id, _ = self.canonical[text]
+            groups.setdefault((series_id, group_id), []).append((source, text))
+
+        def best_text(members):
+            # 信頼度の高い値、同じなら番号の小さい入力の値
+            return min(members, key=lambda m: (-self.canonical[m[1]][2], m[0]))
+
+        winner = max(
+            groups.values(),
+            key=lambda members: (
+                len(members),
+                self.canonical[best_text(members)[1]][2],
+                -min(m[0] for m in members),
+            ),
+        )
+        return best_text(winner)[1], len(groups) > 1
+
+    def _write_conflicts(self, conflicts: List[Tuple], sources: List[str]) -> Path:
+        conflicts_filepath = self.filepath.with_name(
+            f"{self.filepath.stem}_conflicts.csv"
+        )
+        try:
+            with open(conflicts_filepath, mode="w", encoding="utf-8", newline="") as f:
                 writer = csv.writer(f)
-                writer.writerow(self.headers)
+                writer.writerow(["回数", "武器_属性", "採用した値", "入力", "値"])
+                for count, column_name, chosen, observed in conflicts:
+                    for source, text in sorted(observed.items()):
+                        writer.writerow(
+                            [count, column_name, chosen, sources[source], text]
+                        )
+            self.logger.warning(
+                f"{len(conflicts)} conflicting cells written to {conflicts_filepath}"
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to write merge conflicts: {e}")
+        return conflicts_filepath
 
-                for count in all_counts:
-                    row = [str(count)]
-                    row_data = self.data[count]
+    def compact_async(self):
+        """コンパクションを別スレッドで実行する"""
+        with self._compacting_guard:
+            if self._compacting:
+                return
+            self._compacting = True
 
-                    for header in self.headers[1:]:
-                        row.append(row_data.get(header, ""))
+        def run():
+            try:
+                self.compact()
+            finally:
+                with self._compacting_guard:
+                    self._compacting = False
 
-                    writer.writerow(row)
+        threading.Thread(target=run, daemon=True).start()
 
+    def save_table(self) -> bool:
+        """内部データをCSVに保存する。保存できた場合は True を返す"""
+        with self._lock:
+            self._sort_headers()
+            snapshot = self._take_snapshot()
+            try:
+                tmp_filepath = self._write_csv(snapshot)
+                os.replace(tmp_filepath, self.filepath)
+            except Exception as e:
+                self.logger.error(f"Failed to save table: {e}")
+                return False
+            self._save_canonical(snapshot)
             self.logger.info(f"Table saved to {self.filepath}")
+            return True
 
-        except Exception as e:
-            self.logger.error(f"Failed to save table: {e}")
+    def _sort_headers(self):
+        """ "回数" 以外のヘッダーを武器順・属性順にソートする"""
+        data_headers = [h for h in self.headers if h != "回数"]
+        data_headers.sort(key=column_sort_key)
+        self.headers = ["回数"] + data_headers
+
+    def _take_snapshot(self) -> _TableSnapshot:
+        """書き出し用に現在の内容を写す。未読み込みの列は読み込まない"""
+        return _TableSnapshot(
+            headers=list(self.headers),
+            data={count: dict(row_data) for count, row_data in self.data.items()},
+            canonical=dict(self.canonical),
+            columnar=self._columnar,
+            unloaded=sorted(self._unloaded_columns),
+        )
+
+    def _write_csv(self, snapshot: _TableSnapshot) -> Path:
+        """
+        snapshot を一時ファイルに書き出し、そのパスを返す。
+        書き込み途中で中断されても元のCSVが壊れないよう、呼び出し側で置き換える。
+        未読み込みの列は、スナップショットの文字列番号から1行ずつ文字列にする。
+        """
+        columnar = snapshot.columnar
+        unloaded_index = {name: i for i, name in enumerate(snapshot.unloaded)}
+        all_counts = set(snapshot.data)
+        text_idx = None
+        if snapshot.unloaded and columnar.rows:
+            # (行数, 未読み込みの列数) の文字列番号
+            text_idx = np.asarray(
+                columnar.text_idx[
+                    [columnar.column_index[name] for name in snapshot.unloaded]
+                ]
+            ).T
+            recorded = np.flatnonzero((text_idx != ABSENT).any(axis=1))
+            all_counts.update((recorded + columnar.min_count).tolist())
+        strings: Dict[int, str] = {ABSENT: ""}
+
+        tmp_filepath = self.filepath.with_name(f"{self.filepath.name}.tmp")
+        with open(tmp_filepath, mode="w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(snapshot.headers)
+
+            for count in sorted(all_counts):
+                row = [str(count)]
+                row_data = snapshot.data.get(count, {})
+                unloaded_row = None
+                if text_idx is not None:
+                    r = count - columnar.min_count
+                    if 0 <= r < len(text_idx):
+                        unloaded_row = text_idx[r].tolist()
+
+                for header in snapshot.headers[1:]:
+                    i = unloaded_index.get(header)
+                    if i is None:
+                        cell = row_data.get(header)
+                        row.append(cell.text if cell else "")
+                    elif unloaded_row is None:
+                        row.append("")
+                    else:
+                        index = unloaded_row[i]
+                        text = strings.get(index)
+                        if text is None:
+                            text = strings[index] = columnar.string(index)
+                        row.append(text)
+
+                writer.writerow(row)
+        return tmp_filepath
 
     def find_target_combinations(
-        self, targets: List[List[str]], min_count: int, threshold: float
-    ) -> List[Dict]:
+        self,
+        targets: List[List[str]],
+        min_count: int,
+        threshold: float,
+        query: Optional[TargetQuery] = None,
+    ) -> Sequence[Mapping]:
         """
         指定されたターゲットスキルの組み合わせを検索する
         min_count (確定済み回数) より後のデータのみを対象とする
+        targets と query は正規IDの組に展開し、転置インデックスの出現リストを引く
+        threshold が書き込み時と異なる場合のみ、文字列から正規化し直す
+        結果はキャッシュと共有するため、書き換えられないタプルと読み取り専用の辞書で返す
         """
+        compiled = TargetQuery.from_combinations(targets)
+        if query:
+            compiled.extend(query)
+
         results = []
+        if not compiled:
+            return results
+
+        with self._lock:
+            cache_key = ("matches", compiled.cache_key(), min_count, threshold)
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                return cached
+
+            if threshold != self.threshold:
+                results = self._scan_target_combinations(compiled, min_count, threshold)
+            else:
+                # 条件に展開された組と実際に出現した組の少ない方を走査する
+                if len(compiled.compiled) <= len(self.combo_postings):
+                    keys = [k for k in compiled.compiled if k in self.combo_postings]
+                else:
+                    keys = [k for k in self.combo_postings if k in compiled.compiled]
+
+                for series_id, group_id in keys:
+                    entry = compiled.match(series_id, group_id)
+                    posting_list = self.combo_postings[(series_id, group_id)]
+                    start = bisect.bisect_right(
+                        posting_list, min_count, key=lambda p: p[0]
+                    )
+                    for count, weapon_element in posting_list[start:]:
+                        cell = self.data[count][weapon_element]
+                        results.append(
+                            self._match_result(count, weapon_element, cell, entry)
+                        )
+
+                # 未読み込みの列はスナップショットの正規ID配列を直接照合する
+                values = {key: index for key, (_, index) in compiled.compiled.items()}
+                for count, weapon_element, index, cell in self._match_unloaded(
+                    values, min_count
+                ):
+                    entry = compiled.entries[index]
+                    results.append(
+                        self._match_result(count, weapon_element, cell, entry)
+                    )
+
+            column_order = {h: i for i, h in enumerate(self.headers)}
+            results.sort(
+                key=lambda x: (x["count"], column_order.get(x["weapon_element"], 0))
+            )
+            return self._put_cached(cache_key, results)
+
+    def find_changed_combinations(
+        self,
+        targets: List[List[str]],
+        min_count: int,
+        threshold: float,
+        columns: Dict[str, Tuple[int, int]],
+        query: Optional[TargetQuery] = None,
+    ) -> List[Dict]:
+        """
+        変更通知の範囲 (TableChange.columns) に限って find_target_combinations と同じ検索を行う。
+        表示中の結果のうち、この範囲のものを置き換えれば全体を検索し直した結果と一致する。
+        """
+        compiled = TargetQuery.from_combinations(targets)
+        if query:
+            compiled.extend(query)
+
+        results = []
+        if not compiled:
+            return results
+
+        with self._lock:
+            for weapon_element, (lo, hi) in columns.items():
+                self._ensure_column(weapon_element)
+                for count in range(max(lo, min_count + 1), hi + 1):
+                    cell = self.data.get(count, {}).get(weapon_element)
+                    if cell is None or not cell.text:
+                        continue
+                    if threshold != self.threshold:
+                        cell = Cell(
+                            cell.text,
+                            *canonicalize_cell(cell.text, self.corrections, threshold),
+                        )
+                    entry = compiled.match(cell.series_id, cell.group_id)
+                    if entry is not None:
+                        results.append(
+                            self._match_result(count, weapon_element, cell, entry)
+                        )
+        return results
+
+    def locate(
+        self,
+        weapon: str,
+        element: str,
+        observed: List[str],
+        max_mismatches: int = LOCATOR_MAX_MISMATCHES,
+    ) -> List[Tuple[int, int]]:
+        """
+        直近に観測した結果 (古い順のOCR結果) が列のどこに出現するかを探す。
+        戻り値は (最後の観測に当たる回数, 一致しなかったセルの数) の一覧で、一致度の高い順。
+        観測側で一部のスキルが読み取れなかったセルは、読み取れた枠だけで照合する。
+
+        q-gram 索引で候補の位置を絞り込んでから照合する。
+        不一致が max_mismatches 個以下なら、一致する q-gram は
+        (観測数 - q + 1) - q * (不一致数 + 読み取れなかったセル数) 個以上残る。
+        """
+        column_name = f"{weapon}_{element}"
+        pattern = [self.make_cell(text) for text in observed]
+        if not pattern:
+            return []
+
+        with self._lock:
+            self._ensure_column(column_name)
+            q = self.locator_gram_size
+            wildcards = sum(1 for cell in pattern if not self._is_locator_token(cell))
+            min_hits = (len(pattern) - q + 1) - q * (max_mismatches + wildcards)
+
+            if min_hits <= 0:
+                # 観測が少なすぎて絞り込めない場合は全位置を照合する
+                last_count = max(
+                    (c for c, row in self.data.items() if column_name in row),
+                    default=0,
+                )
+                candidates = range(1, last_count - len(pattern) + 2)
+            else:
+                index = self._locator_index(column_name)
+                votes: Dict[int, int] = {}
+                for offset in range(len(pattern) - q + 1):
+                    gram = self._locator_gram(pattern[offset : offset + q])
+                    if gram is None:
+                        continue
+                    for start in index.get(gram, []):
+                        votes[start - offset] = votes.get(start - offset, 0) + 1
+                candidates = [s for s, n in votes.items() if n >= min_hits and s >= 1]
+
+            results = []
+            for start in candidates:
+                mismatches = 0
+                for i, expected in enumerate(pattern):
+                    cell = self.data.get(start + i, {}).get(column_name)
+                    if not self._locator_cell_matches(expected, cell):
+                        mismatches += 1
+                        if mismatches > max_mismatches:
+                            break
+                if mismatches <= max_mismatches:
+                    results.append((start + len(pattern) - 1, mismatches))
+
+        results.sort(key=lambda r: (r[1], r[0]))
+        return results
+
+    @staticmethod
+    def _is_locator_token(cell: Optional[Cell]) -> bool:
+        # 両方の枠が読み取れたセルのみ q-gram に使う
+        return (
+            cell is not None
+            and cell.series_id != UNKNOWN_ID
+            and cell.group_id != UNKNOWN_ID
+        )
+
+    def _locator_gram(self, cells: List[Optional[Cell]]) -> Optional[Tuple]:
+        if not all(self._is_locator_token(cell) for cell in cells):
+            return None
+        return tuple((cell.series_id, cell.group_id) for cell in cells)
+
+    @staticmethod
+    def _locator_cell_matches(expected: Cell, cell: Optional[Cell]) -> bool:
+        if cell is None:
+            return False
+        for expected_id, actual_id in (
+            (expected.series_id, cell.series_id),
+            (expected.group_id, cell.group_id),
+        ):
+            # 観測側で読み取れなかった枠は照合しない
+            if expected_id != UNKNOWN_ID and expected_id != actual_id:
+                return False
+        return True
+
+    def _locator_index(self, column_name: str) -> Dict[Tuple, List[int]]:
+        """列の q-gram -> 開始位置 (回数) の索引。表が変わった場合のみ作り直す"""
+        cached = self._gram_index.get(column_name)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        q = self.locator_gram_size
+        counts = sorted(c for c, row in self.data.items() if column_name in row)
+        index: Dict[Tuple, List[int]] = {}
+        for start in counts:
+            cells = [self.data.get(start + i, {}).get(column_name) for i in range(q)]
+            gram = self._locator_gram(cells)
+            if gram is not None:
+                index.setdefault(gram, []).append(start)
+        self._gram_index[column_name] = (self.version, index)
+        return index
+
+    def count_combinations(
+        self,
+        targets: List[List[str]],
+        min_count: int,
+        threshold: float,
+        query: Optional[TargetQuery] = None,
+    ) -> Mapping[str, Mapping[str, int]]:
+        """
+        武器_属性ごとに、ターゲットの組み合わせが出現する回数を集計する
+        戻り値は {武器_属性: {組み合わせの表示名: 出現回数}} で、表の列順に並ぶ
+        """
+        compiled = TargetQuery.from_combinations(targets)
+        if query:
+            compiled.extend(query)
+
+        with self._lock:
+            cache_key = ("stats", compiled.cache_key(), min_count, threshold)
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                return cached
+
+            combo_stats: Dict[str, Dict[str, int]] = {}
+            for m in self.find_target_combinations(
+                targets, min_count, threshold, query
+            ):
+                combo_str = " + ".join([c for c in m["matched_combo"] if c])
+                combos = combo_stats.setdefault(m["weapon_element"], {})
+                combos[combo_str] = combos.get(combo_str, 0) + 1
+
+            ordered = {h: combo_stats[h] for h in self.headers if h in combo_stats}
+            return self._put_cached(cache_key, ordered)
+
+    # キャッシュした結果は呼び出し側と共有するため、書き換えられない形にして保存する
+    # (結果を書き換えても、次の呼び出しの結果が変わらないように)
+    def _get_cached(self, key: Tuple):
+        full_key = key + (self.version,)
+        if full_key not in self._query_cache:
+            return None
+        self._query_cache.move_to_end(full_key)
+        return self._query_cache[full_key]
+
+    def _put_cached(self, key: Tuple, value):
+        """value を書き換えられない形にしてキャッシュし、それを返す"""
+        value = _freeze(value)
+        self._query_cache[key + (self.version,)] = value
+        # 古い版の結果は参照されなくなるため、最も使われていないものから捨てる
+        while len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return value
+
+    def _scan_target_combinations(
+        self, compiled: TargetQuery, min_count: int, threshold: float
+    ) -> List[Dict]:
+        # 書き込み時と異なる閾値の場合は、全セルを文字列から正規化し直して走査する
+        self._load_all_columns()
+        results = []
+        canonical_cache: Dict[str, tuple] = {}
 
         for count, row_data in self.data.items():
             if count <= min_count:
                 continue
 
-            for weapon_element, skills_str in row_data.items():
-                if not skills_str:
+            for weapon_element, cell in row_data.items():
+                if not cell.text:
                     continue
 
-                detected_skills = skills_str.split("+")
-
-                for combination in targets:
-                    # 順不同マッチング
-                    all_matched = True
-                    all_exact_match = True
-
-                    for target_skill in combination:
-                        found_this_skill = False
-                        found_exact_skill = False
-
-                        for detected in detected_skills:
-                            if is_fuzzy_match(target_skill, detected, threshold):
-                                # 追加検証: この検出された文字列は本当にターゲットスキルか？
-                                # 全スキルリストの中で、ターゲットスキルよりも高い類似度を持つスキルがあるか確認する
-                                score_target = calculate_similarity(
-                                    detected, target_skill
-                                )
-
-                                best_match_other_score = 0.0
-                                # best_match_other_skill = ""
-
-                                for skill in ALL_SKILLS:
-                                    if skill == target_skill:
-                                        continue
-
-                                    score = calculate_similarity(detected, skill)
-                                    if score > best_match_other_score:
-                                        best_match_other_score = score
-                                        # best_match_other_skill = skill
-
-                                # 他のスキルの方が明らかに近い場合は誤検出として扱う
-                                # ただし同率の場合はターゲットの可能性を残す
-                                if best_match_other_score > score_target:
-                                    continue
-
-                                found_this_skill = True
-                                if target_skill in detected:
-                                    found_exact_skill = True
-                                break
-                        if not found_this_skill:
-                            all_matched = False
-                            break
+                canonical = canonical_cache.get(cell.text)
+                if canonical is None:
+                    canonical = canonicalize_cell(
+                        cell.text, self.corrections, threshold
+                    )
+                    canonical_cache[cell.text] = canonical
 
-                        if not found_exact_skill:
-                            all_exact_match = False
+                entry = compiled.match(canonical[0], canonical[1])
+                if entry is None:
+                    continue
 
-                    if all_matched:
-                        results.append(
-                            {
-                                "count": count,
-                                "weapon_element": weapon_element,
-                                "matched_combo": combination,
-                                "raw_skills": skills_str,
-                                "is_exact_match": all_exact_match,
-                            }
-                        )
-                        break
+                results.append(
+                    self._match_result(
+                        count, weapon_element, Cell(cell.text, *canonical), entry
+                    )
+                )
 
-        results.sort(key=lambda x: x["count"])
         return results
+
+    def _match_result(self, count: int, weapon_element: str, cell: Cell, entry):
+        return {
+            "count": count,
+            "weapon_element": weapon_element,
+            "matched_combo": tuple(entry.combo),
+            "raw_skills": cell.text,
+            "is_exact_match": cell.confidence >= 1.0,
+            "weight": entry.weight,
+            "series_id": cell.series_id,
+            "group_id": cell.group_id,
+        }
@@ -0,0 +1,55 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+from .config import OUTPUT_DIR, TABLE_FILE_NAME
+from .table_manager import TableManager, table_file_exists
+
+
+def main(argv=None) -> int:
+    """
+    複数のPCで記録した厳選表を1つにまとめる。
+    例: uv run python -m src.skill_reroller.table_merge pc1/reroll_table.csv pc2/reroll_table.csv
+    """
+    parser = argparse.ArgumentParser(description="厳選表 (CSVとジャーナル) を統合する")
+    parser.add_argument(
+        "tables",
+        nargs="+",
+        type=Path,
+        help="統合する reroll_table.csv (ジャーナルだけでもよい)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        default=OUTPUT_DIR,
+        help=f"統合先の出力フォルダー (既定: {OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="正規化に使うプロセス数"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    missing = [p for p in args.tables if not table_file_exists(p)]
+    if missing:
+        print(f"ファイルが見つかりません: {', '.join(map(str, missing))}")
+        return 1
+
+    table_manager = TableManager(output_dir=args.output_dir, filename=TABLE_FILE_NAME)
+    result = table_manager.merge_tables(args.tables, workers=args.workers)
+
+    print(f"{result['sources']}個の表を {table_manager.filepath} に統合しました")
+    print(f"更新したセル: {result['cells']}")
+    if result["conflicts"]:
+        print(
+            f"食い違いのあるセル: {result['conflicts']} (詳細: {result['conflicts_file']})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+from .config import (
+    OUTPUT_DIR,
+    PROFILES_FILE_NAME,
+    CURRENT_CONFIRMED_COUNT,
+)
+from .ocr_corrections import CorrectionMap
+from .table_manager import TableManager
+
+# 既定のプロファイル。厳選表は出力フォルダー直下に置く (従来の配置のまま)
+DEFAULT_PROFILE = "default"
+# プロファイル名はフォルダー名に使うため、使える文字を制限する
+_PROFILE_NAME_PATTERN = re.compile(r"^[^\\/:*?\"<>|.][^\\/:*?\"<>|]{0,63}$")
+
+
+class TableProfiles:
+    """
+    セーブデータごとの厳選表 (プロファイル) を管理する。
+    各プロファイルは専用のフォルダーに厳選表を持ち、確定済み回数も個別に記録する。
+
+    厳選表は初めて使う時に読み込み、読み込んだものは保持するため、
+    プロファイルの切り替えは参照先を変えるだけで済む。
+    """
+
+    def __init__(
+        self,
+        output_dir: str = OUTPUT_DIR,
+        filename: str = PROFILES_FILE_NAME,
+        corrections: Optional[CorrectionMap] = None,
+    ):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.filepath = self.output_dir / filename
+        self.corrections = corrections
+        self.logger = logging.getLogger(__name__)
+        self.active = DEFAULT_PROFILE
+        # プロファイル名 -> {"confirmed_count": int, "material_points": int}
+        self.profiles: Dict[str, Dict] = {
+            DEFAULT_PROFILE: {"confirmed_count": CURRENT_CONFIRMED_COUNT}
+        }
+        self._tables: Dict[str, TableManager] = {}
+        self.load()
+
+    def load(self):
+        """JSONファイルからプロファイル一覧を読み込む"""
+        if not self.filepath.exists():
+            return
+
+        try:
+            with open(self.filepath, mode="r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self.profiles.update(raw.get("profiles", {}))
+            if raw.get("active") in self.profiles:
+                self.active = raw["active"]
+        except Exception as e:
+            self.logger.error(f"Failed to load profiles: {e}")
+
+    def save(self):
+        """プロファイル一覧をJSONファイルに保存する"""
+        try:
+            with open(self.filepath, mode="w", encoding="utf-8") as f:
+                json.dump(
+                    {"active": self.active, "profiles": self.profiles},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to save profiles: {e}")
+
+    def names(self) -> List[str]:
+        """既定のプロファイルを先頭に、作成順のプロファイル名の一覧"""
+        return list(self.profiles)
+
+    def profile_dir(self, name: Optional[str] = None) -> Path:
+        """プロファイルの厳選表などを置くフォルダー"""
+        name = name or self.active
+        if name == DEFAULT_PROFILE:
+            return self.output_dir
+        return self.output_dir / "profiles" / name
+
+    def create(self, name: str, confirmed_count: int = 0):
+        """プロファイルを作成する。名前が不正な場合は ValueError を送出する"""
+        name = name.strip()
+        if not _PROFILE_NAME_PATTERN.match(name):
+            raise ValueError(f"プロファイル名に使えない文字が含まれています: {name}")
+        if name in self.profiles:
+            raise ValueError(f"プロファイルは既に存在します: {name}")
+
+        self.profiles[name] = {"confirmed_count": confirmed_count}
+        self.save()
+        self.logger.info(f"Created profile: {name}")
+
+    def switch(self, name: str) -> TableManager:
+        """使用するプロファイルを切り替え、その厳選表を返す"""
+        if name not in self.profiles:
+            raise ValueError(f"不明なプロファイルです: {name}")
+        if name != self.active:
+            self.active = name
+            self.save()
+            self.logger.info(f"Switched to profile: {name}")
+        return self.table(name)
+
+    def table(self, name: Optional[str] = None) -> TableManager:
+        """プロファイルの厳選表。初めて使う時に読み込む"""
+        name = name or self.active
+        table_manager = self._tables.get(name)
+        if table_manager is None:
+            table_manager = TableManager(
+                output_dir=str(self.profile_dir(name)), corrections=self.corrections
+            )
+            self._tables[name] = table_manager
+        return table_manager
+
+    def confirmed_count(self, name: Optional[str] = None) -> int:
+        return self.profiles[name or self.active].get("confirmed_count", 0)
+
+    def set_confirmed_count(self, count: int, name: Optional[str] = None):
+        self.profiles[name or self.active]["confirmed_count"] = count
+        self.save()
+
+    def material_points(self, name: Optional[str] = None) -> int:
+        """最後に記録した所持ポイント (素材の合計)"""
+        return self.profiles[name or self.active].get("material_points", 0)
+
+    def set_material_points(self, points: int, name: Optional[str] = None):
+        self.profiles[name or self.active]["material_points"] = points
+        self.save()
@@ -0,0 +1,184 @@
+import logging
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from .skill_ids import SERIES_IDS, GROUP_IDS, UNKNOWN_ID
+
+# ワイルドカードを表す記号
+WILDCARD = "*"
+
+# 読み飛ばしたことを記録済みの組み合わせ (検索のたびに同じ警告を出さないため)
+_skipped_combinations = set()
+
+
+class QueryEntry:
+    """
+    ターゲット条件1件分。各枠は許容するスキルIDの集合で、None はワイルドカード。
+    """
+
+    def __init__(
+        self,
+        series_ids: Optional[FrozenSet[int]],
+        group_ids: Optional[FrozenSet[int]],
+        weight: float = 1.0,
+        combo: Optional[List[str]] = None,
+    ):
+        self.series_ids = series_ids
+        self.group_ids = group_ids
+        self.weight = weight
+        # 表示用の組み合わせ ([シリーズ, グループ]、ワイルドカードは空文字)
+        self.combo = combo if combo is not None else ["", ""]
+
+    def label(self) -> str:
+        return " + ".join([c for c in self.combo if c])
+
+    def matches(self, series_id: int, group_id: int) -> bool:
+        """正規IDの組がこの条件に該当するか (ワイルドカードもスキル未検出には一致しない)"""
+        if series_id == UNKNOWN_ID or group_id == UNKNOWN_ID:
+            return False
+        return (self.series_ids is None or series_id in self.series_ids) and (
+            self.group_ids is None or group_id in self.group_ids
+        )
+
+
+class TargetQuery:
+    """
+    ターゲット条件の集合を正規IDの組 (series_id, group_id) の辞書に展開したもの。
+    セルの判定は辞書引き1回で行える。
+
+    書式 (1行1条件、# 以降はコメント):
+        巨戟龍の黙示録 + ヌシの魂
+        * + ヌシの魂 @ 2
+        巨戟龍の黙示録|黒蝕竜の力 + ヌシの魂|ヌシの誇り @ 1.5
+    """
+
+    def __init__(self, entries: Optional[List[QueryEntry]] = None):
+        self.entries: List[QueryEntry] = []
+        # (series_id, group_id) -> (重み, 条件の番号)
+        self.compiled: Dict[Tuple[int, int], Tuple[float, int]] = {}
+        for entry in entries or []:
+            self.add(entry)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def add(self, entry: QueryEntry):
+        """条件を追加し、許容する正規IDの組を展開する"""
+        index = len(self.entries)
+        self.entries.append(entry)
+
+        # ワイルドカードは既知のスキルにのみ一致させる
+        # (スキル未検出・読み取れなかった枠をターゲットとして扱わない)
+        series_ids = (
+            entry.series_ids if entry.series_ids is not None else SERIES_IDS.values()
+        )
+        group_ids = (
+            entry.group_ids if entry.group_ids is not None else GROUP_IDS.values()
+        )
+
+        for series_id in series_ids:
+            for group_id in group_ids:
+                key = (series_id, group_id)
+                current = self.compiled.get(key)
+                # 複数の条件に該当する組は重みの大きい方を採用する
+                if current is None or entry.weight > current[0]:
+                    self.compiled[key] = (entry.weight, index)
+
+    def extend(self, other: "TargetQuery"):
+        for entry in other.entries:
+            self.add(entry)
+
+    def match(self, series_id: int, group_id: int) -> Optional[QueryEntry]:
+        """正規IDの組に該当する条件を返す。該当しない場合は None。"""
+        hit = self.compiled.get((series_id, group_id))
+        if hit is None:
+            return None
+        return self.entries[hit[1]]
+
+    def cache_key(self) -> Tuple:
+        """結果のキャッシュに使うハッシュ可能なキー"""
+        return tuple(
+            (entry.series_ids, entry.group_ids, entry.weight) for entry in self.entries
+        )
+
+    @classmethod
+    def from_combinations(cls, targets: List[List[str]]) -> "TargetQuery":
+        """
+        GUI/config.toml 形式の [シリーズ, グループ] のリストから生成する (空欄はワイルドカード)
+        スキル一覧にない名前を含む組み合わせ (古い設定や入力ミス) はログに記録して読み飛ばす
+        """
+        query = cls()
+        for combination in targets:
+            series = combination[0] if len(combination) >= 1 else ""
+            group = combination[1] if len(combination) >= 2 else ""
+            if not series and not group:
+                continue
+            try:
+                series_ids = _parse_slot(series, SERIES_IDS, "シリーズスキル")
+                group_ids = _parse_slot(group, GROUP_IDS, "グループスキル")
+            except ValueError as e:
+                if (series, group) not in _skipped_combinations:
+                    _skipped_combinations.add((series, group))
+                    logging.getLogger(__name__).warning(
+                        f"Skipping target combination {series} + {group}: {e}"
+                    )
+                continue
+            query.add(QueryEntry(series_ids, group_ids, combo=[series, group]))
+        return query
+
+    @classmethod
+    def parse(cls, text: str) -> "TargetQuery":
+        """条件式の文字列から生成する。書式が不正な場合は ValueError を送出する。"""
+        query = cls()
+        for line_no, raw_line in enumerate(text.splitlines(), start=1):
+            line = raw_line.split("#", 1)[0].strip()
+            if not line:
+                continue
+
+            weight = 1.0
+            if "@" in line:
+                line, weight_str = line.rsplit("@", 1)
+                try:
+                    weight = float(weight_str.strip())
+                except ValueError as e:
+                    raise ValueError(
+                        f"{line_no}行目: 重みが数値ではありません: {raw_line}"
+                    ) from e
+
+            slots = [s.strip() for s in line.split("+")]
+            if len(slots) != 2:
+                raise ValueError(
+                    f"{line_no}行目: 「シリーズ + グループ」の形式で指定してください: {raw_line}"
+                )
+
+            try:
+                series_ids = _parse_slot(slots[0], SERIES_IDS, "シリーズスキル")
+                group_ids = _parse_slot(slots[1], GROUP_IDS, "グループスキル")
+            except ValueError as e:
+                raise ValueError(f"{line_no}行目: {e}") from e
+
+            query.add(
+                QueryEntry(
+                    series_ids,
+                    group_ids,
+                    weight=weight,
+                    combo=[
+                        "" if slots[0] == WILDCARD else slots[0],
+                        "" if slots[1] == WILDCARD else slots[1],
+                    ],
+                )
+            )
+        return query
+
+
+def _parse_slot(
+    slot: str, ids: Dict[str, int], kind: str
+) -> Optional[FrozenSet[int]]:
+    if not slot or slot == WILDCARD:
+        return None
+
+    result = set()
+    for name in slot.split("|"):
+        name = name.strip()
+        if name not in ids:
+            raise ValueError(f"不明な{kind}です: {name}")
+        result.add(ids[name])
+    return frozenset(result)
@@ -0,0 +1,212 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from .config import (
+    DELAYS,
+    OUTPUT_DIR,
+    SCREEN_STATE_TIMEOUT,
+    CALIBRATION_PERCENTILE,
+    CALIBRATION_MARGIN,
+    CALIBRATION_SETTLE_TIME,
+    CALIBRATION_CHANGE_THRESHOLD,
+    TIMING_PROFILE_FILE_NAME,
+    USE_TIMING_PROFILE,
+)
+from .screen_state import STATES, ScreenStateClassifier, ScreenStateError
+
+# 1回のスキル再付与で各待機を行う回数 (G, Space, Up の後と演出待ち)
+CYCLE_DELAYS = {"AFTER_CLICK": 3, "REROLL_ANIMATION": 1}
+
+
+def timing_profile_path(output_dir: str = OUTPUT_DIR) -> Path:
+    return Path(output_dir) / TIMING_PROFILE_FILE_NAME
+
+
+def load_delays(path: Optional[Path] = None) -> Dict[str, float]:
+    """
+    待機時間の設定。計測済みのタイミングプロファイルがあればその値で上書きする。
+    プロファイルにない項目は config.toml の値のまま。
+    """
+    delays = dict(DELAYS)
+    if not USE_TIMING_PROFILE:
+        return delays
+    path = Path(path) if path is not None else timing_profile_path()
+    if not path.exists():
+        return delays
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+        for name, value in profile.get("delays", {}).items():
+            if name in delays:
+                delays[name] = float(value)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Failed to load timing profile: {e}")
+    return delays
+
+
+def attempts_per_hour(delays: Dict[str, float], overhead: float) -> float:
+    """待機時間と、待機以外にかかる時間 (OCR・入力など) から見込んだ1時間あたりの回数"""
+    cycle = overhead + sum(delays[name] * n for name, n in CYCLE_DELAYS.items())
+    return 3600 / cycle if cycle > 0 else 0.0
+
+
+class TimingCalibrator:
+    """
+    入力から画面の切り替わりまでにかかる時間を計測し、待機時間を決める。
+
+    切り替わり先の状態に見本があればその画面になるまで、なければ目印の領域の
+    サムネイルが変化して settle_time 秒落ち着くまでを1回の遷移とする。
+    待機時間は計測値のパーセンタイルに余裕 (margin) を掛けた値。
+    """
+
+    def __init__(
+        self,
+        classifier: ScreenStateClassifier,
+        percentile: float = CALIBRATION_PERCENTILE,
+        margin: float = CALIBRATION_MARGIN,
+        settle_time: float = CALIBRATION_SETTLE_TIME,
+        change_threshold: float = CALIBRATION_CHANGE_THRESHOLD,
+    ):
+        self.classifier = classifier
+        self.percentile = percentile
+        self.margin = margin
+        self.settle_time = settle_time
+        self.change_threshold = change_threshold
+        self.logger = logging.getLogger(__name__)
+        # 待機の名前 (DELAYS のキー) -> 計測した遷移時間
+        self.samples: Dict[str, List[float]] = {}
+        # 1回分の所要時間から計測中の待ち時間を除いた時間 (OCR・入力など)
+        self.overheads: List[float] = []
+        self._cycle_start = None
+        self._cycle_waited = 0.0
+
+    def begin_cycle(self):
+        self._cycle_start = time.time()
+        self._cycle_waited = 0.0
+
+    def end_cycle(self):
+        if self._cycle_start is None:
+            return
+        elapsed = time.time() - self._cycle_start
+        self.overheads.append(max(0.0, elapsed - self._cycle_waited))
+        self._cycle_start = None
+
+    def measure(
+        self,
+        name: str,
+        state: Optional[str] = None,
+        timeout: float = SCREEN_STATE_TIMEOUT,
+        cancel: Optional[threading.Event] = None,
+    ) -> Optional[float]:
+        """
+        直前の入力から画面が切り替わるまでの時間を計測して name の計測値に加える。
+        中断された場合と、画面が変化しなかった場合は None。
+        """
+        start = time.time()
+        try:
+            if state is not None and self.classifier.has(state):
+                if self.classifier.wait_for_state([state], timeout, cancel) is None:
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    raise ScreenStateError(
+                        f"{STATES[state]}になりませんでした ({timeout:g}秒)"
+                    )
+                elapsed = time.time() - start
+            else:
+                elapsed = self._wait_until_settled(start, timeout, cancel)
+                if elapsed is None:
+                    return None
+        finally:
+            self._cycle_waited += time.time() - start
+
+        self.samples.setdefault(name, []).append(elapsed)
+        self.logger.debug(f"Measured {name}: {elapsed:.3f}s")
+        return elapsed
+
+    def _wait_until_settled(
+        self,
+        start: float,
+        timeout: float,
+        cancel: Optional[threading.Event],
+    ) -> Optional[float]:
+        """目印の領域が変化してから落ち着くまで待ち、最後に変化した時刻までの時間を返す"""
+        reader = self.classifier.screen_reader
+        previous = self.classifier.thumbnail(reader.capture_screen())
+        last_change = None
+        while True:
+            now = time.time()
+            if last_change is not None and now - last_change >= self.settle_time:
+                return last_change - start
+            if cancel is not None and cancel.is_set():
+                return None
+            if now - start >= timeout:
+                if last_change is not None:
+                    return last_change - start
+                self.logger.warning(f"Screen did not change within {timeout:g}s.")
+                return None
+            if cancel is not None:
+                cancel.wait(self.classifier.poll_interval)
+            else:
+                time.sleep(self.classifier.poll_interval)
+            current = self.classifier.thumbnail(reader.capture_screen())
+            if np.abs(current - previous).mean() > self.change_threshold:
+                last_change = time.time()
+            previous = current
+
+    def delays(self) -> Dict[str, float]:
+        """計測値から求めた待機時間 (計測していない項目は含まない)"""
+        tuned = {
+            name: round(
+                float(np.percentile(values, self.percentile)) * (1 + self.margin), 3
+            )
+            for name, values in self.samples.items()
+            if values
+        }
+        if "REROLL_ANIMATION" in tuned:
+            # 早送り時の待機は演出が終わるまで待つ必要はないため、短くはしても長くはしない
+            tuned["FAST_FORWARD_ANIMATION"] = min(
+                DELAYS["FAST_FORWARD_ANIMATION"], tuned["REROLL_ANIMATION"]
+            )
+        return tuned
+
+    def summary(self, before: Dict[str, float]) -> Dict:
+        """待機時間と1時間あたりの見込み回数の、計測前後の比較"""
+        tuned = {**before, **self.delays()}
+        overhead = float(np.mean(self.overheads)) if self.overheads else 0.0
+        return {
+            "delays_before": {name: before[name] for name in CYCLE_DELAYS},
+            "delays_after": {name: tuned[name] for name in CYCLE_DELAYS},
+            "overhead": round(overhead, 3),
+            "attempts_per_hour_before": round(attempts_per_hour(before, overhead), 1),
+            "attempts_per_hour_after": round(attempts_per_hour(tuned, overhead), 1),
+        }
+
+    def save(self, before: Dict[str, float], path: Optional[Path] = None) -> Dict:
+        """タイミングプロファイルを書き出し、計測前後の比較を返す"""
+        path = Path(path) if path is not None else timing_profile_path()
+        summary = self.summary(before)
+        profile = {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "cycles": len(self.overheads),
+            "percentile": self.percentile,
+            "margin": self.margin,
+            "delays": self.delays(),
+            "samples": {
+                name: [round(v, 3) for v in values]
+                for name, values in self.samples.items()
+            },
+            "summary": summary,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+            self.logger.info(f"Timing profile saved to {path}")
+        except Exception as e:
+            self.logger.error(f"Failed to save timing profile: {e}")
+        return summary
@@ -29,3 +29,22 @@ def calculate_similarity(text1: str, text2: str) -> float:
     2つの文字列の類似度を計算する (0.0 - 1.0)
     """
     return SequenceMatcher(None, text1, text2).ratio()
+
+
+def find_best_match(text: str, candidates: list[str]) -> tuple[str, float, float]:
+    """
+    候補の中で最も類似度の高い文字列を返す。
+    戻り値は (最良の候補, その類似度, 2番目に高い類似度)。
+    """
+    best_skill = ""
+    best_score = 0.0
+    second_score = 0.0
+    for candidate in candidates:
+        score = calculate_similarity(text, candidate)
+        if score > best_score:
+            second_score = best_score
+            best_skill = candidate
+            best_score = score
+        elif score > second_score:
+            second_score = score
+    return best_skill, best_score, second_score